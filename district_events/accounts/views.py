@@ -228,7 +228,6 @@ def my_bookings(request):
 
 
 
-import requests
 from django.shortcuts import render
 
 
@@ -264,16 +263,10 @@ class TerminalPasswordResetView(PasswordResetView):
             return HttpResponseRedirect(self.get_success_url())
 
 from django.shortcuts import render
-import requests
-from django.conf import settings
+from district_events.flask_service import get_flask_client, ServiceUnavailable
 
 def about(request):
-    try:
-        response = requests.get('http://localhost:5000/api/about')
-        data = response.json() if response.status_code == 200 else None
-    except requests.exceptions.RequestException as e:
-        data = None
-        print(f"API Error: {e}")
+    data = get_flask_client().get('/api/about')
     
     return render(request, 'about.html', {
         'company': data.get('company') if data else None,
@@ -287,24 +280,19 @@ def contact(request):
     
     if request.method == 'POST':
         try:
-            response = requests.post(
-                'http://localhost:5000/api/contact',
+            get_flask_client().post(
+                '/api/contact',
                 json={
                     'name': request.POST.get('name'),
                     'email': request.POST.get('email'),
                     'message': request.POST.get('message')
                 }
             )
-            if response.status_code == 200:
-                message = "Thank you! We'll contact you soon."
-        except requests.exceptions.RequestException as e:
+            message = "Thank you! We'll contact you soon."
+        except ServiceUnavailable:
             message = "Sorry, we couldn't process your request."
     
-    try:
-        response = requests.get('http://localhost:5000/api/contact')
-        contact_info = response.json() if response.status_code == 200 else None
-    except requests.exceptions.RequestException:
-        pass
+    contact_info = get_flask_client().get('/api/contact')
     
     return render(request, 'contact.html', {
         'contact': contact_info or {},
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Booking, Payment
+from django.db.models import Q
+from .bulk import bulk_cancel_bookings, bulk_confirm_bookings
+from .exports import exportable_bookings, ticket_export_response
+from .models import Booking, Payment, PaymentWebhookEvent, Refund, SeatHold, CheckIn
 
 class PaymentInline(admin.StackedInline):
     model = Payment
@@ -33,12 +36,50 @@ class BookingAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ('booking_date', 'payment_date', 'cancellation_date')
+    actions = ['export_tickets_pdf', 'export_tickets_zip', 'confirm_bookings', 'cancel_bookings']
+
+    def export_tickets(self, request, queryset, export_format):
+        event_ids = list(exportable_bookings(queryset).order_by().values_list('event_id', flat=True).distinct()[:2])
+        if not event_ids:
+            self.message_user(request, "None of the selected bookings has a confirmed ticket.", level='warning')
+            return None
+        filename = f'tickets_event_{event_ids[0]}' if len(event_ids) == 1 else 'tickets'
+        return ticket_export_response(queryset, export_format, filename)
+
+    @admin.action(description="Export confirmed tickets as one PDF")
+    def export_tickets_pdf(self, request, queryset):
+        return self.export_tickets(request, queryset, 'pdf')
+
+    @admin.action(description="Export confirmed tickets as a ZIP of PDFs")
+    def export_tickets_zip(self, request, queryset):
+        return self.export_tickets(request, queryset, 'zip')
+
+    @admin.action(description="Confirm selected bookings (comp)")
+    def confirm_bookings(self, request, queryset):
+        result = bulk_confirm_bookings(queryset)
+        self.message_user(
+            request, f"Confirmed {result.changed} of {result.requested} bookings ({result.skipped} already "
+                     f"confirmed or cancelled); {result.seats} seats and {result.zones} zones updated"
+        )
+        if result.zone_full:
+            self.message_user(
+                request, f"{result.zone_full} zone bookings were not confirmed: their zone is full", level='warning',
+            )
+
+    @admin.action(description="Cancel selected bookings")
+    def cancel_bookings(self, request, queryset):
+        result = bulk_cancel_bookings(queryset, reason='Cancelled by the organizer.')
+        self.message_user(
+            request, f"Cancelled {result.changed} of {result.requested} bookings ({result.skipped} already "
+                     f"cancelled); {result.seats} seats released and {result.zones} zones updated"
+        )
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('id', 'booking', 'payment_method', 'amount', 'payment_status', 'payment_date')
     list_filter = ('payment_method', 'payment_status')
-    search_fields = ('booking__user__username', 'booking__user__email', 'transaction_id', 'razorpay_order_id', 'razorpay_payment_id')
+    search_fields = ('booking__user__username', 'booking__user__email')
+    search_help_text = 'Username, email, or an exact transaction, order or payment id.'
     date_hierarchy = 'payment_date'
     
     fieldsets = (
@@ -49,8 +90,50 @@ class PaymentAdmin(admin.ModelAdmin):
             'fields': ('payment_method', 'payment_status', 'transaction_id', 'payment_date')
         }),
         ('Razorpay Details', {
-            'fields': ('razorpay_order_id', 'razorpay_payment_id', 'razorpay_signature')
+            'fields': ('razorpay_order_id', 'razorpay_order_created_at', 'razorpay_payment_id', 'razorpay_signature')
         }),
     )
     
-    readonly_fields = ('payment_date',)
+    readonly_fields = ('payment_date', 'razorpay_order_created_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Ids are matched exactly, through their indexes; a substring search
+        # over them reads every payment. Anything else searches users.
+        term = search_term.strip()
+        if term and not term.count(' '):
+            by_id = queryset.filter(
+                Q(transaction_id=term) | Q(razorpay_order_id=term) | Q(razorpay_payment_id=term)
+            )
+            if by_id.exists():
+                return by_id, False
+        return super().get_search_results(request, queryset, search_term)
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ('booking', 'event', 'seat', 'zone', 'quantity', 'status', 'expires_at')
+    list_filter = ('status',)
+    search_fields = ('booking__user__username', 'event__title')
+    readonly_fields = ('booking', 'event', 'seat', 'zone', 'quantity', 'created_at', 'expires_at', 'released_at')
+
+@admin.register(CheckIn)
+class CheckInAdmin(admin.ModelAdmin):
+    list_display = ('booking', 'event', 'gate', 'scanned_at', 'recorded_at')
+    list_filter = ('gate',)
+    search_fields = ('booking__ticket_code', 'event__title')
+    readonly_fields = ('booking', 'event', 'gate', 'scanned_at', 'recorded_at')
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('razorpay_payment_id', 'razorpay_order_id', 'outcome', 'source', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'outcome', 'source')
+    search_fields = ('razorpay_payment_id', 'razorpay_order_id')
+    readonly_fields = ('razorpay_payment_id', 'razorpay_order_id', 'razorpay_signature', 'outcome', 'source',
+                       'payload', 'attempts', 'error', 'received_at', 'claimed_at', 'processed_at')
+
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = ('payment', 'event', 'amount', 'status', 'attempts', 'razorpay_refund_id', 'created_at', 'processed_at')
+    list_filter = ('status',)
+    search_fields = ('payment__razorpay_payment_id', 'razorpay_refund_id', 'event__title')
+    readonly_fields = ('payment', 'event', 'amount', 'reason', 'status', 'attempts', 'razorpay_refund_id', 'error',
+                       'created_at', 'claimed_at', 'processed_at')
@@ -0,0 +1,232 @@
+"""
+Bulk booking operations for organizers: comp a block of bookings, or cancel
+every booking of a postponed event.
+
+Both work through set-based UPDATEs on Booking, SeatHold, Seat and the
+Zone counters instead of Booking.save() per row. Bookings are processed
+in chunks of BULK_BOOKING_CHUNK_SIZE, one transaction per chunk, so locks
+are held for a chunk at a time. Each chunk's state change is a guarded
+UPDATE stamped with the chunk's timestamp (the same trick as
+release_expired_holds), so a booking changed concurrently by a payment,
+the hold sweeper or another bulk run is counted once and skipped here.
+"""
+from collections import Counter, defaultdict, namedtuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.utils import timezone
+from events.availability import seats_changed, zones_changed
+from events.models import Seat, Zone
+from .codes import next_ticket_code
+from .models import Booking, SeatHold
+
+# requested: bookings selected; changed: bookings this call confirmed or
+# cancelled; skipped: selected but already in that state (or cancelled,
+# when confirming); seats: seats whose availability flipped; zones: zones
+# whose counters changed; zone_full: zone bookings left unconfirmed
+# because they had no hold and their zone had no room left.
+BulkResult = namedtuple('BulkResult', 'requested changed skipped seats zones zone_full', defaults=(0,))
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _apply_zone_deltas(deltas):
+    """Apply {zone id: {'booked_count': n, 'held_count': n}} in one UPDATE per counter."""
+    for field in ('booked_count', 'held_count'):
+        changes = {zone_id: delta[field] for zone_id, delta in deltas.items() if delta[field]}
+        if changes:
+            Zone.objects.filter(pk__in=changes).update(**{field: F(field) + Case(
+                *(When(pk=zone_id, then=Value(delta)) for zone_id, delta in changes.items()),
+                default=Value(0),
+            )})
+
+
+def _book_zone_places(zone_id, quantity):
+    """Count `quantity` places of a zone as booked if it has room, as claim_zone_capacity() does for holds."""
+    return Zone.objects.filter(
+        pk=zone_id,
+        capacity__gte=F('booked_count') + F('held_count') + quantity,
+    ).update(booked_count=F('booked_count') + quantity) == 1
+
+
+def _settle_holds(booking_ids, status, now, zone_deltas):
+    """Close the active holds of booking_ids and give their zone places back to held_count."""
+    holds = list(
+        SeatHold.objects.filter(booking_id__in=booking_ids, status=SeatHold.ACTIVE)
+        .values_list('pk', 'zone_id', 'quantity')
+    )
+    if not holds:
+        return
+    SeatHold.objects.filter(pk__in=[pk for pk, _, _ in holds], status=SeatHold.ACTIVE).update(
+        status=status, released_at=now
+    )
+    for _, zone_id, quantity in holds:
+        if zone_id:
+            zone_deltas[zone_id]['held_count'] -= quantity
+
+
+def _publish(seats_by_event, available, zone_events):
+    for event_id, seat_ids in seats_by_event.items():
+        seats_changed(event_id, seat_ids, available=available)
+    for event_id in zone_events:
+        zones_changed(event_id)
+
+
+def bulk_confirm_bookings(bookings, payment_status='paid', chunk_size=None):
+    """
+    Confirm every unconfirmed, uncancelled booking in the `bookings`
+    queryset, e.g. to comp a block of seats. Issues ticket codes, converts
+    holds and moves zone places from held to booked. A zone booking with
+    no active hold is only confirmed if its zone still has room. Returns a
+    BulkResult.
+    """
+    chunk_size = chunk_size or settings.BULK_BOOKING_CHUNK_SIZE
+    requested = bookings.count()
+    booking_ids = list(
+        bookings.filter(is_confirmed=False, is_cancelled=False).order_by('pk').values_list('pk', flat=True)
+    )
+    changed, zone_full, seats, zones = 0, 0, set(), set()
+    for chunk in _chunks(booking_ids, chunk_size):
+        with transaction.atomic():
+            now = timezone.now()
+            zone_deltas = defaultdict(Counter)
+            # Zone bookings without a hold (it expired, or a comp made
+            # without reserve_zone) have no places set aside: book them now,
+            # or leave the booking unconfirmed if the zone is full.
+            unheld = list(
+                Booking.objects.filter(pk__in=chunk, is_confirmed=False, is_cancelled=False, zone__isnull=False)
+                .exclude(Exists(SeatHold.objects.filter(booking=OuterRef('pk'), status=SeatHold.ACTIVE)))
+                .order_by('pk').values_list('pk', 'zone_id', 'quantity')
+            )
+            booked, full = {}, []
+            for pk, zone_id, quantity in unheld:
+                if _book_zone_places(zone_id, quantity):
+                    booked[pk] = (zone_id, quantity)
+                else:
+                    full.append(pk)
+            Booking.objects.filter(pk__in=chunk, is_confirmed=False, is_cancelled=False).exclude(pk__in=full).update(
+                is_confirmed=True, payment_status=payment_status, payment_date=now,
+            )
+            won = list(
+                Booking.objects.filter(pk__in=chunk, is_confirmed=True, payment_date=now)
+                .values_list('pk', 'event_id', 'seat_id', 'zone_id', 'quantity', 'ticket_code')
+            )
+            won_ids = [row[0] for row in won]
+            for pk in set(booked) - set(won_ids):
+                # Confirmed or cancelled by someone else meanwhile: give the places back.
+                zone_id, quantity = booked[pk]
+                zone_deltas[zone_id]['booked_count'] -= quantity
+            if not won:
+                _apply_zone_deltas(zone_deltas)
+                zone_full += len(full)
+                continue
+
+            without_code = [row[0] for row in won if not row[5]]
+            if without_code:
+                Booking.objects.bulk_update(
+                    [Booking(pk=pk, ticket_code=next_ticket_code()) for pk in without_code], ['ticket_code'],
+                )
+
+            _settle_holds(won_ids, SeatHold.CONVERTED, now, zone_deltas)
+            zone_events = set()
+            seats_by_event = defaultdict(list)
+            for pk, event_id, seat_id, zone_id, quantity, _ in won:
+                if zone_id:
+                    if pk not in booked:
+                        zone_deltas[zone_id]['booked_count'] += quantity
+                    zone_events.add(event_id)
+                if seat_id:
+                    seats_by_event[event_id].append(seat_id)
+            _apply_zone_deltas(zone_deltas)
+
+            # A booking normally holds its seat already; comps made without a
+            # hold may not, so claim what is still marked available.
+            claimed = defaultdict(list)
+            for event_id, seat_ids in seats_by_event.items():
+                claimed[event_id] = list(
+                    Seat.objects.filter(pk__in=seat_ids, is_available=True).values_list('pk', flat=True)
+                )
+            claimed_ids = [seat_id for seat_ids in claimed.values() for seat_id in seat_ids]
+            if claimed_ids:
+                Seat.objects.filter(pk__in=claimed_ids).update(is_available=False)
+            _publish({event_id: ids for event_id, ids in claimed.items() if ids}, False, zone_events)
+
+        changed += len(won)
+        zone_full += len(full)
+        seats.update(claimed_ids)
+        zones.update(zone_deltas)
+        zones.update(zone_id for zone_id, _ in booked.values())
+    return BulkResult(requested, changed, requested - changed - zone_full, len(seats), len(zones), zone_full)
+
+
+def bulk_cancel_bookings(bookings, reason='', chunk_size=None):
+    """
+    Cancel every uncancelled booking in the `bookings` queryset, e.g. all
+    bookings of a postponed event. Releases holds, seats and zone places
+    and invalidates the tickets. Payments are left as they are. Returns a
+    BulkResult.
+    """
+    from .checkin import ticket_cancelled
+    from .tickets import invalidate_tickets
+
+    chunk_size = chunk_size or settings.BULK_BOOKING_CHUNK_SIZE
+    requested = bookings.count()
+    booking_ids = list(bookings.filter(is_cancelled=False).order_by('pk').values_list('pk', flat=True))
+    changed, seats, zones = 0, set(), set()
+    for chunk in _chunks(booking_ids, chunk_size):
+        with transaction.atomic():
+            now = timezone.now()
+            Booking.objects.filter(pk__in=chunk, is_cancelled=False).update(
+                is_cancelled=True, cancellation_date=now, cancellation_reason=reason or None,
+            )
+            won = list(
+                Booking.objects.filter(pk__in=chunk, is_cancelled=True, cancellation_date=now)
+                .values_list('pk', 'event_id', 'seat_id', 'zone_id', 'quantity', 'is_confirmed', 'ticket_code')
+            )
+            if not won:
+                continue
+            won_ids = [row[0] for row in won]
+
+            zone_deltas = defaultdict(Counter)
+            _settle_holds(won_ids, SeatHold.RELEASED, now, zone_deltas)
+            zone_events = set()
+            seats_by_event = defaultdict(list)
+            tickets = []
+            for _, event_id, seat_id, zone_id, quantity, confirmed, ticket_code in won:
+                if zone_id:
+                    zone_events.add(event_id)
+                    if confirmed:
+                        zone_deltas[zone_id]['booked_count'] -= quantity
+                if seat_id:
+                    seats_by_event[event_id].append(seat_id)
+                if ticket_code:
+                    tickets.append((event_id, ticket_code))
+            _apply_zone_deltas(zone_deltas)
+
+            # Free each seat unless another live booking still holds it.
+            holders = Booking.objects.filter(seat=OuterRef('pk'), is_cancelled=False)
+            released = {}
+            for event_id, seat_ids in seats_by_event.items():
+                released[event_id] = list(
+                    Seat.objects.filter(pk__in=seat_ids, is_available=False).exclude(Exists(holders))
+                    .values_list('pk', flat=True)
+                )
+            released_ids = [seat_id for seat_ids in released.values() for seat_id in seat_ids]
+            if released_ids:
+                Seat.objects.filter(pk__in=released_ids).update(is_available=True)
+            _publish({event_id: ids for event_id, ids in released.items() if ids}, True, zone_events)
+
+            def forget_tickets(tickets=tickets):
+                invalidate_tickets([ticket_code for _, ticket_code in tickets])
+                for event_id, ticket_code in tickets:
+                    ticket_cancelled(event_id, ticket_code)
+
+            transaction.on_commit(forget_tickets)
+
+        changed += len(won)
+        seats.update(released_ids)
+        zones.update(zone_deltas)
+    return BulkResult(requested, changed, requested - changed, len(seats), len(zones))
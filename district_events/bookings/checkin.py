@@ -0,0 +1,343 @@
+"""
+Gate check-in.
+
+Each web process keeps a GateIndex per event: every confirmed ticket of the
+event in a dict keyed by ticket code, plus the bookings already checked in.
+It is loaded before doors open (the gate manifest request loads it) or on
+the first scan, so a scan is a dict lookup and a set insert. A code that
+is not in the index, such as a ticket bought at the door after the index
+loaded, costs one lookup by the unique ticket_code index. The CheckIn
+row is queued and written by a background thread in batches of
+CHECKIN_BATCH_SIZE, or every CHECKIN_FLUSH_INTERVAL seconds, with
+bulk_create(ignore_conflicts=True). CheckIn.booking is unique, so the
+writes are idempotent: rescans, retries, and offline gates uploading the
+same scans again never record a ticket twice. A batch that fails on a bad
+row (a booking deleted since the scan) is written row by row, and the rows
+that cannot be written are logged and dropped.
+
+A scan is reported ADMITTED before its CheckIn row is written. Queued rows
+are flushed when the process exits normally, including a graceful worker
+restart, but a process that is killed or crashes loses up to
+CHECKIN_FLUSH_INTERVAL seconds (at most CHECKIN_BATCH_SIZE) of admitted
+scans. Once their claims expire (CHECKIN_CLAIM_TIMEOUT) and the indexes
+reload, those tickets can be admitted again.
+
+With several processes, the first scan of a ticket is also claimed with
+cache.add(). With a shared cache (Memcached, Redis) only one gate anywhere
+admits a ticket. Indexes reload in the background every
+CHECKIN_INDEX_MAX_AGE seconds to pick up late bookings, cancellations and
+other processes' check-ins. A cancellation in this process applies at once.
+
+Gates that lose the network validate against the manifest (ticket codes and
+labels) and upload their scans with sync_scans() when they are back online.
+"""
+import ast
+import atexit
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DataError, DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+from .codes import CODE_LENGTH, is_valid_ticket_code
+from .models import Booking, CheckIn
+from .tickets import PAYLOAD_PREFIX, InvalidTicketPayload, read_ticket_payload
+
+logger = logging.getLogger(__name__)
+
+ADMITTED = 'admitted'
+ALREADY_CHECKED_IN = 'already_checked_in'
+CANCELLED = 'cancelled'
+UNKNOWN = 'unknown'
+WRONG_EVENT = 'wrong_event'
+INVALID = 'invalid'
+
+ScanResult = namedtuple('ScanResult', 'status ticket_code label gate scanned_at')
+# A ticket in the index: booking id, what the gate shows (seat or zone), cancelled.
+Ticket = namedtuple('Ticket', 'booking_id label cancelled')
+
+
+def _claim_key(booking_id):
+    return f'checkin:{booking_id}'
+
+
+def _label(row, number, zone, quantity):
+    if row:
+        return f"Seat {row}{number}"
+    if zone:
+        return f"{zone} x {quantity}"
+    return ''
+
+
+class GateIndex:
+    """In-memory tickets and check-ins of one event."""
+
+    def __init__(self, event_id):
+        self.event_id = event_id
+        self.lock = threading.Lock()
+        self.tickets = {}
+        self.checked_in = {}  # booking id -> (gate, scanned_at)
+        self.loaded_at = None
+        self.reloading = False
+        self.load()
+
+    def load(self):
+        tickets = {}
+        bookings = Booking.objects.filter(
+            event_id=self.event_id, is_confirmed=True, ticket_code__isnull=False,
+        ).values_list('pk', 'ticket_code', 'is_cancelled', 'seat__row', 'seat__number', 'zone__name', 'quantity')
+        for booking_id, ticket_code, cancelled, row, number, zone, quantity in bookings.iterator(chunk_size=5000):
+            tickets[ticket_code] = Ticket(booking_id, _label(row, number, zone, quantity), cancelled)
+        checked_in = {
+            booking_id: (gate, scanned_at)
+            for booking_id, gate, scanned_at in CheckIn.objects.filter(event_id=self.event_id)
+            .values_list('booking_id', 'gate', 'scanned_at').iterator(chunk_size=5000)
+        }
+        with self.lock:
+            # Keep this process's scans that haven't been written yet.
+            checked_in.update(self.checked_in)
+            self.tickets, self.checked_in = tickets, checked_in
+            self.loaded_at = time.monotonic()
+
+    def reload_in_background(self):
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+
+        def reload():
+            try:
+                self.load()
+            finally:
+                self.reloading = False
+                connection.close()
+
+        threading.Thread(target=reload, daemon=True).start()
+
+    @property
+    def stale(self):
+        return time.monotonic() - self.loaded_at > settings.CHECKIN_INDEX_MAX_AGE
+
+    def cancel(self, ticket_code):
+        with self.lock:
+            ticket = self.tickets.get(ticket_code)
+            if ticket is not None:
+                self.tickets[ticket_code] = ticket._replace(cancelled=True)
+
+    def lookup(self, ticket_code):
+        """Find a ticket confirmed after the index loaded, e.g. bought at the door, and add it."""
+        found = Booking.objects.filter(
+            ticket_code=ticket_code, event_id=self.event_id, is_confirmed=True,
+        ).values_list('pk', 'is_cancelled', 'seat__row', 'seat__number', 'zone__name', 'quantity').first()
+        if found is None:
+            return None
+        booking_id, cancelled, row, number, zone, quantity = found
+        with self.lock:
+            return self.tickets.setdefault(
+                ticket_code, Ticket(booking_id, _label(row, number, zone, quantity), cancelled),
+            )
+
+    def scan(self, ticket_code, gate, scanned_at=None):
+        scanned_at = scanned_at or timezone.now()
+        ticket = self.tickets.get(ticket_code) or self.lookup(ticket_code)
+        if ticket is None:
+            return ScanResult(UNKNOWN, ticket_code, '', gate, scanned_at)
+        if ticket.cancelled:
+            return ScanResult(CANCELLED, ticket_code, ticket.label, gate, scanned_at)
+
+        with self.lock:
+            first = self.checked_in.get(ticket.booking_id)
+            if first is None:
+                self.checked_in[ticket.booking_id] = (gate, scanned_at)
+        if first is not None:
+            return ScanResult(ALREADY_CHECKED_IN, ticket_code, ticket.label, *first)
+
+        if not cache.add(_claim_key(ticket.booking_id), (gate, scanned_at), settings.CHECKIN_CLAIM_TIMEOUT):
+            # Another process admitted it first.
+            first = cache.get(_claim_key(ticket.booking_id)) or (gate, scanned_at)
+            with self.lock:
+                self.checked_in[ticket.booking_id] = first
+            return ScanResult(ALREADY_CHECKED_IN, ticket_code, ticket.label, *first)
+
+        get_writer().add(CheckIn(booking_id=ticket.booking_id, event_id=self.event_id, gate=gate, scanned_at=scanned_at))
+        return ScanResult(ADMITTED, ticket_code, ticket.label, gate, scanned_at)
+
+    def manifest(self):
+        with self.lock:
+            checked_in = set(self.checked_in)
+            tickets = dict(self.tickets)
+        return {
+            'event_id': self.event_id,
+            'tickets': {code: ticket.label for code, ticket in tickets.items() if not ticket.cancelled},
+            'checked_in': [code for code, ticket in tickets.items() if ticket.booking_id in checked_in],
+        }
+
+
+class CheckInWriter:
+    """Queues CheckIns and writes them in batches from a background thread."""
+
+    def __init__(self, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def add(self, check_in):
+        with self.lock:
+            self.queue.append(check_in)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='checkin-writer', daemon=True)
+                self.thread.start()
+            if len(self.queue) >= self.batch_size:
+                self.wake.set()
+
+    def flush(self):
+        """Write everything queued. Returns the number of check-ins flushed."""
+        with self.lock:
+            batch, self.queue = self.queue, []
+        if not batch:
+            return 0
+        try:
+            CheckIn.objects.bulk_create(batch, batch_size=self.batch_size, ignore_conflicts=True)
+        except (IntegrityError, DataError):
+            # One bad row, e.g. for a booking deleted since the scan, fails the
+            # whole batch: write the rows one by one and drop the bad ones.
+            return self.write_each(batch)
+        except DatabaseError:
+            self.requeue(batch)
+            raise
+        return len(batch)
+
+    def write_each(self, batch):
+        written = 0
+        for position, check_in in enumerate(batch):
+            try:
+                with transaction.atomic():
+                    CheckIn.objects.bulk_create([check_in], ignore_conflicts=True)
+            except (IntegrityError, DataError):
+                logger.exception('Dropping the check-in of booking %s; it cannot be written.', check_in.booking_id)
+            except DatabaseError:
+                self.requeue(batch[position:])
+                raise
+            else:
+                written += 1
+        return written
+
+    def requeue(self, batch):
+        with self.lock:
+            self.queue[:0] = batch
+
+    def close(self):
+        """Write what is still queued when the process exits."""
+        try:
+            self.flush()
+        except DatabaseError:
+            logger.exception('Writing %s queued check-ins at exit failed.', len(self.queue))
+
+    def run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except DatabaseError:
+                logger.exception('Writing check-ins failed; retrying in %ss.', self.interval)
+            finally:
+                connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_writer():
+    writer = CheckInWriter(settings.CHECKIN_BATCH_SIZE, settings.CHECKIN_FLUSH_INTERVAL)
+    atexit.register(writer.close)
+    return writer
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_gate_index(event_id):
+    """This process's index of event_id, loading it on first use."""
+    index = _indexes.get(event_id)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(event_id)
+            if index is None:
+                index = _indexes[event_id] = GateIndex(event_id)
+    elif index.stale:
+        index.reload_in_background()
+    return index
+
+
+def ticket_cancelled(event_id, ticket_code):
+    index = _indexes.get(event_id)
+    if index is not None:
+        index.cancel(ticket_code)
+
+
+def ticket_code_from_scan(event_id, scanned):
+    """
+    The ticket code in what a gate scanned: a signed payload, the dict
+    payload of tickets issued before it, or a code typed in by hand.
+    Returns (ticket code, None) or (None, error status).
+    """
+    scanned = scanned.strip()
+    if scanned.startswith(f'{PAYLOAD_PREFIX}:'):
+        try:
+            ticket_code, payload_event_id = read_ticket_payload(scanned)
+        except InvalidTicketPayload:
+            return None, INVALID
+        if payload_event_id != event_id:
+            return None, WRONG_EVENT
+        return ticket_code, None
+    if scanned.startswith('{'):
+        try:
+            ticket_code = ast.literal_eval(scanned).get('ticket_code')
+        except (ValueError, TypeError, SyntaxError, AttributeError, RecursionError, MemoryError):
+            # Deeply nested input overflows the parser.
+            ticket_code = None
+        return (ticket_code, None) if ticket_code and isinstance(ticket_code, str) else (None, INVALID)
+    ticket_code = scanned.upper()
+    if not ticket_code or (len(ticket_code) == CODE_LENGTH and not is_valid_ticket_code(ticket_code)):
+        # Typed codes of the current scheme carry a check character.
+        return None, INVALID
+    return ticket_code, None
+
+
+def scan_ticket(event_id, scanned, gate, scanned_at=None):
+    """Validate and record one scan at a gate. Returns a ScanResult."""
+    ticket_code, error = ticket_code_from_scan(event_id, scanned)
+    if error:
+        return ScanResult(error, None, '', gate, scanned_at or timezone.now())
+    return get_gate_index(event_id).scan(ticket_code, gate, scanned_at)
+
+
+def sync_scans(event_id, gate, scans):
+    """
+    Record scans made offline: [{'ticket_code' or 'payload', 'scanned_at' (ISO 8601)}].
+    Returns a ScanResult per scan; re-uploading a batch is harmless.
+    """
+    results = []
+    for scan in scans:
+        scanned_at = None
+        if scan.get('scanned_at'):
+            try:
+                scanned_at = datetime.fromisoformat(scan['scanned_at'])
+            except (TypeError, ValueError):
+                pass
+            else:
+                if timezone.is_naive(scanned_at):
+                    scanned_at = timezone.make_aware(scanned_at)
+        scanned = scan.get('payload') or scan.get('ticket_code') or ''
+        if not isinstance(scanned, str):
+            results.append(ScanResult(INVALID, None, '', gate, scanned_at or timezone.now()))
+            continue
+        results.append(scan_ticket(event_id, scanned, gate, scanned_at))
+    return results
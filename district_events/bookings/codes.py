@@ -0,0 +1,146 @@
+"""
+Ticket codes.
+
+A ticket code is a number from a database sequence passed through a keyed
+permutation, written in base 36, with a check character. Distinct sequence
+numbers always give distinct codes, so issuing a code never has to look for
+a duplicate or retry on the unique constraint.
+
+- Each thread takes a block of TICKET_CODE_BLOCK_SIZE sequence numbers from
+  the TicketCodeSequence row at a time, so issuing a code costs no query.
+  A block taken inside a transaction is only used while that transaction
+  is open, and is kept after it commits. If it rolls back, the counter goes
+  back and the block may be handed out again, so this thread drops it too.
+- The permutation is a 10-round Feistel network over 10 base-36 digits
+  (36**10 codes), with HMAC-SHA256 round functions keyed by SECRET_KEY.
+  Without the key, consecutive codes look unrelated and can't be guessed
+  from one another.
+- The check character is Luhn mod 36, so a mistyped character and most
+  swapped neighbours are caught without a lookup.
+
+Codes are 11 characters long. Codes issued before this scheme were 10 random
+characters, so the two can never collide.
+"""
+import hashlib
+import hmac
+import string
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+ALPHABET = string.digits + string.ascii_uppercase
+RADIX = len(ALPHABET)
+DIGITS = 10
+HALF = RADIX ** (DIGITS // 2)
+ROUNDS = 10
+CODE_LENGTH = DIGITS + 1
+
+
+@lru_cache(maxsize=None)
+def _key(secret_key):
+    return hashlib.sha256(f'bookings.codes.ticket_code:{secret_key}'.encode()).digest()
+
+
+def _round(key, number, value):
+    digest = hmac.new(key, f'{number}:{value}'.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') % HALF
+
+
+def permute(value):
+    """Map 0 <= value < 36**10 onto the same range, one-to-one."""
+    key = _key(settings.SECRET_KEY)
+    left, right = divmod(value, HALF)
+    for number in range(ROUNDS):
+        left, right = right, (left + _round(key, number, right)) % HALF
+    return left * HALF + right
+
+
+def _encode(value):
+    digits = []
+    for _ in range(DIGITS):
+        value, digit = divmod(value, RADIX)
+        digits.append(ALPHABET[digit])
+    return ''.join(reversed(digits))
+
+
+def check_character(digits):
+    """The Luhn mod 36 check character of a string of base-36 digits."""
+    total, factor = 0, 2
+    for char in reversed(digits):
+        addend = factor * ALPHABET.index(char)
+        total += addend // RADIX + addend % RADIX
+        factor = 3 - factor
+    return ALPHABET[-total % RADIX]
+
+
+def ticket_code(sequence_number):
+    """The ticket code of a sequence number."""
+    digits = _encode(permute(sequence_number))
+    return digits + check_character(digits)
+
+
+def is_valid_ticket_code(code):
+    """Whether code has the shape and check character of a ticket code from this scheme."""
+    return (
+        len(code) == CODE_LENGTH and all(char in ALPHABET for char in code)
+        and check_character(code[:-1]) == code[-1]
+    )
+
+
+class Block:
+    """A range of sequence numbers that one thread issues codes from."""
+
+    def __init__(self, start, end):
+        self.next = start
+        self.end = end
+        self.committed = not connection.in_atomic_block
+        if not self.committed:
+            transaction.on_commit(self.commit)
+
+    def commit(self):
+        self.committed = True
+
+    @property
+    def usable(self):
+        if self.next >= self.end:
+            return False
+        # Still waiting on the transaction that took it: usable while that
+        # transaction is open, which is while the hook is still queued.
+        return self.committed or any(hook[1] == self.commit for hook in connection.run_on_commit)
+
+
+class TicketCodeAllocator:
+    """Issues ticket codes from per-thread blocks of the ticket code sequence."""
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self.local = threading.local()
+
+    def take_block(self):
+        from .models import TicketCodeSequence
+        with transaction.atomic():
+            sequence = TicketCodeSequence.objects.filter(pk=1)
+            if not sequence.update(next_value=F('next_value') + self.block_size):
+                TicketCodeSequence.objects.get_or_create(pk=1)
+                sequence.update(next_value=F('next_value') + self.block_size)
+            end = sequence.values_list('next_value', flat=True).get()
+        return Block(end - self.block_size, end)
+
+    def next_code(self):
+        block = getattr(self.local, 'block', None)
+        if block is None or not block.usable:
+            block = self.local.block = self.take_block()
+        number, block.next = block.next, block.next + 1
+        return ticket_code(number)
+
+
+@lru_cache(maxsize=None)
+def get_allocator():
+    return TicketCodeAllocator(settings.TICKET_CODE_BLOCK_SIZE)
+
+
+def next_ticket_code():
+    """A new ticket code, never issued before."""
+    return get_allocator().next_code()
@@ -0,0 +1,148 @@
+"""
+The Razorpay client and checkout orders.
+
+razorpay_client() returns one client per process (per set of credentials).
+Its requests session keeps a pool of up to RAZORPAY_POOL_SIZE connections
+to the gateway, so calls reuse warm TLS connections instead of opening one
+each, and every call times out after RAZORPAY_TIMEOUT. The client is safe
+to share between threads.
+
+checkout_order() returns the order a booking's payment page checks out
+with. The pending Payment keeps the order it was created with, and the
+order is reused while it can still be paid: same amount, created less than
+RAZORPAY_ORDER_TTL ago. Reloading the payment page makes no gateway call.
+With RAZORPAY_PRECREATE_ORDERS, seat selection creates the order on a
+background thread once the hold commits (precreate_order()), so the
+payment page usually finds it waiting.
+"""
+import logging
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+import razorpay
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Booking, Payment
+
+logger = logging.getLogger(__name__)
+
+CURRENCY = 'INR'
+
+Order = namedtuple('Order', 'id amount currency')
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """An HTTPAdapter that applies a default timeout; the razorpay client sets none."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def gateway_configured():
+    return bool(settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET)
+
+
+@lru_cache(maxsize=None)
+def _client(key_id, key_secret, base_url):
+    session = requests.Session()
+    adapter = TimeoutAdapter(
+        settings.RAZORPAY_TIMEOUT, pool_connections=1, pool_maxsize=settings.RAZORPAY_POOL_SIZE, max_retries=0,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return razorpay.Client(session=session, auth=(key_id, key_secret), base_url=base_url)
+
+
+def razorpay_client():
+    """The process-wide razorpay.Client for the configured credentials."""
+    return _client(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET, settings.RAZORPAY_API_URL)
+
+
+def order_amount(booking):
+    """The booking's price in paise."""
+    return int(booking.total_price * 100)
+
+
+def _reusable(payment, booking):
+    created_at = payment['razorpay_order_created_at']
+    return bool(
+        payment['razorpay_order_id'] and created_at
+        and payment['amount'] == booking.total_price
+        and created_at > timezone.now() - timedelta(seconds=settings.RAZORPAY_ORDER_TTL)
+    )
+
+
+def checkout_order(booking):
+    """
+    The Razorpay order to pay `booking` with. Reuses the order stored on the
+    booking's Payment when it is still payable; otherwise creates one and
+    stores it, creating the pending Payment as well if there is none.
+    """
+    fields = ('pk', 'amount', 'razorpay_order_id', 'razorpay_order_created_at')
+    payment = Payment.objects.filter(booking=booking).exclude(payment_status='paid').values(*fields).first()
+    amount = order_amount(booking)
+    if payment and _reusable(payment, booking):
+        return Order(payment['razorpay_order_id'], amount, CURRENCY)
+
+    order_id = razorpay_client().order.create(data={
+        'amount': amount,
+        'currency': CURRENCY,
+        'receipt': f'booking_{booking.id}',
+        'payment_capture': 1,
+    })['id']
+    now = timezone.now()
+    if payment is None:
+        # bulk_create skips Payment.save(), which would save the booking too.
+        Payment.objects.bulk_create([Payment(
+            booking=booking, payment_method='upi', transaction_id=uuid.uuid4().hex[:16],
+            amount=booking.total_price, payment_status='pending',
+            razorpay_order_id=order_id, razorpay_order_created_at=now,
+        )], ignore_conflicts=True)
+        stored = Payment.objects.filter(booking=booking, razorpay_order_id=order_id).exists()
+    else:
+        # Only replace the order this call found, so a page already showing a
+        # newer order from a concurrent request keeps a valid order id.
+        stored = Payment.objects.filter(
+            pk=payment['pk'], razorpay_order_id=payment['razorpay_order_id'],
+        ).exclude(payment_status='paid').update(
+            razorpay_order_id=order_id, razorpay_order_created_at=now, amount=booking.total_price,
+        )
+    if not stored:
+        # Another request stored its order first; check out with that one.
+        order_id = Payment.objects.filter(booking=booking).values_list('razorpay_order_id', flat=True).get()
+    return Order(order_id, amount, CURRENCY)
+
+
+@lru_cache(maxsize=None)
+def _order_pool():
+    return ThreadPoolExecutor(max_workers=settings.RAZORPAY_PRECREATE_WORKERS, thread_name_prefix='razorpay-orders')
+
+
+def _precreate(booking_id):
+    try:
+        booking = Booking.objects.filter(pk=booking_id, is_confirmed=False, is_cancelled=False).first()
+        if booking is not None:
+            checkout_order(booking)
+    except Exception:
+        # The payment page creates the order itself if this didn't.
+        logger.exception('Creating the Razorpay order for booking %s failed.', booking_id)
+    finally:
+        connection.close()
+
+
+def precreate_order(booking):
+    """Create the booking's checkout order in the background once the current transaction commits."""
+    if settings.RAZORPAY_PRECREATE_ORDERS and gateway_configured():
+        booking_id = booking.pk
+        transaction.on_commit(lambda: _order_pool().submit(_precreate, booking_id))
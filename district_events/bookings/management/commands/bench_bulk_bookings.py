@@ -0,0 +1,120 @@
+import time
+from datetime import date, time as clock, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounts.models import User
+from events.management.synthetic import rolled_back
+from events.models import City, Venue, EventCategory, Event, SeatCategory, Seat, Zone
+from bookings.bulk import bulk_cancel_bookings, bulk_confirm_bookings
+from bookings.models import Booking, SeatHold
+
+
+class Command(BaseCommand):
+    help = ('Time bulk confirmation and cancellation of an event\'s bookings against Booking.save() '
+            'per row, and check seats and zone counters afterwards (rolled back afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=50_000)
+        parser.add_argument('--seat-share', type=float, default=0.5, help='Share of bookings with a seat.')
+        parser.add_argument('--sample', type=int, default=500, help='Bookings saved one by one for comparison.')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['bookings']} held bookings...")
+            event, zone = self.create_fixture(options['bookings'], options['seat_share'])
+            self.run(event, zone, options)
+
+    def create_fixture(self, count, seat_share):
+        city = City.objects.create(name='Bulk Bench City', state='Bench')
+        venue = Venue.objects.create(name='Bulk Bench Arena', address='1 Bulk Road', city=city, capacity=count)
+        event = Event.objects.create(
+            title='Bulk Bench Gala', description='Benchmark event', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date(2030, 1, 1), end_date=date(2030, 1, 1),
+            start_time=clock(19), end_time=clock(22), banner_image_url='http://example.com/banner.png',
+        )
+        category = SeatCategory.objects.get_or_create(name='Bench')[0]
+        seat_count = int(count * seat_share)
+        seats = Seat.objects.bulk_create(
+            (Seat(event=event, row=f'R{i // 100}', number=i % 100 + 1, category=category, price=100, is_available=False)
+             for i in range(seat_count)),
+            batch_size=5000,
+        )
+        zone_count = count - seat_count
+        zone = Zone.objects.create(event=event, name='Floor', capacity=zone_count, price=50, held_count=zone_count)
+        users = User.objects.bulk_create(
+            (User(username=f'bench-bulk-{i}', email=f'bench-bulk-{i}@example.com') for i in range(count)),
+            batch_size=5000,
+        )
+        bookings = Booking.objects.bulk_create(
+            (Booking(user=user, event=event, total_price=100,
+                     **({'seat': seats[i]} if i < seat_count else {'zone': zone, 'quantity': 1}))
+             for i, user in enumerate(users)),
+            batch_size=5000,
+        )
+        expires_at = timezone.now() + timedelta(hours=1)
+        SeatHold.objects.bulk_create(
+            (SeatHold(booking=booking, event=event, seat=booking.seat, zone=booking.zone, quantity=1,
+                      expires_at=expires_at) for booking in bookings),
+            batch_size=5000,
+        )
+        return event, zone
+
+    def timed(self, action):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = action()
+            elapsed = time.perf_counter() - started
+        return result, elapsed, len(queries)
+
+    def report(self, label, count, elapsed, queries):
+        self.stdout.write(
+            f'{label:<36} {count:>7} bookings in {elapsed:7.2f}s  {count / elapsed:9,.0f}/s  '
+            f'{queries / max(count, 1):6.2f} statements/booking'
+        )
+
+    def run(self, event, zone, options):
+        bookings = Booking.objects.filter(event=event)
+        chunk_size = options['chunk_size']
+
+        # Booking.save() per row, on a sample, as the admin used to.
+        sample = list(bookings.filter(zone__isnull=False).order_by('pk')[:options['sample'] // 2]) + \
+            list(bookings.filter(seat__isnull=False).order_by('pk')[:options['sample'] // 2])
+
+        def save_each():
+            for booking in sample:
+                booking.is_confirmed = True
+                booking.payment_status = 'paid'
+                booking.save()
+        _, elapsed, queries = self.timed(save_each)
+        self.report('confirm, Booking.save() per row', len(sample), elapsed, queries)
+
+        result, elapsed, queries = self.timed(lambda: bulk_confirm_bookings(bookings, chunk_size=chunk_size))
+        self.report('confirm, bulk_confirm_bookings', result.changed, elapsed, queries)
+        self.stdout.write(f'  {result}')
+
+        problems = []
+        zone.refresh_from_db()
+        if (zone.booked_count, zone.held_count) != (zone.capacity, 0):
+            problems.append(f'after confirm, zone booked {zone.booked_count} held {zone.held_count}')
+        if bookings.filter(ticket_code__isnull=True).exists() or SeatHold.objects.filter(
+                event=event, status=SeatHold.ACTIVE).exists():
+            problems.append('after confirm, bookings without tickets or with active holds')
+
+        result, elapsed, queries = self.timed(lambda: bulk_cancel_bookings(
+            bookings, reason='Event postponed.', chunk_size=chunk_size))
+        self.report('cancel, bulk_cancel_bookings', result.changed, elapsed, queries)
+        self.stdout.write(f'  {result}')
+
+        zone.refresh_from_db()
+        if (zone.booked_count, zone.held_count) != (0, 0):
+            problems.append(f'after cancel, zone booked {zone.booked_count} held {zone.held_count}')
+        taken = Seat.objects.filter(event=event, is_available=False).count()
+        if taken:
+            problems.append(f'after cancel, {taken} seats still taken')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Seats and zone counters are consistent after both runs.'))
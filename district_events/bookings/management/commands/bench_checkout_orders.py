@@ -0,0 +1,96 @@
+import time
+import uuid
+from datetime import date, time as clock
+import razorpay
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from accounts.models import User
+from events.management.synthetic import rolled_back
+from events.models import City, Venue, EventCategory, Event, Zone
+from bookings.gateway import checkout_order
+from bookings.management.fake_razorpay import FakeRazorpay
+from bookings.models import Booking, Payment
+
+
+class Command(BaseCommand):
+    help = ('Time payment page order lookups against a local fake Razorpay with added latency: a new '
+            'client and order per load, as PaymentView used to, against checkout_order() on first load '
+            'and on reload (rolled back afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=300)
+        parser.add_argument('--latency', type=float, default=0.02, help='Seconds the gateway takes per request.')
+        parser.add_argument('--port', type=int, default=8769)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            bookings = self.create_fixture(options['bookings'])
+            with FakeRazorpay(options['port'], latency=options['latency']) as gateway:
+                with override_settings(RAZORPAY_API_URL=gateway.url, RAZORPAY_KEY_ID='rzp_test_bench',
+                                       RAZORPAY_KEY_SECRET='bench'):
+                    self.run(bookings, gateway)
+
+    def create_fixture(self, count):
+        city = City.objects.create(name='Checkout Bench City', state='Bench')
+        venue = Venue.objects.create(name='Checkout Bench Hall', address='1 Checkout Road', city=city, capacity=count)
+        event = Event.objects.create(
+            title='Checkout Bench Night', description='Benchmark event', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date(2030, 1, 1), end_date=date(2030, 1, 1), start_time=clock(19), end_time=clock(22),
+            banner_image_url='http://example.com/banner.png', is_indoor_event=False, is_published=True,
+        )
+        zone = Zone.objects.create(event=event, name='Floor', capacity=count, price=499, held_count=count)
+        users = User.objects.bulk_create(
+            User(username=f'bench-checkout-{i}', email=f'bench-checkout-{i}@example.com') for i in range(count)
+        )
+        return Booking.objects.bulk_create(
+            Booking(user=user, event=event, zone=zone, quantity=1, total_price=499) for user in users
+        )
+
+    def measure(self, label, bookings, gateway, load):
+        before = dict(gateway.stats)
+        orders_before = len(gateway.orders)
+        started = time.perf_counter()
+        for booking in bookings:
+            load(booking)
+        elapsed = time.perf_counter() - started
+        connections = gateway.stats['connections'] - before.get('connections', 0)
+        orders = len(gateway.orders) - orders_before
+        self.stdout.write(
+            f'{label:<34} {len(bookings):>5} loads in {elapsed:6.2f}s  {elapsed / len(bookings) * 1000:7.2f} ms/load  '
+            f'{orders:>5} orders  {connections:>5} connections'
+        )
+        return orders
+
+    def run(self, bookings, gateway):
+        half = len(bookings) // 2
+
+        def new_client_per_load(booking):
+            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+                                     base_url=settings.RAZORPAY_API_URL)
+            order_id = client.order.create(data={
+                'amount': int(booking.total_price * 100), 'currency': 'INR',
+                'receipt': f'booking_{booking.id}', 'payment_capture': 1,
+            })['id']
+            Payment.objects.update_or_create(booking=booking, defaults={
+                'payment_method': 'upi', 'transaction_id': uuid.uuid4().hex[:16], 'amount': booking.total_price,
+                'payment_status': 'pending', 'razorpay_order_id': order_id,
+            })
+
+        self.measure('new client + order per load', bookings[:half], gateway, new_client_per_load)
+        self.measure('checkout_order, first load', bookings[half:], gateway, checkout_order)
+        returned = {}
+        reload_orders = self.measure('checkout_order, reload', bookings[half:], gateway,
+                                     lambda booking: returned.__setitem__(booking.pk, checkout_order(booking).id))
+
+        problems = []
+        if reload_orders:
+            problems.append(f'reloading created {reload_orders} orders')
+        stored = dict(Payment.objects.filter(booking__in=bookings[half:]).values_list('booking_id', 'razorpay_order_id'))
+        mismatched = [pk for pk, order_id in returned.items() if stored.get(pk) != order_id]
+        if mismatched:
+            problems.append(f'{len(mismatched)} bookings check out with an order that is not stored')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Reloads reused the stored orders.'))
@@ -0,0 +1,122 @@
+import time
+from datetime import date, time as clock
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from accounts.models import User
+from events.management.synthetic import rolled_back
+from events.models import City, Venue, EventCategory, Event, Zone
+from bookings.codes import next_ticket_code
+from bookings.management.fake_razorpay import FakeRazorpay
+from bookings.models import Booking, Payment, Refund
+from bookings.refunds import RazorpayRefunds, cancel_event, process_refunds
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+class CrashingGateway(RazorpayRefunds):
+    """Dies after `after` refund requests, like a run killed halfway."""
+
+    def __init__(self, after):
+        super().__init__()
+        self.remaining = after
+
+    def refund(self, payment_id, amount, receipt):
+        self.remaining -= 1
+        if self.remaining < 0:
+            raise SimulatedCrash()
+        return super().refund(payment_id, amount, receipt)
+
+
+class Command(BaseCommand):
+    help = ('Cancel an event with many paid bookings against a local fake Razorpay with a request quota, '
+            'server errors and lost responses; crash the refund run halfway, resume it, and check every '
+            'payment was refunded exactly once (rolled back afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=2_000)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--rate', type=float, default=80, help='Our requests per second.')
+        parser.add_argument('--quota', type=int, default=100, help='Gateway requests per second before 429s.')
+        parser.add_argument('--error-rate', type=float, default=0.03, help='Share of gateway requests failing with 500.')
+        parser.add_argument('--lost-rate', type=float, default=0.03, help='Share of refunds made whose response is lost.')
+        parser.add_argument('--crash-after', type=int, default=500, help='Refund requests before the first run dies.')
+        parser.add_argument('--port', type=int, default=8768)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['payments']} paid bookings...")
+            event = self.create_fixture(options['payments'])
+            with FakeRazorpay(options['port'], options['quota'], options['error_rate'], options['lost_rate']) as gateway:
+                with override_settings(RAZORPAY_API_URL=gateway.url, RAZORPAY_KEY_ID='rzp_test_bench',
+                                       RAZORPAY_KEY_SECRET='bench'):
+                    self.run(event, gateway, options)
+
+    def create_fixture(self, count):
+        city = City.objects.create(name='Refund Bench City', state='Bench')
+        venue = Venue.objects.create(name='Refund Bench Ground', address='1 Refund Road', city=city, capacity=count)
+        event = Event.objects.create(
+            title='Refund Bench Festival', description='Benchmark event', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date(2030, 1, 1), end_date=date(2030, 1, 1), start_time=clock(18), end_time=clock(23),
+            banner_image_url='http://example.com/banner.png', is_indoor_event=False, is_published=True,
+        )
+        zone = Zone.objects.create(event=event, name='Field', capacity=count, price=750, booked_count=count)
+        users = User.objects.bulk_create(
+            User(username=f'bench-refund-{i}', email=f'bench-refund-{i}@example.com') for i in range(count)
+        )
+        bookings = Booking.objects.bulk_create(
+            (Booking(user=user, event=event, zone=zone, quantity=1, total_price=750, is_confirmed=True,
+                     payment_status='paid', ticket_code=next_ticket_code()) for user in users),
+            batch_size=5000,
+        )
+        Payment.objects.bulk_create(
+            (Payment(booking=booking, payment_method='upi', transaction_id=f'txn_refund_{i}', amount=750,
+                     payment_status='paid', razorpay_order_id=f'order_refund_{i}', razorpay_payment_id=f'pay_refund_{i}')
+             for i, booking in enumerate(bookings)),
+            batch_size=5000,
+        )
+        return event
+
+    def run(self, event, gateway, options):
+        result, queued = cancel_event(event, 'Bench event cancelled.')
+        self.stdout.write(f'Cancelled {result.changed} bookings and queued {queued} refunds.')
+
+        started = time.perf_counter()
+        try:
+            process_refunds(event_id=event.pk, workers=options['workers'], rate=options['rate'],
+                            gateway=CrashingGateway(options['crash_after']))
+        except SimulatedCrash:
+            self.stdout.write(f"Run 1 crashed after {options['crash_after']} refund requests; "
+                              f"{Refund.objects.filter(event=event, status=Refund.PROCESSING).count()} refunds left claimed.")
+        with override_settings(REFUND_CLAIM_TIMEOUT=0):
+            summary = process_refunds(event_id=event.pk, workers=options['workers'], rate=options['rate'])
+        elapsed = time.perf_counter() - started
+        requests = sum(count for name, count in gateway.stats.items() if name.startswith('HTTP'))
+        self.stdout.write(
+            f'Run 2 resumed: {summary}. {queued} refunds in {elapsed:.1f}s ({queued / elapsed:.0f}/s), '
+            f'{requests / elapsed:.0f} gateway requests/s against a quota of {options["quota"]}/s.'
+        )
+        self.stdout.write('  Gateway: ' + ', '.join(f'{name} {count}' for name, count in sorted(gateway.stats.items())))
+
+        problems = []
+        payment_ids = set(Payment.objects.filter(booking__event=event).values_list('razorpay_payment_id', flat=True))
+        twice = [payment_id for payment_id, refunds in gateway.refunds.items() if len(refunds) > 1]
+        missing = payment_ids - {payment_id for payment_id, refunds in gateway.refunds.items() if refunds}
+        wrong_amount = [r for refunds in gateway.refunds.values() for r in refunds if r['amount'] != 75000]
+        if twice:
+            problems.append(f'{len(twice)} payments refunded twice')
+        if missing:
+            problems.append(f'{len(missing)} payments never refunded')
+        if wrong_amount:
+            problems.append(f'{len(wrong_amount)} refunds of the wrong amount')
+        unfinished = Refund.objects.filter(event=event).exclude(status=Refund.PROCESSED).count()
+        if unfinished:
+            problems.append(f'{unfinished} refunds not processed')
+        not_refunded = Booking.objects.filter(event=event).exclude(is_cancelled=True, payment_status='refunded').count()
+        if not_refunded:
+            problems.append(f'{not_refunded} bookings not cancelled and marked refunded')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'{len(payment_ids)} payments refunded exactly once.'))
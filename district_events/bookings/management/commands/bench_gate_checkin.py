@@ -0,0 +1,174 @@
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from datetime import date, time as clock
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+from accounts.models import User
+from events.management.loadgen import percentile, read_response, require_file_database, start_server
+from events.models import City, Venue, EventCategory, Event, Zone
+from bookings.models import Booking, CheckIn
+from bookings.tickets import ticket_payload
+from bookings.utils import generate_ticket_code
+
+
+class Command(BaseCommand):
+    help = ('Simulate many gate scanners checking tickets in against a local server and verify '
+            'every ticket was admitted once and recorded once (data is deleted afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=20_000)
+        parser.add_argument('--gates', type=int, default=24, help='Concurrent scanners.')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds of scanning.')
+        parser.add_argument('--rescans', type=float, default=0.1, help='Share of scans of an already used ticket.')
+        parser.add_argument('--invalid', type=float, default=0.02, help='Share of forged or foreign QR codes.')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--port', type=int, default=8766)
+
+    def handle(self, *args, **options):
+        require_file_database()
+        self.stdout.write(f"Seeding {options['tickets']} tickets...")
+        event, codes, staff = self.create_fixture(options['tickets'])
+        try:
+            self.run(event, codes, staff, options)
+        finally:
+            City.objects.filter(pk=event.venue.city_id).delete()
+            User.objects.filter(username__startswith='bench-gate-').delete()
+
+    def create_fixture(self, count):
+        city = City.objects.create(name='Gate Bench City', state='Bench')
+        venue = Venue.objects.create(name='Gate Bench Stadium', address='1 Gate Road', city=city, capacity=count)
+        event = Event.objects.create(
+            title='Gate Bench Festival', description='Benchmark event', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date.today(), end_date=date.today(), start_time=clock(18), end_time=clock(23),
+            banner_image_url='http://example.com/banner.png', is_indoor_event=False,
+        )
+        zone = Zone.objects.create(event=event, name='Field', capacity=count, price=500, booked_count=count)
+        users = User.objects.bulk_create(
+            User(username=f'bench-gate-{i}', email=f'bench-gate-{i}@example.com') for i in range(count)
+        )
+        codes = [generate_ticket_code() for _ in range(count)]
+        Booking.objects.bulk_create(
+            (Booking(user=user, event=event, zone=zone, quantity=1, total_price=500, is_confirmed=True,
+                     payment_status='paid', ticket_code=code) for user, code in zip(users, codes)),
+            batch_size=5000,
+        )
+        staff = User.objects.create(username='bench-gate-staff', email='bench-gate-staff@example.com', is_staff=True)
+        return event, codes, staff
+
+    def session_headers(self, staff):
+        session = SessionStore()
+        session[SESSION_KEY] = str(staff.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = staff.get_session_auth_hash()
+        session.create()
+        csrf = get_random_string(32)
+        return (
+            f'Cookie: {settings.SESSION_COOKIE_NAME}={session.session_key}; {settings.CSRF_COOKIE_NAME}={csrf}\r\n'
+            f'X-CSRFToken: {csrf}\r\n'
+        )
+
+    def run(self, event, codes, staff, options):
+        headers = self.session_headers(staff)
+        payloads = {code: ticket_payload(code, event.pk) for code in codes}
+        unused = list(codes)
+        random.shuffle(unused)
+        used = []
+        stats = Counter()
+        latencies = []
+        admitted = Counter()
+
+        def next_scan():
+            roll = random.random()
+            if roll < options['invalid']:
+                # A forged signature or a ticket for another event.
+                return random.choice([payloads[random.choice(codes)][:-1] + 'A', ticket_payload(codes[0], event.pk + 1)])
+            if (roll < options['invalid'] + options['rescans'] and used) or not unused:
+                return payloads[random.choice(used)]
+            code = unused.pop()
+            used.append(code)
+            return payloads[code]
+
+        def request(method, path, body=b''):
+            return (
+                f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n{headers}'
+                f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'
+            ).encode() + body
+
+        async def gate(number, deadline):
+            reader, writer = await asyncio.open_connection('127.0.0.1', options['port'])
+            path = f'/bookings/checkin/{event.pk}/scan/'
+            try:
+                while time.monotonic() < deadline:
+                    body = json.dumps({'payload': next_scan(), 'gate': f'G{number}'}).encode()
+                    started = time.monotonic()
+                    writer.write(request('POST', path, body))
+                    await writer.drain()
+                    status, response = await read_response(reader)
+                    latencies.append(time.monotonic() - started)
+                    if status != 200:
+                        stats[f'http {status}'] += 1
+                        continue
+                    result = json.loads(response)
+                    stats[result['status']] += 1
+                    if result['status'] == 'admitted':
+                        admitted[result['ticket_code']] += 1
+            finally:
+                writer.close()
+
+        async def manifest():
+            reader, writer = await asyncio.open_connection('127.0.0.1', options['port'])
+            writer.write(request('GET', f'/bookings/checkin/{event.pk}/manifest/'))
+            await writer.drain()
+            status, body = await read_response(reader)
+            writer.close()
+            if status != 200:
+                raise CommandError(f'Manifest request failed with HTTP {status}.')
+            return json.loads(body)
+
+        async def scan_all():
+            deadline = time.monotonic() + options['duration']
+            await asyncio.gather(*(gate(number, deadline) for number in range(1, options['gates'] + 1)))
+
+        process = start_server(options['server'], options['port'])
+        try:
+            started = time.perf_counter()
+            loaded = asyncio.run(manifest())
+            self.stdout.write(f"Doors open: manifest of {len(loaded['tickets'])} tickets and gate index "
+                              f"loaded in {(time.perf_counter() - started) * 1000:.0f}ms")
+            started = time.perf_counter()
+            asyncio.run(scan_all())
+            elapsed = time.perf_counter() - started
+            # Let the server's writer flush what it has queued.
+            time.sleep(settings.CHECKIN_FLUSH_INTERVAL * 2 + 0.5)
+        finally:
+            process.terminate()
+            process.wait(10)
+
+        latencies.sort()
+        scans = len(latencies)
+        self.stdout.write(
+            f"{scans} scans from {options['gates']} gates in {elapsed:.1f}s: {scans / elapsed * 60:,.0f} scans/min, "
+            f"p50 {percentile(latencies, 0.5):.1f}ms, p99 {percentile(latencies, 0.99):.1f}ms"
+        )
+        self.stdout.write('  ' + ', '.join(f'{status} {count}' for status, count in stats.most_common()))
+
+        recorded = set(CheckIn.objects.filter(event=event).values_list('booking__ticket_code', flat=True))
+        twice = [code for code, count in admitted.items() if count > 1]
+        problems = []
+        if twice:
+            problems.append(f'{len(twice)} tickets admitted more than once')
+        if recorded != set(admitted):
+            problems.append(f'{len(set(admitted) - recorded)} admissions not recorded, '
+                            f'{len(recorded - set(admitted))} recorded without admission')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(recorded)} check-ins recorded, each admitted exactly once.'
+        ))
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, time as clock
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+from accounts.models import User
+from events.management.loadgen import percentile, read_response, require_file_database, start_server
+from events.models import City, Venue, EventCategory, Event, Zone
+from bookings.models import Booking, Payment, PaymentWebhookEvent
+
+
+class Command(BaseCommand):
+    help = ('Act as a fake Razorpay gateway: fire signed payment webhooks, with retries, duplicates '
+            'and forgeries, at a local server while workers drain the queue, then check every payment '
+            'was applied exactly once (data is deleted afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=2_000)
+        parser.add_argument('--failures', type=float, default=0.1, help='Share of payments that fail.')
+        parser.add_argument('--duplicates', type=int, default=2, help='Extra deliveries of each event, at most.')
+        parser.add_argument('--forged', type=float, default=0.02, help='Share of deliveries with a bad signature.')
+        parser.add_argument('--connections', type=int, default=32, help='Concurrent gateway connections.')
+        parser.add_argument('--workers', type=int, default=2, help='process_payment_webhooks processes.')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--port', type=int, default=8767)
+        parser.add_argument('--drain-timeout', type=float, default=120)
+
+    def handle(self, *args, **options):
+        require_file_database()
+        secret = settings.RAZORPAY_WEBHOOK_SECRET
+        if not secret:
+            # The server and workers read it from the environment they inherit.
+            secret = os.environ['RAZORPAY_WEBHOOK_SECRET'] = get_random_string(32)
+        self.secret = secret.encode()
+
+        run = get_random_string(6).lower()
+        self.stdout.write(f"Seeding {options['payments']} pending payments...")
+        event, zone, payments = self.create_fixture(run, options['payments'])
+        try:
+            self.run(run, zone, payments, options)
+        finally:
+            PaymentWebhookEvent.objects.filter(razorpay_order_id__startswith=f'order_{run}_').delete()
+            City.objects.filter(pk=event.venue.city_id).delete()
+            User.objects.filter(username__startswith=f'bench-pay-{run}-').delete()
+
+    def create_fixture(self, run, count):
+        city = City.objects.create(name='Payment Bench City', state='Bench')
+        venue = Venue.objects.create(name='Payment Bench Ground', address='1 Gateway Road', city=city, capacity=count)
+        event = Event.objects.create(
+            title='Payment Bench Festival', description='Benchmark event', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date.today(), end_date=date.today(), start_time=clock(18), end_time=clock(23),
+            banner_image_url='http://example.com/banner.png', is_indoor_event=False,
+        )
+        zone = Zone.objects.create(event=event, name='Field', capacity=count, price=500)
+        users = User.objects.bulk_create(
+            User(username=f'bench-pay-{run}-{i}', email=f'bench-pay-{run}-{i}@example.com') for i in range(count)
+        )
+        bookings = Booking.objects.bulk_create(
+            (Booking(user=user, event=event, zone=zone, quantity=1, total_price=500) for user in users),
+            batch_size=5000,
+        )
+        payments = Payment.objects.bulk_create(
+            (Payment(booking=booking, payment_method='upi', transaction_id=f'txn_{run}_{i}', amount=500,
+                     payment_status='pending', razorpay_order_id=f'order_{run}_{i}')
+             for i, booking in enumerate(bookings)),
+            batch_size=5000,
+        )
+        return event, zone, payments
+
+    def deliveries(self, run, payments, options):
+        """Every webhook the fake gateway sends, shuffled: (body, signature, forged)."""
+        outcomes = {}
+        deliveries = []
+        for i, payment in enumerate(payments):
+            failed = random.random() < options['failures']
+            outcomes[payment.razorpay_order_id] = 'failed' if failed else 'paid'
+            kinds = ['payment.failed'] if failed else ['payment.authorized', 'payment.captured']
+            for kind in kinds:
+                body = json.dumps({
+                    'entity': 'event', 'event': kind, 'created_at': int(time.time()),
+                    'payload': {'payment': {'entity': {
+                        'id': f'pay_{run}_{i}', 'order_id': payment.razorpay_order_id, 'amount': 50000,
+                        'currency': 'INR', 'status': 'failed' if failed else kind.split('.')[1],
+                    }}},
+                }).encode()
+                signature = hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+                for _ in range(1 + random.randint(0, options['duplicates'])):
+                    deliveries.append((body, signature, False))
+                if random.random() < options['forged']:
+                    deliveries.append((body, signature[:-1] + ('0' if signature[-1] != '0' else '1'), True))
+        random.shuffle(deliveries)
+        return deliveries, outcomes
+
+    def run(self, run, zone, payments, options):
+        deliveries, outcomes = self.deliveries(run, payments, options)
+        queue = list(reversed(deliveries))
+        latencies = []
+        statuses = Counter()
+        wrong = []
+
+        async def connection():
+            reader, writer = await asyncio.open_connection('127.0.0.1', options['port'])
+            try:
+                while queue:
+                    body, signature, forged = queue.pop()
+                    request = (
+                        f'POST /bookings/payment-webhook/ HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n'
+                        f'Content-Type: application/json\r\nX-Razorpay-Signature: {signature}\r\n'
+                        f'Content-Length: {len(body)}\r\n\r\n'
+                    ).encode() + body
+                    started = time.monotonic()
+                    writer.write(request)
+                    await writer.drain()
+                    status, _ = await read_response(reader)
+                    latencies.append(time.monotonic() - started)
+                    statuses[status] += 1
+                    if (status == 400) != forged:
+                        wrong.append(status)
+            finally:
+                writer.close()
+
+        async def send_all():
+            await asyncio.gather(*(connection() for _ in range(options['connections'])))
+
+        process = start_server(options['server'], options['port'])
+        workers = [
+            subprocess.Popen(
+                [sys.executable, 'manage.py', 'process_payment_webhooks', '--loop', '--interval', '0.2'],
+                cwd=settings.BASE_DIR, env=os.environ.copy(), stdout=subprocess.DEVNULL,
+            )
+            for _ in range(options['workers'])
+        ]
+        pending = PaymentWebhookEvent.objects.filter(
+            razorpay_order_id__startswith=f'order_{run}_',
+            status__in=[PaymentWebhookEvent.PENDING, PaymentWebhookEvent.PROCESSING],
+        )
+        try:
+            started = time.perf_counter()
+            asyncio.run(send_all())
+            sent = time.perf_counter() - started
+            deadline = time.monotonic() + options['drain_timeout']
+            while pending.exists():
+                if time.monotonic() > deadline:
+                    raise CommandError(f'{pending.count()} events still queued after {options["drain_timeout"]}s.')
+                time.sleep(0.1)
+            drained = time.perf_counter() - started
+        finally:
+            for worker in workers:
+                worker.terminate()
+            process.terminate()
+            for child in [*workers, process]:
+                child.wait(10)
+
+        latencies.sort()
+        self.stdout.write(
+            f"{len(latencies)} deliveries over {options['connections']} connections in {sent:.1f}s: "
+            f"{len(latencies) / sent:,.0f}/s acknowledged, p50 {percentile(latencies, 0.5):.1f}ms, "
+            f"p99 {percentile(latencies, 0.99):.1f}ms ({', '.join(f'HTTP {s} x{n}' for s, n in sorted(statuses.items()))})"
+        )
+        self.stdout.write(f"Queue drained by {options['workers']} worker(s) {drained:.1f}s after the first delivery.")
+
+        problems = []
+        if wrong:
+            problems.append(f'{len(wrong)} deliveries answered wrongly (forged accepted or genuine rejected)')
+        events = PaymentWebhookEvent.objects.filter(razorpay_order_id__startswith=f'order_{run}_')
+        if events.count() != len(payments):
+            problems.append(f'{events.count()} events queued for {len(payments)} payments')
+        not_processed = events.exclude(status=PaymentWebhookEvent.PROCESSED).count()
+        if not_processed:
+            problems.append(f'{not_processed} events not processed')
+        paid = sum(outcome == 'paid' for outcome in outcomes.values())
+        payment_statuses = Counter(Payment.objects.filter(pk__in=[p.pk for p in payments]).values_list('payment_status', flat=True))
+        if payment_statuses != Counter(outcomes.values()):
+            problems.append(f'payment statuses {dict(payment_statuses)}, expected {dict(Counter(outcomes.values()))}')
+        confirmed = Booking.objects.filter(event=zone.event_id, is_confirmed=True)
+        codes = set(confirmed.values_list('ticket_code', flat=True))
+        if confirmed.count() != paid or len(codes - {None, ''}) != paid:
+            problems.append(f'{confirmed.count()} bookings confirmed with {len(codes)} ticket codes, expected {paid}')
+        zone.refresh_from_db()
+        if zone.booked_count != paid:
+            problems.append(f'zone booked_count is {zone.booked_count}, expected {paid}')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            f'{paid} payments confirmed and {len(payments) - paid} failed, each exactly once.'
+        ))
@@ -0,0 +1,53 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from bookings import qr
+from bookings.tickets import attach_qr_bitmaps, store_qr_bitmaps, ticket_payload, _qr_cache_key
+from bookings.utils import generate_qr_code, generate_ticket_code
+
+
+class Command(BaseCommand):
+    help = ('Compare per-ticket QR encode time of the old dict payload (bookings.utils.generate_qr_code) '
+            'with the signed compact payload, cold and from the QR cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=500)
+
+    def report(self, label, count, elapsed, detail=''):
+        self.stdout.write(f'{label:<40} {elapsed * 1000 / count:7.2f}ms per ticket  {detail}')
+
+    def handle(self, *args, **options):
+        codes = [generate_ticket_code() for _ in range(options['tickets'])]
+        count = len(codes)
+
+        # What generate_pdf_ticket encodes for a seated booking.
+        legacy = [
+            str({'ticket_code': code, 'event': 'Sunburn Arena Live Tour 2030', 'date': '01 Jan 2030',
+                 'name': 'Aarav Sharma', 'seat': 'AA12'})
+            for code in codes
+        ]
+        started = time.perf_counter()
+        for payload in legacy:
+            generate_qr_code(payload)
+        self.report('dict payload, PNG (current)', count, time.perf_counter() - started,
+                    f'{len(legacy[0])} chars, {self.version(qr.encode(legacy[0]))}')
+
+        payloads = [ticket_payload(code, 1234) for code in codes]
+        started = time.perf_counter()
+        bitmaps = qr.encode_many(payloads)
+        self.report('signed compact payload, bitmap', count, time.perf_counter() - started,
+                    f'{len(payloads[0])} chars, {self.version(bitmaps[0])}')
+
+        fields_list = [{'ticket_code': code, 'qr_data': payload} for code, payload in zip(codes, payloads)]
+        store_qr_bitmaps(fields_list, dict(zip(codes, bitmaps)))
+        try:
+            started = time.perf_counter()
+            attach_qr_bitmaps(fields_list)
+            hits = sum('qr_bitmap' in fields for fields in fields_list)
+            self.report('QR cache, batched lookup', count, time.perf_counter() - started, f'{hits} hits')
+        finally:
+            cache.delete_many([_qr_cache_key(code) for code in codes])
+
+    def version(self, bitmap):
+        size = bitmap[0] - 2 * qr.BORDER
+        return f'version {(size - 17) // 4} ({size}x{size} modules)'
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from datetime import date, time as clock
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from accounts.models import User
+from events.management.synthetic import rolled_back
+from events.models import City, Venue, EventCategory, Event, SeatCategory, Seat, Zone
+from bookings.models import Booking
+from bookings.tickets import get_ticket_pdf, get_ticket_pool, render_tickets, _cache_key
+from bookings.utils import generate_pdf_ticket, generate_ticket_code
+
+
+class Command(BaseCommand):
+    help = ('Compare ticket PDF throughput (tickets/sec) of bookings.utils.generate_pdf_ticket with '
+            'the skeleton renderer, inline and in the process pool, cold and cached (rolled back afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent downloads in the threaded run.')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            bookings = self.create_bookings(options['tickets'])
+            try:
+                self.run(bookings, options)
+            finally:
+                cache.delete_many([_cache_key(booking.ticket_code) for booking in bookings])
+                get_ticket_pool.cache_clear()
+
+    def create_bookings(self, count):
+        city = City.objects.create(name='Bench City', state='Bench')
+        venue = Venue.objects.create(name='Bench Arena', address='1 Bench Road', city=city, capacity=count)
+        event = Event.objects.create(
+            title='Bench Night Live', description='Benchmark event', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date(2030, 1, 1), end_date=date(2030, 1, 1),
+            start_time=clock(19), end_time=clock(22), banner_image_url='http://example.com/banner.png',
+            is_indoor_event=True,
+        )
+        category = SeatCategory.objects.get_or_create(name='Bench')[0]
+        seats = Seat.objects.bulk_create(
+            Seat(event=event, row=chr(65 + i // 50), number=i % 50 + 1, category=category, price=100, is_available=False)
+            for i in range(count // 2)
+        )
+        zone = Zone.objects.create(event=event, name='Floor', capacity=count, price=50)
+        users = User.objects.bulk_create(
+            User(username=f'bench-ticket-{i}', email=f'bench-ticket-{i}@example.com',
+                 first_name='Bench', last_name=f'Guest {i}')
+            for i in range(count)
+        )
+        Booking.objects.bulk_create(
+            Booking(
+                user=user, event=event, total_price=100, is_confirmed=True, payment_status='paid',
+                ticket_code=generate_ticket_code(),
+                **({'seat': seats[i]} if i < len(seats) else {'zone': zone, 'quantity': 2}),
+            )
+            for i, user in enumerate(users)
+        )
+        return list(Booking.objects.filter(event=event).select_related('event__venue', 'seat', 'zone', 'user'))
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f'{label:<44} {count / elapsed:8.1f} tickets/s  ({elapsed * 1000 / count:6.1f}ms each)')
+
+    def timed(self, label, bookings, render):
+        started = time.perf_counter()
+        for booking in bookings:
+            render(booking)
+        self.report(label, len(bookings), time.perf_counter() - started)
+
+    def threaded(self, label, bookings, threads):
+        chunks = [bookings[i::threads] for i in range(threads)]
+        workers = [threading.Thread(target=lambda chunk: [get_ticket_pdf(b) for b in chunk], args=(chunk,))
+                   for chunk in chunks]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.report(label, len(bookings), time.perf_counter() - started)
+
+    def clear(self, bookings):
+        cache.delete_many([_cache_key(booking.ticket_code) for booking in bookings])
+
+    def run(self, bookings, options):
+        count = len(bookings)
+        self.timed('generate_pdf_ticket (current)', bookings, generate_pdf_ticket)
+
+        with override_settings(TICKET_RENDER_WORKERS=0):
+            get_ticket_pool.cache_clear()
+            self.clear(bookings)
+            self.timed('skeleton renderer, inline, cold cache', bookings, get_ticket_pdf)
+            self.timed('cached', bookings, get_ticket_pdf)
+            self.clear(bookings)
+            self.threaded(f"inline, {options['threads']} threads", bookings, options['threads'])
+
+        with override_settings(TICKET_RENDER_WORKERS=options['workers']):
+            get_ticket_pool.cache_clear()
+            pool = get_ticket_pool()
+            # Start the workers outside the timings.
+            list(pool.map(abs, range(options['workers'])))
+            self.clear(bookings)
+            started = time.perf_counter()
+            rendered = sum(1 for _ in render_tickets(bookings))
+            self.report(f"pool of {options['workers']}, batched, cold cache", rendered, time.perf_counter() - started)
+            self.clear(bookings)
+            self.threaded(f"pool of {options['workers']}, {options['threads']} threads", bookings, options['threads'])
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f'Rendered {count} tickets per run.'))
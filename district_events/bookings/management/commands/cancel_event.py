@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from events.models import Event
+from bookings.refunds import cancel_event, process_refunds
+
+
+class Command(BaseCommand):
+    help = ('Cancel an event: unpublish it, cancel every booking and refund every paid one through '
+            'Razorpay. Safe to run again; it resumes where a crashed run stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--reason', default='Event cancelled.')
+        parser.add_argument('--no-refunds', action='store_true', help='Only queue the refunds.')
+        parser.add_argument('--workers', type=int, help='Gateway threads (default REFUND_WORKERS).')
+        parser.add_argument('--rate', type=float, help='Gateway requests per second (default REFUND_RATE_LIMIT).')
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_id']} does not exist.")
+
+        result, queued = cancel_event(event, options['reason'])
+        self.stdout.write(f"{event.title}: cancelled {result.changed} bookings ({result.skipped} already cancelled), "
+                          f"released {result.seats} seats, queued {queued} refunds.")
+        if options['no_refunds']:
+            return
+        summary = process_refunds(event_id=event.pk, workers=options['workers'], rate=options['rate'])
+        self.stdout.write(f"Refunded {summary.processed}, failed {summary.failed}, retried {summary.retried}.")
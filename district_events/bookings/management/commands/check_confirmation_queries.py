@@ -0,0 +1,124 @@
+import uuid
+from datetime import date, time as clock
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from accounts.models import User
+from events.management.synthetic import rolled_back
+from events.models import City, Venue, EventCategory, Event, SeatCategory, Seat, Zone
+from bookings.codes import next_ticket_code
+from bookings.models import Payment
+from bookings.services import confirm_booking, reserve_seat, reserve_zone
+
+# Statements per confirm_booking() call. The savepoint and its release are
+# counted because confirmations normally run inside a request or batch
+# transaction. Ticket codes come from an already reserved block.
+EXPECTED = {
+    # SAVEPOINT, UPDATE hold, UPDATE booking, UPDATE zone, UPDATE payment (no row), INSERT payment, RELEASE
+    'zone, new payment': 7,
+    # SAVEPOINT, UPDATE hold, UPDATE booking, UPDATE zone, UPDATE payment, RELEASE
+    'zone, existing payment': 6,
+    # SAVEPOINT, UPDATE hold, UPDATE booking, UPDATE payment (no row), INSERT payment, RELEASE
+    'seat, new payment': 6,
+    # SAVEPOINT, UPDATE hold (no row), SELECT expired hold, UPDATE booking (no row), RELEASE
+    'already confirmed': 5,
+}
+
+
+class Command(BaseCommand):
+    help = ('Check the exact number of SQL statements bookings.services.confirm_booking issues per '
+            'confirmation, against the old Payment.save cascade (rolled back afterwards).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-sql', action='store_true', help='Print the statements of each scenario.')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def create_event(self):
+        city = City.objects.create(name='Confirm Check City', state='Bench')
+        venue = Venue.objects.create(name='Confirm Check Hall', address='1 Check Road', city=city, capacity=100)
+        event = Event.objects.create(
+            title='Confirm Check Night', description='Query count check', venue=venue,
+            category=EventCategory.objects.get_or_create(name='Bench')[0],
+            start_date=date(2030, 1, 1), end_date=date(2030, 1, 1),
+            start_time=clock(19), end_time=clock(22), banner_image_url='http://example.com/banner.png',
+        )
+        category = SeatCategory.objects.get_or_create(name='Bench')[0]
+        seats = Seat.objects.bulk_create(
+            Seat(event=event, row='A', number=number, category=category, price=100) for number in range(1, 11)
+        )
+        zone = Zone.objects.create(event=event, name='Floor', capacity=100, price=50)
+        return event, seats, zone
+
+    def run(self, options):
+        event, seats, zone = self.create_event()
+        users = iter(User.objects.bulk_create(
+            User(username=f'confirm-check-{i}', email=f'confirm-check-{i}@example.com') for i in range(20)
+        ))
+        # Reserve a block of ticket codes up front, as a warm process has.
+        next_ticket_code()
+
+        def existing_payment(booking):
+            return Payment.objects.bulk_create([Payment(
+                booking=booking, payment_method='upi', transaction_id=uuid.uuid4().hex[:16],
+                amount=booking.total_price, payment_status='pending', razorpay_order_id=f'order_check_{booking.pk}',
+            )])[0]
+
+        def legacy(booking):
+            # What PaymentView.post did before: get_or_create the Payment
+            # (whose save() saves the booking) and then save the booking again.
+            payment, created = Payment.objects.get_or_create(booking=booking, defaults={
+                'payment_method': 'upi', 'transaction_id': uuid.uuid4().hex[:16],
+                'amount': booking.total_price, 'payment_status': 'paid',
+            })
+            booking.payment_status = 'paid'
+            booking.is_confirmed = True
+            booking.ticket_code = next_ticket_code()
+            booking.save()
+
+        def zone_booking():
+            return reserve_zone(next(users), event, zone, 2)
+
+        def seat_booking():
+            return reserve_seat(next(users), event, seats[0])
+
+        # (scenario, reserve a booking, confirm_booking arguments prepared beforehand)
+        scenarios = [
+            ('zone, new payment', zone_booking, lambda booking: {'payment_method': 'upi'}),
+            ('zone, existing payment', zone_booking,
+             lambda booking: {'payment': existing_payment(booking), 'razorpay_payment_id': 'pay_check'}),
+            ('seat, new payment', seat_booking, lambda booking: {'payment_method': 'upi'}),
+        ]
+
+        failures = []
+        for name, reserve, arguments in scenarios:
+            booking = reserve()
+            kwargs = arguments(booking)
+            failures += self._check_scenario(name, lambda: confirm_booking(booking, **kwargs), options)
+            if name == 'zone, new payment':
+                failures += self._check_scenario('already confirmed', lambda: confirm_booking(booking, **kwargs), options)
+
+        booking = zone_booking()
+        with CaptureQueriesContext(connection) as queries:
+            legacy(booking)
+        self.stdout.write(f"{'old Payment.save cascade (zone)':<32} {len(queries):>3} statements")
+
+        zone.refresh_from_db()
+        # Three zone bookings of two places each were confirmed.
+        if (zone.booked_count, zone.held_count) != (6, 0):
+            failures.append(f'zone counters are booked {zone.booked_count}, held {zone.held_count}; expected 6 and 0')
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('confirm_booking statement counts match.'))
+
+    def _check_scenario(self, name, confirm, options):
+        with CaptureQueriesContext(connection) as queries:
+            confirm()
+        count, expected = len(queries), EXPECTED[name]
+        self.stdout.write(f'{name:<32} {count:>3} statements (expected {expected})')
+        if options['verbose_sql'] or count != expected:
+            for query in queries:
+                self.stdout.write(f"    {query['sql']}")
+        return [] if count == expected else [f'{name}: {count} statements, expected {expected}']
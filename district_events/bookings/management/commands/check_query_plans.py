@@ -0,0 +1,123 @@
+import re
+from collections import namedtuple
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from events.models import Seat
+from bookings.models import Booking, CheckIn, Payment, PaymentWebhookEvent, Refund, SeatHold
+
+# Tables that grow with sales. A hot query may read a whole table of cities
+# or categories, but never one of these.
+LARGE_TABLES = {model._meta.db_table for model in (Booking, CheckIn, Payment, PaymentWebhookEvent, Refund, SeatHold, Seat)}
+
+# presorted: the query's ORDER BY must come from an index, not a sort step.
+Query = namedtuple('Query', 'label queryset presorted', defaults=(False,))
+
+# Full scans and sort steps in EXPLAIN output, per backend.
+SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?"?(\w+)'),
+    'postgresql': re.compile(r'Seq Scan on "?(\w+)'),
+}
+SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'(?:^|->)\s*(?:Incremental )?Sort\b', re.MULTILINE),
+}
+
+
+def hot_queries():
+    """The lookups behind the booking, payment and queue paths, with placeholder values."""
+    now = timezone.now()
+    today = now.date()
+    mine = Booking.objects.filter(user_id=1)
+    claimable_events = PaymentWebhookEvent.objects.filter(
+        Q(status=PaymentWebhookEvent.PENDING)
+        | Q(status=PaymentWebhookEvent.PROCESSING, claimed_at__lt=now - timedelta(minutes=5)),
+    )
+    claimable_refunds = Refund.objects.filter(
+        Q(status=Refund.PENDING) | Q(status=Refund.PROCESSING, claimed_at__lt=now - timedelta(minutes=5)),
+    )
+    return [
+        # Payments
+        Query('callback: payment by order id',
+              Payment.objects.select_related('booking').filter(razorpay_order_id='order_0')),
+        Query('webhooks: payments by order ids',
+              Payment.objects.select_related('booking').filter(razorpay_order_id__in=['order_0', 'order_1'])),
+        Query('payment by gateway payment id', Payment.objects.filter(razorpay_payment_id='pay_0')),
+        Query('payment admin: id search', Payment.objects.filter(
+            Q(transaction_id='0') | Q(razorpay_order_id='0') | Q(razorpay_payment_id='0'))),
+        Query('checkout: payment of a booking', Payment.objects.filter(booking_id=1).exclude(payment_status='paid')),
+        Query('refunds: payments to refund of an event', Payment.objects.filter(
+            booking__event_id=1, payment_status='paid', razorpay_payment_id__isnull=False, refund__isnull=True,
+        ).values_list('pk', 'booking__event_id', 'amount')),
+        # Bookings
+        Query('my bookings', mine, presorted=True),
+        Query('my bookings: upcoming', mine.filter(
+            is_confirmed=True, is_cancelled=False, event__start_date__gte=today), presorted=True),
+        Query('my bookings: past', mine.filter(
+            is_confirmed=True, is_cancelled=False, event__end_date__lt=today), presorted=True),
+        Query('my bookings: cancelled', mine.filter(is_cancelled=True), presorted=True),
+        Query('my bookings: pending', mine.filter(is_confirmed=False, is_cancelled=False), presorted=True),
+        Query('confirmed bookings of a zone', Booking.objects.filter(zone_id=1, is_confirmed=True)),
+        Query('booking by ticket code', Booking.objects.filter(ticket_code='0')),
+        Query('gate manifest', Booking.objects.filter(
+            event_id=1, is_confirmed=True, ticket_code__isnull=False,
+        ).values_list('pk', 'ticket_code', 'is_cancelled', 'seat__row', 'seat__number', 'zone__name', 'quantity')),
+        Query('check-ins of an event', CheckIn.objects.filter(event_id=1).values_list('booking_id', 'gate', 'scanned_at')),
+        Query('bulk actions: live bookings of an event', Booking.objects.filter(
+            event_id=1, is_cancelled=False).order_by('pk').values_list('pk', flat=True)),
+        Query('seat holders', Booking.objects.filter(seat_id=1, is_cancelled=False)),
+        Query('seats of an event', Seat.objects.filter(event_id=1)),
+        # Queues
+        Query('hold sweeper: lapsed holds',
+              SeatHold.objects.filter(status=SeatHold.ACTIVE, expires_at__lte=now).values_list('pk')),
+        Query('hold sweeper: lapsed holds of an event',
+              SeatHold.objects.filter(event_id=1, status=SeatHold.ACTIVE, expires_at__lte=now).values_list('pk')),
+        Query('holds of a booking', SeatHold.objects.filter(booking_id=1, status=SeatHold.ACTIVE)),
+        Query('webhooks: claimable events', claimable_events.order_by('pk').values_list('pk', flat=True)[:100]),
+        Query('webhooks: claimable events of a payment',
+              claimable_events.filter(razorpay_payment_id='pay_0').order_by('pk').values_list('pk', flat=True)[:100]),
+        Query('refunds: claimable refunds', claimable_refunds.order_by('pk').values_list('pk', flat=True)[:200]),
+        Query('refunds: claimable refunds of an event',
+              claimable_refunds.filter(event_id=1).order_by('pk').values_list('pk', flat=True)[:200]),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Run EXPLAIN on the hot booking and payment queries and fail if any reads a whole large table, '
+            'or sorts where an index should give the order. Run it after changing models or migrations.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', action='store_true', help='Print the plan of every query.')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SCAN:
+            raise CommandError(f'Query plans can only be checked on SQLite or PostgreSQL, not {vendor}.')
+        failures = []
+        for query in hot_queries():
+            plan = self.explain(query.queryset)
+            problems = sorted({table for table in SCAN[vendor].findall(plan) if table in LARGE_TABLES})
+            problems = [f'full scan of {table}' for table in problems]
+            if query.presorted and SORT[vendor].search(plan):
+                problems.append('sorts instead of reading an index in order')
+            if problems:
+                failures.append(query.label)
+                self.stdout.write(self.style.ERROR(f'{query.label:<46} {"; ".join(problems)}'))
+            else:
+                self.stdout.write(f'{query.label:<46} ok')
+            if options['plans'] or problems:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+        if failures:
+            raise CommandError(f'{len(failures)} of the hot queries lost their index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Every hot query is served by an index.'))
+
+    def explain(self, queryset):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # On a small database a sequential scan is cheaper and would be
+                # chosen anyway; turning it off shows whether an index exists.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
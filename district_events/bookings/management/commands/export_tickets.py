@@ -0,0 +1,42 @@
+import resource
+import time
+from django.core.management.base import BaseCommand, CommandError
+from events.models import Event
+from bookings.exports import FORMATS, exportable_bookings, stream_tickets
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Export every confirmed ticket of an event as one multi-page PDF or a ZIP of PDFs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--format', choices=sorted(FORMATS), default='pdf')
+        parser.add_argument('--output', help='Defaults to tickets_event_<id>.<format>.')
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_id']} does not exist.")
+
+        bookings = Booking.objects.filter(event=event)
+        count = exportable_bookings(bookings).count()
+        if not count:
+            raise CommandError(f'{event.title} has no confirmed tickets.')
+        output = options['output'] or f"tickets_event_{event.pk}.{options['format']}"
+
+        self.stdout.write(f'Exporting {count} tickets of {event.title} to {output}...')
+        started = time.perf_counter()
+        size = 0
+        with open(output, 'wb') as file:
+            for data in stream_tickets(bookings, options['format']):
+                file.write(data)
+                size += len(data)
+        elapsed = time.perf_counter() - started
+        # ru_maxrss is in kilobytes on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {size / 1024 / 1024:.1f} MB in {elapsed:.1f}s ({count / elapsed:.0f} tickets/s), '
+            f'peak memory {peak:.0f} MB.'
+        ))
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from bookings.webhooks import process_payment_events
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Razorpay payment webhook events to their payments and bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep processing until interrupted.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds between polls of an empty queue with --loop.')
+        parser.add_argument('--batch-size', type=int, help='Events per transaction (default PAYMENT_WEBHOOK_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_payment_events(batch_size=options['batch_size'])
+            if processed or not options['loop']:
+                self.stdout.write(f"Processed {processed} payment event(s).")
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from bookings.refunds import process_refunds
+
+
+class Command(BaseCommand):
+    help = 'Issue queued Razorpay refunds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Only refunds of this event id.')
+        parser.add_argument('--loop', action='store_true', help='Keep processing until interrupted.')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between polls of an empty queue with --loop.')
+        parser.add_argument('--workers', type=int, help='Gateway threads (default REFUND_WORKERS).')
+        parser.add_argument('--rate', type=float, help='Gateway requests per second (default REFUND_RATE_LIMIT).')
+
+    def handle(self, *args, **options):
+        while True:
+            summary = process_refunds(event_id=options['event'], workers=options['workers'], rate=options['rate'])
+            if any(summary) or not options['loop']:
+                self.stdout.write(f"Refunded {summary.processed}, failed {summary.failed}, retried {summary.retried}.")
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
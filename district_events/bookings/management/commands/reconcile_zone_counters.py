@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from events.models import Zone
+from bookings.models import Booking, SeatHold
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Zone.booked_count and Zone.held_count from bookings and active seat holds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Only reconcile zones of this event id.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        booked = Coalesce(Subquery(
+            Booking.objects.filter(zone=OuterRef('pk'), is_confirmed=True, is_cancelled=False)
+            .values('zone').annotate(total=Sum('quantity')).values('total')
+        ), 0)
+        held = Coalesce(Subquery(
+            SeatHold.objects.filter(zone=OuterRef('pk'), status=SeatHold.ACTIVE)
+            .values('zone').annotate(total=Sum('quantity')).values('total')
+        ), 0)
+
+        zones = Zone.objects.all()
+        if options['event']:
+            zones = zones.filter(event_id=options['event'])
+
+        with transaction.atomic():
+            drifted = zones.annotate(actual_booked=booked, actual_held=held).exclude(
+                Q(booked_count=F('actual_booked')) & Q(held_count=F('actual_held'))
+            )
+            drifted_ids = []
+            for zone in drifted.select_related('event'):
+                self.stdout.write(
+                    f"{zone}: booked_count={zone.booked_count} (actual {zone.actual_booked}), "
+                    f"held_count={zone.held_count} (actual {zone.actual_held})"
+                )
+                drifted_ids.append(zone.pk)
+
+            fixed = 0
+            if drifted_ids and not options['dry_run']:
+                fixed = Zone.objects.filter(pk__in=drifted_ids).update(booked_count=booked, held_count=held)
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} zone counter(s)."))
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from bookings.services import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release seat holds whose payment window has lapsed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Only sweep holds of this event id.')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping until interrupted.')
+        parser.add_argument('--interval', type=float, default=15, help='Seconds between sweeps with --loop.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        while True:
+            expired = release_expired_holds(event_id=options['event'], batch_size=options['batch_size'])
+            if expired or not options['loop']:
+                self.stdout.write(f"Released {expired} expired hold(s).")
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
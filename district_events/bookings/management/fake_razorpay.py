@@ -0,0 +1,138 @@
+"""
+A local stand-in for the Razorpay orders and refunds API, for the benchmark
+commands.
+
+FakeRazorpay serves POST /v1/orders, POST /v1/payments/<id>/refund and GET
+/v1/payments/<id>/refunds from a thread. It can add latency to every
+request, enforces a per-second request quota (429), fails a share of
+refund requests with a 500, and can "lose" a share of refund responses:
+the refund is made but the client gets a 500. That last case is the one
+that refunds twice unless the client checks before retrying.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeRazorpay:
+    def __init__(self, port, quota=None, error_rate=0.0, lost_rate=0.0, latency=0.0):
+        self.quota = quota
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lost_rate = lost_rate
+        self.refunds = defaultdict(list)  # payment id -> refund entities
+        self.orders = {}  # order id -> order entity
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.window = (0, 0)  # (second, requests in it)
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def over_quota(self):
+        if not self.quota:
+            return False
+        with self.lock:
+            second, count = self.window
+            now = int(time.monotonic())
+            count = count + 1 if now == second else 1
+            self.window = (now, count)
+            return count > self.quota
+
+    def refund(self, payment_id, data):
+        """Returns (status, body)."""
+        with self.lock:
+            refunds = self.refunds[payment_id]
+            if refunds:
+                return 400, {'error': {'code': 'BAD_REQUEST_ERROR',
+                                       'description': 'The payment has been fully refunded already'}}
+            entity = {
+                'id': f'rfnd_{payment_id}_{len(refunds) + 1}', 'entity': 'refund', 'payment_id': payment_id,
+                'amount': data.get('amount'), 'receipt': data.get('receipt'), 'status': 'processed',
+            }
+            refunds.append(entity)
+        if random.random() < self.lost_rate:
+            self.stats['lost responses'] += 1
+            return 500, {'error': {'code': 'SERVER_ERROR', 'description': 'Lost response'}}
+        return 200, entity
+
+    def order(self, data):
+        with self.lock:
+            entity = {
+                'id': f'order_{len(self.orders) + 1}', 'entity': 'order', 'amount': data.get('amount'),
+                'currency': data.get('currency'), 'receipt': data.get('receipt'), 'status': 'created',
+            }
+            self.orders[entity['id']] = entity
+        return 200, entity
+
+    def handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with gateway.lock:
+                    gateway.stats['connections'] += 1
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with gateway.lock:
+                    gateway.stats[f'HTTP {status}'] += 1
+
+            def route(self, method):
+                if gateway.latency:
+                    time.sleep(gateway.latency)
+                length = int(self.headers.get('Content-Length') or 0)
+                data = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if method == 'POST' and parts == ['v1', 'orders']:
+                    if gateway.over_quota():
+                        return self.reply(429, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Too many requests'}})
+                    return self.reply(*gateway.order(data))
+                if len(parts) != 4 or parts[:2] != ['v1', 'payments']:
+                    return self.reply(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+                if gateway.over_quota():
+                    return self.reply(429, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Too many requests'}})
+                if random.random() < gateway.error_rate:
+                    return self.reply(500, {'error': {'code': 'SERVER_ERROR', 'description': 'Internal error'}})
+                payment_id, action = parts[2], parts[3]
+                if method == 'POST' and action == 'refund':
+                    return self.reply(*gateway.refund(payment_id, data))
+                if method == 'GET' and action == 'refunds':
+                    with gateway.lock:
+                        items = list(gateway.refunds.get(payment_id, []))
+                    return self.reply(200, {'entity': 'collection', 'count': len(items), 'items': items})
+                return self.reply(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+
+            def do_GET(self):
+                self.route('GET')
+
+            def do_POST(self):
+                self.route('POST')
+
+        return Handler
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_seat_holds'),
+        ('events', '0012_compact_seating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckIn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gate', models.CharField(max_length=50)),
+                ('scanned_at', models.DateTimeField()),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='check_in', to='bookings.booking')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_ins', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Check-in',
+                'verbose_name_plural': 'Check-ins',
+                'ordering': ['-scanned_at'],
+            },
+        ),
+    ]
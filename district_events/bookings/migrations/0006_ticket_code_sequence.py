@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    apps.get_model('bookings', 'TicketCodeSequence').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_check_ins'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ticket Code Sequence',
+            },
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_ticket_code_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='razorpay_order_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('razorpay_payment_id', models.CharField(max_length=100)),
+                ('razorpay_order_id', models.CharField(max_length=100)),
+                ('razorpay_signature', models.CharField(blank=True, max_length=200)),
+                ('outcome', models.CharField(choices=[('paid', 'Paid'), ('failed', 'Failed')], max_length=20)),
+                ('source', models.CharField(choices=[('webhook', 'Webhook'), ('callback', 'Checkout callback')], default='webhook', max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('error', 'Error')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Payment Webhook Event',
+                'verbose_name_plural': 'Payment Webhook Events',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['status', 'claimed_at'], name='bookings_pa_status_576ac5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('razorpay_payment_id', 'outcome'), name='unique_payment_outcome')],
+            },
+        ),
+    ]
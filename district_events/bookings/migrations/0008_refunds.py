@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_payment_webhook_events'),
+        ('events', '0012_compact_seating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Refund',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('razorpay_refund_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refunds', to='events.event')),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='refund', to='bookings.payment')),
+            ],
+            options={
+                'verbose_name': 'Refund',
+                'verbose_name_plural': 'Refunds',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'claimed_at'], name='bookings_re_status_c72afc_idx'), models.Index(fields=['event', 'status'], name='bookings_re_event_i_87bcb7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_refunds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='razorpay_order_created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
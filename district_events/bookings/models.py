@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DEFERRED, F, Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from events.models import Event, Seat, Zone
@@ -37,7 +38,97 @@ class Booking(models.Model):
 
     def __str__(self):
         return f"Booking #{self.id} - {self.user.username} - {self.event.title}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if value is not DEFERRED
+        }
+        return instance
+
+    def _inventory_values(self):
+        return {
+            'seat_id': self.seat_id,
+            'zone_id': self.zone_id,
+            'quantity': self.quantity,
+            'is_confirmed': self.is_confirmed,
+            'is_cancelled': self.is_cancelled,
+        }
+
+    def _seat_claim(self, values):
+        """Return the seat id held by a booking with these values, or None."""
+        if not values.get('seat_id') or values.get('is_cancelled', False):
+            return None
+        return values['seat_id']
+
+    def _zone_claim(self, values):
+        """Return (zone_id, quantity) counted against Zone.booked_count, or None."""
+        if not values.get('zone_id') or not values.get('is_confirmed') or values.get('is_cancelled'):
+            return None
+        return values['zone_id'], values['quantity']
+
+    def _update_inventory(self):
+        """
+        Apply this booking's state transition to Seat.is_available, its
+        SeatHold and the Zone booked/held counters.
+        """
+        from .services import claim_seat, release_seat, settle_hold, SeatUnavailable
+        from events.availability import zones_changed
+
+        loaded = getattr(self, '_loaded_values', {})
+        current = self._inventory_values()
+
+        before, after = self._seat_claim(loaded), self._seat_claim(current)
+        if before != after:
+            if before:
+                release_seat(before, self.event_id, booking_id=self.pk)
+            if after and not claim_seat(after, self.event_id):
+                raise SeatUnavailable(f"Seat {after} is already booked.")
+
+        zone_deltas = {}
+        before, after = self._zone_claim(loaded), self._zone_claim(current)
+        if before != after:
+            if before:
+                zone_deltas.setdefault(before[0], {'booked_count': 0, 'held_count': 0})['booked_count'] -= before[1]
+            if after:
+                zone_deltas.setdefault(after[0], {'booked_count': 0, 'held_count': 0})['booked_count'] += after[1]
+
+        was_cancelled = loaded.get('is_cancelled', False)
+        was_confirmed = loaded.get('is_confirmed', False) and not was_cancelled
+        if self.pk and not was_cancelled and not was_confirmed:
+            hold_status = None
+            if self.is_cancelled:
+                hold_status = SeatHold.RELEASED
+            elif self.is_confirmed:
+                hold_status = SeatHold.CONVERTED
+            if hold_status and settle_hold(self, hold_status) and self.zone_id:
+                zone_deltas.setdefault(self.zone_id, {'booked_count': 0, 'held_count': 0})['held_count'] -= self.quantity
+
+        for zone_id, deltas in zone_deltas.items():
+            changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+            if changes:
+                Zone.objects.filter(pk=zone_id).update(**changes)
+                zones_changed(self.event_id)
     
+    def _release_inventory(self):
+        """
+        Give back the seat, hold and zone places of a booking being deleted,
+        as cancelling it would.
+        """
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = self._inventory_values()
+        if self._loaded_values.get('is_cancelled'):
+            return
+        self.is_cancelled = True
+        self._update_inventory()
+        if self.ticket_code:
+            from .checkin import ticket_cancelled
+            from .tickets import invalidate_ticket
+            ticket_code, event_id = self.ticket_code, self.event_id
+            transaction.on_commit(lambda: invalidate_ticket(ticket_code))
+            transaction.on_commit(lambda: ticket_cancelled(event_id, ticket_code))
+
     def clean(self):
         """Validate the booking based on event type and availability."""
 
@@ -68,12 +159,8 @@ class Booking(models.Model):
                 self.total_price = self.zone.price * self.quantity
 
         if self.is_confirmed and not self.ticket_code:
-            from .utils import generate_ticket_code  
-            self.ticket_code = generate_ticket_code()
-
-        if self.is_confirmed and self.seat:
-            self.seat.is_available = False
-            self.seat.save()
+            from .codes import next_ticket_code
+            self.ticket_code = next_ticket_code()
 
         if self.payment_status == 'paid' and not self.payment_date:
             self.payment_date = timezone.now()
@@ -81,16 +168,90 @@ class Booking(models.Model):
         if self.is_cancelled and not self.cancellation_date:
             self.cancellation_date = timezone.now()
 
-            if self.seat:
-                self.seat.is_available = True
-                self.seat.save()
-        
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            self._update_inventory()
+            super().save(*args, **kwargs)
+            if self.is_cancelled and self.ticket_code and not getattr(self, '_loaded_values', {}).get('is_cancelled'):
+                from .checkin import ticket_cancelled
+                from .tickets import invalidate_ticket
+                ticket_code, event_id = self.ticket_code, self.event_id
+                transaction.on_commit(lambda: invalidate_ticket(ticket_code))
+                transaction.on_commit(lambda: ticket_cancelled(event_id, ticket_code))
+
+        self._loaded_values = self._inventory_values()
     
     class Meta:
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
         ordering = ['-booking_date']
+        indexes = [
+            # A user's bookings, newest first, without a sort (UserBookingsView).
+            models.Index(fields=['user', '-booking_date'], name='booking_user_date'),
+        ]
+
+class SeatHold(models.Model):
+    """Time-boxed reservation of a seat or zone capacity while the user pays."""
+    ACTIVE = 'active'
+    CONVERTED = 'converted'
+    RELEASED = 'released'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (CONVERTED, 'Converted'),
+        (RELEASED, 'Released'),
+        (EXPIRED, 'Expired'),
+    ]
+
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='hold')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='seat_holds')
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name='holds', null=True, blank=True)
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='holds', null=True, blank=True)
+    quantity = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACTIVE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    released_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Hold for booking #{self.booking_id} ({self.status})"
+
+    @property
+    def is_expired(self):
+        return self.status == self.EXPIRED or (self.status == self.ACTIVE and self.expires_at <= timezone.now())
+
+    class Meta:
+        verbose_name = 'Seat Hold'
+        verbose_name_plural = 'Seat Holds'
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+            models.Index(fields=['event', 'status', 'expires_at']),
+        ]
+
+class TicketCodeSequence(models.Model):
+    """The counter ticket codes are numbered from (bookings.codes). A single row."""
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Ticket code sequence at {self.next_value}"
+
+    class Meta:
+        verbose_name = 'Ticket Code Sequence'
+
+class CheckIn(models.Model):
+    """A ticket scanned in at a venue gate. One per booking: the first scan wins."""
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='check_in')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='check_ins')
+    gate = models.CharField(max_length=50)
+    scanned_at = models.DateTimeField()
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Check-in of booking #{self.booking_id} at {self.gate}"
+
+    class Meta:
+        verbose_name = 'Check-in'
+        verbose_name_plural = 'Check-ins'
+        ordering = ['-scanned_at']
 
 class Payment(models.Model):
     """Model for payment records."""
@@ -109,7 +270,8 @@ class Payment(models.Model):
     currency = models.CharField(max_length=3, default='INR')
     payment_date = models.DateTimeField(auto_now_add=True)
     payment_status = models.CharField(max_length=20, choices=Booking.PAYMENT_STATUS_CHOICES)
-    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    razorpay_order_created_at = models.DateTimeField(blank=True, null=True)
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     razorpay_signature = models.CharField(max_length=200, blank=True, null=True)
     
@@ -133,6 +295,111 @@ class Payment(models.Model):
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
         ordering = ['-payment_date']
+        indexes = [
+            # Pending payments have no gateway payment id yet, so leave them out;
+            # `razorpay_payment_id = %s` implies IS NOT NULL, so lookups still match.
+            models.Index(fields=['razorpay_payment_id'], condition=Q(razorpay_payment_id__isnull=False),
+                         name='payment_gateway_payment'),
+            models.Index(fields=['transaction_id'], name='payment_transaction'),
+        ]
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    A payment outcome reported by Razorpay, queued for bookings.webhooks to apply.
+    One row per payment id and outcome, so retried and duplicated deliveries are dropped.
+    """
+    PAID = 'paid'
+    FAILED = 'failed'
+    OUTCOME_CHOICES = [
+        (PAID, 'Paid'),
+        (FAILED, 'Failed'),
+    ]
+
+    WEBHOOK = 'webhook'
+    CALLBACK = 'callback'
+    SOURCE_CHOICES = [
+        (WEBHOOK, 'Webhook'),
+        (CALLBACK, 'Checkout callback'),
+    ]
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    PROCESSED = 'processed'
+    IGNORED = 'ignored'
+    ERROR = 'error'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (PROCESSED, 'Processed'),
+        (IGNORED, 'Ignored'),
+        (ERROR, 'Error'),
+    ]
+
+    razorpay_payment_id = models.CharField(max_length=100)
+    razorpay_order_id = models.CharField(max_length=100)
+    razorpay_signature = models.CharField(max_length=200, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=WEBHOOK)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.get_outcome_display()} {self.razorpay_payment_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Payment Webhook Event'
+        verbose_name_plural = 'Payment Webhook Events'
+        ordering = ['-received_at']
+        constraints = [
+            models.UniqueConstraint(fields=['razorpay_payment_id', 'outcome'], name='unique_payment_outcome'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'claimed_at']),
+        ]
+
+
+class Refund(models.Model):
+    """A full refund of a payment through Razorpay, queued for bookings.refunds. One per payment."""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    PROCESSED = 'processed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (PROCESSED, 'Processed'),
+        (FAILED, 'Failed'),
+    ]
+
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='refund')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='refunds')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    razorpay_refund_id = models.CharField(max_length=100, blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Refund of payment #{self.payment_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Refund'
+        verbose_name_plural = 'Refunds'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'claimed_at']),
+            models.Index(fields=['event', 'status']),
+        ]
 
 
 class Event(models.Model):
@@ -0,0 +1,232 @@
+"""
+Refunds through Razorpay.
+
+A Refund row is queued for each paid Payment to give back: one per
+payment, so queuing again never refunds twice. cancel_event() queues the
+refunds of every paid booking of an event and cancels the bookings
+(bookings.bulk). process_refunds() then works through the queue:
+
+* Chunks of REFUND_CHUNK_SIZE refunds are claimed with a conditional
+  UPDATE and committed before any gateway call, so the queue records how
+  far a run got. A run that crashes leaves its chunk claimed, and the
+  next run picks it up once REFUND_CLAIM_TIMEOUT has passed.
+* Each chunk is refunded by REFUND_WORKERS threads. The threads only
+  talk to the gateway, and a shared token bucket keeps them under
+  REFUND_RATE_LIMIT requests per second. Results are written back per
+  chunk with set-based UPDATEs on Refund, Payment and Booking.
+* Before retrying a refund, the worker asks the gateway for the
+  payment's refunds and looks for this refund's receipt. A request that
+  timed out, or a run that died after the gateway answered, therefore
+  never refunds twice. Gateway errors, timeouts and rate limiting are
+  retried up to REFUND_MAX_ATTEMPTS times. Any other rejection fails the
+  refund.
+"""
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import razorpay
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .bulk import bulk_cancel_bookings
+from .gateway import razorpay_client
+from .models import Booking, Payment, Refund
+
+RefundSummary = namedtuple('RefundSummary', 'processed failed retried')
+# What a worker thread reports for one refund: the Refund's next status,
+# the gateway's refund id, and the error, if any.
+Outcome = namedtuple('Outcome', 'status refund_id error')
+
+
+class RateLimited(Exception):
+    """The gateway rejected a request for going over its quota."""
+
+
+class RateLimiter:
+    """Token bucket shared by the refund threads: `rate` requests per second, bursts of `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def back_off(self, seconds):
+        """Stop every thread for `seconds`, after the gateway said we went over quota."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class RazorpayRefunds:
+    """The two gateway calls refunds need, through the shared client (bookings.gateway)."""
+
+    @property
+    def client(self):
+        return razorpay_client()
+
+    def call(self, method, *args):
+        try:
+            return method(*args)
+        except razorpay.errors.BadRequestError as exc:
+            if 'too many requests' in str(exc).lower():
+                raise RateLimited(str(exc))
+            raise
+
+    def refund(self, payment_id, amount, receipt):
+        """Refund `amount` (in paise) of a payment. Returns the refund id."""
+        return self.call(self.client.payment.refund, payment_id, {'amount': amount, 'receipt': receipt})['id']
+
+    def find_refund(self, payment_id, receipt):
+        """The id of the payment's refund with this receipt, or None."""
+        refunds = self.call(self.client.payment.fetch_multiple_refund, payment_id, {'count': 100})
+        for refund in refunds.get('items', []):
+            if refund.get('receipt') == receipt:
+                return refund['id']
+        return None
+
+
+RETRYABLE = (RateLimited, razorpay.errors.GatewayError, razorpay.errors.ServerError, requests.RequestException, ValueError)
+
+
+def refund_receipt(refund_pk):
+    return f'refund_{refund_pk}'
+
+
+def _refund_one(gateway, limiter, job):
+    """Refund one payment. Runs in a worker thread, so it never touches the database."""
+    refund_pk, payment_id, amount, attempts = job
+    receipt = refund_receipt(refund_pk)
+    try:
+        if attempts > 1:
+            # An earlier attempt may have reached the gateway.
+            limiter.acquire()
+            refund_id = gateway.find_refund(payment_id, receipt)
+            if refund_id:
+                return Outcome(Refund.PROCESSED, refund_id, '')
+        limiter.acquire()
+        return Outcome(Refund.PROCESSED, gateway.refund(payment_id, int(amount * 100), receipt), '')
+    except RETRYABLE as exc:
+        if isinstance(exc, RateLimited):
+            limiter.back_off(1)
+        return Outcome(Refund.PENDING, None, f'{type(exc).__name__}: {exc}')
+    except razorpay.errors.BadRequestError as exc:
+        # e.g. already fully refunded: by us, if the receipt is there.
+        try:
+            limiter.acquire()
+            refund_id = gateway.find_refund(payment_id, receipt)
+        except RETRYABLE:
+            return Outcome(Refund.PENDING, None, str(exc))
+        if refund_id:
+            return Outcome(Refund.PROCESSED, refund_id, '')
+        return Outcome(Refund.FAILED, None, str(exc))
+
+
+def queue_refunds(payments, reason=''):
+    """Queue a Refund of the full amount for every paid payment in the queryset. Returns the number queued."""
+    rows = list(
+        payments.filter(payment_status='paid', razorpay_payment_id__isnull=False, refund__isnull=True)
+        .exclude(razorpay_payment_id='').values_list('pk', 'booking__event_id', 'amount')
+    )
+    Refund.objects.bulk_create(
+        (Refund(payment_id=pk, event_id=event_id, amount=amount, reason=reason) for pk, event_id, amount in rows),
+        batch_size=2000, ignore_conflicts=True,
+    )
+    return len(rows)
+
+
+def cancel_event(event, reason='Event cancelled.'):
+    """
+    Unpublish an event, queue refunds for its paid bookings and cancel all of
+    them. Returns (BulkResult of the cancellation, refunds queued). Safe to
+    run again after a crash.
+    """
+    if event.is_published:
+        event.is_published = False
+        event.save()
+    queued = queue_refunds(Payment.objects.filter(booking__event=event), reason)
+    return bulk_cancel_bookings(Booking.objects.filter(event=event), reason=reason), queued
+
+
+def claim_refunds(chunk_size, event_id=None):
+    """Mark up to chunk_size queued refunds as processing by this run and return them."""
+    now = timezone.now()
+    claimable = Refund.objects.filter(
+        Q(status=Refund.PENDING)
+        | Q(status=Refund.PROCESSING, claimed_at__lt=now - timedelta(seconds=settings.REFUND_CLAIM_TIMEOUT)),
+    )
+    if event_id:
+        claimable = claimable.filter(event_id=event_id)
+    refund_ids = list(claimable.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+    if not refund_ids:
+        return []
+    claimable.filter(pk__in=refund_ids).update(status=Refund.PROCESSING, claimed_at=now, attempts=F('attempts') + 1)
+    return list(
+        Refund.objects.filter(pk__in=refund_ids, status=Refund.PROCESSING, claimed_at=now)
+        .values_list('pk', 'payment__razorpay_payment_id', 'amount', 'attempts', 'payment_id', 'payment__booking_id')
+    )
+
+
+def record_outcomes(claimed, outcomes):
+    """Write a chunk's results back: Refund rows, and paid Payments and Bookings marked refunded."""
+    now = timezone.now()
+    refunds, refunded_payments, refunded_bookings = [], [], []
+    retried = failed = 0
+    for (pk, _, _, attempts, payment_id, booking_id), outcome in zip(claimed, outcomes):
+        status = outcome.status
+        if status == Refund.PENDING and attempts >= settings.REFUND_MAX_ATTEMPTS:
+            status = Refund.FAILED
+        retried += status == Refund.PENDING
+        failed += status == Refund.FAILED
+        refunds.append(Refund(
+            pk=pk, status=status, razorpay_refund_id=outcome.refund_id, error=outcome.error,
+            processed_at=now if status == Refund.PROCESSED else None,
+        ))
+        if status == Refund.PROCESSED:
+            refunded_payments.append(payment_id)
+            refunded_bookings.append(booking_id)
+    with transaction.atomic():
+        Refund.objects.bulk_update(refunds, ['status', 'razorpay_refund_id', 'error', 'processed_at'])
+        Payment.objects.filter(pk__in=refunded_payments).update(payment_status='refunded')
+        Booking.objects.filter(pk__in=refunded_bookings).update(payment_status='refunded')
+    return RefundSummary(len(refunded_payments), failed, retried)
+
+
+def process_refunds(event_id=None, chunk_size=None, workers=None, rate=None, gateway=None):
+    """
+    Issue queued refunds (of one event, or all) until none are left.
+    Returns a RefundSummary; `retried` counts attempts put back in the queue.
+    """
+    chunk_size = chunk_size or settings.REFUND_CHUNK_SIZE
+    gateway = gateway or RazorpayRefunds()
+    limiter = RateLimiter(rate or settings.REFUND_RATE_LIMIT)
+    processed = failed = retried = 0
+    with ThreadPoolExecutor(max_workers=workers or settings.REFUND_WORKERS, thread_name_prefix='refund') as pool:
+        while True:
+            claimed = claim_refunds(chunk_size, event_id)
+            if not claimed:
+                return RefundSummary(processed, failed, retried)
+            jobs = [(pk, payment_id, amount, attempts) for pk, payment_id, amount, attempts, _, _ in claimed]
+            outcomes = list(pool.map(lambda job: _refund_one(gateway, limiter, job), jobs))
+            summary = record_outcomes(claimed, outcomes)
+            processed += summary.processed
+            failed += summary.failed
+            retried += summary.retried
@@ -0,0 +1,250 @@
+import uuid
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from events.models import Seat, Zone
+from events.availability import seats_changed, zones_changed
+
+
+class SeatUnavailable(ValidationError):
+    """Raised when a seat was claimed by someone else first."""
+
+
+class HoldExpired(ValidationError):
+    """Raised when confirming a booking whose seat hold has already lapsed."""
+
+
+def claim_seat(seat_id, event_id):
+    """
+    Atomically mark a seat as taken.
+    Returns True if this call claimed the seat, False if it was already taken.
+    """
+    claimed = Seat.objects.filter(pk=seat_id, is_available=True).update(is_available=False) == 1
+    if claimed:
+        seats_changed(event_id, [seat_id], available=False)
+    return claimed
+
+
+def release_seat(seat_id, event_id, booking_id=None):
+    """
+    Return a seat to the pool of available seats, unless another active
+    booking (other than `booking_id`) still holds it.
+    """
+    from .models import Booking
+
+    holders = Booking.objects.filter(seat=OuterRef('pk'), is_cancelled=False)
+    if booking_id:
+        holders = holders.exclude(pk=booking_id)
+    if Seat.objects.filter(pk=seat_id, is_available=False).exclude(Exists(holders)).update(is_available=True):
+        seats_changed(event_id, [seat_id], available=True)
+
+
+def claim_zone_capacity(zone_id, quantity):
+    """
+    Atomically hold `quantity` places in a zone.
+    Returns True on success, False if the zone does not have enough room left.
+    """
+    return Zone.objects.filter(
+        pk=zone_id,
+        capacity__gte=F('booked_count') + F('held_count') + quantity,
+    ).update(held_count=F('held_count') + quantity) == 1
+
+
+def _hold_expiry():
+    return timezone.now() + timedelta(seconds=settings.SEAT_HOLD_TTL)
+
+
+def reserve_seat(user, event, seat):
+    """
+    Create a pending booking for a seat, claiming it with a single
+    conditional UPDATE and holding it for SEAT_HOLD_TTL seconds.
+    Returns the booking, or None if the seat is taken.
+    """
+    from .models import Booking, SeatHold
+
+    try:
+        with transaction.atomic():
+            booking = Booking.objects.create(
+                user=user,
+                event=event,
+                seat=seat,
+                total_price=seat.price,
+                quantity=1
+            )
+            SeatHold.objects.create(booking=booking, event=event, seat=seat, expires_at=_hold_expiry())
+            return booking
+    except SeatUnavailable:
+        return None
+
+
+def reserve_zone(user, event, zone, quantity):
+    """
+    Create a pending booking for `quantity` places in a zone and hold them
+    for SEAT_HOLD_TTL seconds. Returns the booking, or None if the zone is full.
+    """
+    from .models import Booking, SeatHold
+
+    with transaction.atomic():
+        if not claim_zone_capacity(zone.pk, quantity):
+            return None
+        zones_changed(event.id)
+        booking = Booking.objects.create(
+            user=user,
+            event=event,
+            zone=zone,
+            quantity=quantity,
+            total_price=zone.price * quantity
+        )
+        SeatHold.objects.create(
+            booking=booking, event=event, zone=zone, quantity=quantity, expires_at=_hold_expiry()
+        )
+        return booking
+
+
+def settle_hold(booking, status):
+    """
+    Close the booking's active hold as converted or released.
+    Returns True if an active hold was closed. Raises HoldExpired when a
+    booking is confirmed after the sweeper has already expired its hold.
+    """
+    from .models import SeatHold
+
+    closed = SeatHold.objects.filter(booking_id=booking.pk, status=SeatHold.ACTIVE).update(
+        status=status, released_at=timezone.now()
+    )
+    if closed:
+        return True
+    if status == SeatHold.CONVERTED and SeatHold.objects.filter(
+        booking_id=booking.pk, status=SeatHold.EXPIRED
+    ).exists():
+        raise HoldExpired("The seat hold for this booking has expired.")
+    return False
+
+
+def confirm_booking(booking, payment=None, **payment_fields):
+    """
+    Record a successful payment and confirm its booking in one transaction.
+    The booking (status, payment details and ticket code), its hold, the
+    zone counters and the Payment row are each written once with a targeted
+    UPDATE, or one INSERT for a booking without a Payment row yet.
+    `payment_fields` go onto the Payment (payment_method, transaction_id,
+    razorpay_*). Returns False, writing nothing, if the booking is already
+    confirmed or cancelled. Raises HoldExpired if its hold lapsed first.
+    """
+    from .codes import next_ticket_code
+    from .models import Booking, Payment, SeatHold
+
+    payment_values = {'payment_status': 'paid', 'amount': booking.total_price, **payment_fields}
+    fields = {
+        'payment_status': 'paid',
+        'is_confirmed': True,
+        'payment_date': booking.payment_date or timezone.now(),
+        'ticket_code': booking.ticket_code or next_ticket_code(),
+    }
+    for name in ('payment_method', 'transaction_id'):
+        if name in payment_fields:
+            fields[name] = payment_fields[name]
+
+    with transaction.atomic():
+        # Hold, then booking, then zone: the order release_expired_holds
+        # locks them in, so the two cannot deadlock on a row-locking database.
+        held = settle_hold(booking, SeatHold.CONVERTED)
+        if not Booking.objects.filter(pk=booking.pk, is_confirmed=False, is_cancelled=False).update(**fields):
+            if held:
+                transaction.set_rollback(True)
+            return False
+        if booking.zone_id:
+            changes = {'booked_count': F('booked_count') + booking.quantity}
+            if held:
+                changes['held_count'] = F('held_count') - booking.quantity
+            Zone.objects.filter(pk=booking.zone_id).update(**changes)
+            zones_changed(booking.event_id)
+
+        if payment is not None:
+            Payment.objects.filter(pk=payment.pk).update(**payment_values)
+        elif not Payment.objects.filter(booking_id=booking.pk).update(**payment_values):
+            payment_values.setdefault('payment_method', 'upi')
+            payment_values.setdefault('transaction_id', uuid.uuid4().hex[:16])
+            # bulk_create skips Payment.save(), which would save the booking again.
+            Payment.objects.bulk_create([Payment(booking=booking, **payment_values)])
+
+    for name, value in fields.items():
+        setattr(booking, name, value)
+    booking._loaded_values = booking._inventory_values()
+    if payment is not None:
+        for name, value in payment_values.items():
+            setattr(payment, name, value)
+    return True
+
+
+def fail_payment(payment, **payment_fields):
+    """Mark a payment, and its booking if still unconfirmed, as failed. A paid payment is left alone."""
+    from .models import Booking, Payment
+
+    with transaction.atomic():
+        if not Payment.objects.filter(pk=payment.pk).exclude(payment_status='paid').update(
+            payment_status='failed', **payment_fields
+        ):
+            return False
+        Booking.objects.filter(pk=payment.booking_id, is_confirmed=False).update(payment_status='failed')
+    payment.payment_status = 'failed'
+    for name, value in payment_fields.items():
+        setattr(payment, name, value)
+    return True
+
+
+def release_expired_holds(event_id=None, batch_size=500):
+    """
+    Expire lapsed holds in bulk: free their seats and zone capacity and
+    cancel the unpaid bookings. Returns the number of holds expired.
+    """
+    from .models import Booking, SeatHold
+
+    expired = 0
+    while True:
+        now = timezone.now()
+        lapsed = SeatHold.objects.filter(status=SeatHold.ACTIVE, expires_at__lte=now)
+        if event_id:
+            lapsed = lapsed.filter(event_id=event_id)
+        hold_ids = list(lapsed.values_list('pk', flat=True)[:batch_size])
+        if not hold_ids:
+            return expired
+
+        with transaction.atomic():
+            # The status guard makes this safe against a concurrent confirm
+            # or another sweeper; the timestamp tells us which rows we won.
+            SeatHold.objects.filter(pk__in=hold_ids, status=SeatHold.ACTIVE).update(
+                status=SeatHold.EXPIRED, released_at=now
+            )
+            won = list(
+                SeatHold.objects.filter(pk__in=hold_ids, status=SeatHold.EXPIRED, released_at=now)
+                .values_list('booking_id', 'event_id', 'seat_id', 'zone_id', 'quantity')
+            )
+            # Bookings before seats and zones, the order confirm_booking locks in.
+            Booking.objects.filter(
+                pk__in=[hold[0] for hold in won], is_confirmed=False, is_cancelled=False
+            ).update(is_cancelled=True, cancellation_date=now, cancellation_reason='Seat hold expired.')
+
+            seats_by_event = {}
+            zone_quantities = Counter()
+            for _, hold_event_id, seat_id, zone_id, quantity in won:
+                if seat_id:
+                    seats_by_event.setdefault(hold_event_id, []).append(seat_id)
+                if zone_id:
+                    zone_quantities[zone_id] += quantity
+
+            for hold_event_id, seat_ids in seats_by_event.items():
+                Seat.objects.filter(pk__in=seat_ids).update(is_available=True)
+                seats_changed(hold_event_id, seat_ids, available=True)
+            for zone_id, quantity in zone_quantities.items():
+                Zone.objects.filter(pk=zone_id).update(held_count=F('held_count') - quantity)
+            for hold_event_id in {hold[1] for hold in won if hold[3]}:
+                zones_changed(hold_event_id)
+
+        expired += len(won)
+        if len(hold_ids) < batch_size:
+            return expired
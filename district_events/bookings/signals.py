@@ -0,0 +1,13 @@
+"""
+Release a booking's inventory when it is deleted: from the admin, a queryset
+delete, or a cascade from its user or event. Booking.save() does the same for
+cancellations; a delete never goes through save().
+"""
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from .models import Booking
+
+
+@receiver(pre_delete, sender=Booking)
+def release_booking_inventory(sender, instance, **kwargs):
+    instance._release_inventory()
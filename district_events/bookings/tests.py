@@ -0,0 +1,508 @@
+import random
+import threading
+import time
+import uuid
+from unittest import mock
+from datetime import date, time as clock, timedelta
+import razorpay
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from events.models import City, Venue, EventCategory, Event, SeatCategory, Seat, Zone
+from . import checkin
+from .bulk import bulk_confirm_bookings
+from .codes import next_ticket_code
+from .models import Booking, CheckIn, Payment, PaymentWebhookEvent, Refund, SeatHold
+from .refunds import RateLimited, claim_refunds, process_refunds, queue_refunds, refund_receipt
+from .services import HoldExpired, confirm_booking, release_expired_holds, reserve_seat, reserve_zone
+from .webhooks import claim_events, enqueue_payment_event, process_events, process_payment_events
+
+
+def create_event(title='Test Night', capacity=100):
+    city = City.objects.create(name=f'{title} City', state='Test')
+    venue = Venue.objects.create(name=f'{title} Hall', address='1 Test Road', city=city, capacity=capacity)
+    return Event.objects.create(
+        title=title, description='Test event', venue=venue,
+        category=EventCategory.objects.get_or_create(name='Test')[0],
+        start_date=date(2030, 1, 1), end_date=date(2030, 1, 1),
+        start_time=clock(19), end_time=clock(22), banner_image_url='http://example.com/banner.png',
+    )
+
+
+def create_users(prefix, count):
+    return User.objects.bulk_create(
+        User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com') for i in range(count)
+    )
+
+
+class SeatReservationConcurrencyTests(TransactionTestCase):
+    """Many threads reserving the same seats must never double-book one."""
+    threads = 16
+    seats = 20
+    attempts = 25
+
+    def test_no_double_booking(self):
+        event = create_event('Stress Night', capacity=self.seats)
+        category = SeatCategory.objects.get_or_create(name='Test')[0]
+        seat_ids = [seat.pk for seat in Seat.objects.bulk_create(
+            Seat(event=event, row='A', number=number, category=category, price=100)
+            for number in range(1, self.seats + 1)
+        )]
+        users = create_users('stress', self.threads)
+        stats = {'won': 0, 'lost': 0, 'locked': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(self.threads)
+
+        def worker(user):
+            result = dict.fromkeys(stats, 0)
+            try:
+                start.wait()
+                for _ in range(self.attempts):
+                    try:
+                        seat = Seat.objects.get(pk=random.choice(seat_ids))
+                        booked = reserve_seat(user, event, seat)
+                    except OperationalError:
+                        # SQLite serialises writers; a busy database is not an oversell.
+                        result['locked'] += 1
+                        continue
+                    result['won' if booked else 'lost'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in result.items():
+                        stats[key] += value
+
+        workers = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        double_booked = (
+            Booking.objects.filter(event=event, is_cancelled=False)
+            .values('seat').annotate(holders=Count('pk')).filter(holders__gt=1).count()
+        )
+        taken = Seat.objects.filter(event=event, is_available=False).count()
+        held = Booking.objects.filter(event=event, is_cancelled=False).count()
+        self.assertEqual(sum(stats.values()), self.threads * self.attempts)
+        self.assertGreater(stats['won'], 0)
+        self.assertEqual(double_booked, 0)
+        # Every taken seat has exactly one live booking. (A commit that
+        # reported the database busy may still have gone through, so this
+        # counts bookings rather than the threads' wins.)
+        self.assertEqual(held, taken)
+
+
+class ConfirmBookingQueryTests(TestCase):
+    """Statements per confirm_booking() call, including its SAVEPOINT and RELEASE."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Confirm Night')
+        category = SeatCategory.objects.get_or_create(name='Test')[0]
+        cls.seat = Seat.objects.create(event=cls.event, row='A', number=1, category=category, price=100)
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=100, price=50)
+        cls.users = create_users('confirm', 5)
+
+    def setUp(self):
+        # Reserve a block of ticket codes up front, as a warm process has.
+        next_ticket_code()
+
+    def test_zone_new_payment(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 2)
+        # SAVEPOINT, UPDATE hold, UPDATE booking, UPDATE zone, UPDATE payment (no row), INSERT payment, RELEASE
+        with self.assertNumQueries(7):
+            self.assertTrue(confirm_booking(booking, payment_method='upi'))
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (2, 0))
+        self.assertEqual(Payment.objects.get(booking=booking).payment_status, 'paid')
+
+    def test_already_confirmed(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 2)
+        confirm_booking(booking, payment_method='upi')
+        # SAVEPOINT, UPDATE hold (no row), SELECT expired hold, UPDATE booking (no row), RELEASE
+        with self.assertNumQueries(5):
+            self.assertFalse(confirm_booking(booking, payment_method='upi'))
+        self.zone.refresh_from_db()
+        self.assertEqual(self.zone.booked_count, 2)
+
+    def test_zone_existing_payment(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 2)
+        payment = Payment.objects.bulk_create([Payment(
+            booking=booking, payment_method='upi', transaction_id=uuid.uuid4().hex[:16],
+            amount=booking.total_price, payment_status='pending', razorpay_order_id='order_test',
+        )])[0]
+        # SAVEPOINT, UPDATE hold, UPDATE booking, UPDATE zone, UPDATE payment, RELEASE
+        with self.assertNumQueries(6):
+            self.assertTrue(confirm_booking(booking, payment, razorpay_payment_id='pay_test'))
+        payment.refresh_from_db()
+        self.assertEqual((payment.payment_status, payment.razorpay_payment_id), ('paid', 'pay_test'))
+
+    def test_seat_new_payment(self):
+        booking = reserve_seat(self.users[0], self.event, self.seat)
+        # SAVEPOINT, UPDATE hold, UPDATE booking, UPDATE payment (no row), INSERT payment, RELEASE
+        with self.assertNumQueries(6):
+            self.assertTrue(confirm_booking(booking, payment_method='upi'))
+        booking.refresh_from_db()
+        self.assertTrue(booking.is_confirmed)
+        self.assertTrue(booking.ticket_code)
+        self.assertEqual(SeatHold.objects.get(booking=booking).status, SeatHold.CONVERTED)
+
+
+class ConfirmBookingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Hold Night')
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=10, price=50)
+        cls.users = create_users('hold', 2)
+
+    def test_expired_hold(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 1)
+        SeatHold.objects.filter(booking=booking).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_holds(event_id=self.event.pk), 1)
+        with self.assertRaises(HoldExpired):
+            confirm_booking(booking, payment_method='upi')
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (0, 0))
+
+    def test_cancelled_booking_keeps_its_hold(self):
+        booking = reserve_zone(self.users[1], self.event, self.zone, 1)
+        Booking.objects.filter(pk=booking.pk).update(is_cancelled=True)
+        self.assertFalse(confirm_booking(booking, payment_method='upi'))
+        self.assertEqual(SeatHold.objects.get(booking=booking).status, SeatHold.ACTIVE)
+        self.assertFalse(Payment.objects.filter(booking=booking).exists())
+
+
+class BookingDeleteTests(TestCase):
+    """Deleting a booking gives back its inventory, as cancelling it does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Delete Night')
+        category = SeatCategory.objects.get_or_create(name='Test')[0]
+        cls.seat = Seat.objects.create(event=cls.event, row='A', number=1, category=category, price=100)
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=10, price=50)
+        cls.users = create_users('delete', 2)
+
+    def test_delete_confirmed_zone_booking(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 2)
+        confirm_booking(booking, payment_method='upi')
+        Booking.objects.get(pk=booking.pk).delete()
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (0, 0))
+
+    def test_delete_pending_zone_booking(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 3)
+        Booking.objects.filter(pk=booking.pk).delete()
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (0, 0))
+
+    def test_user_delete_cascades_to_seat(self):
+        reserve_seat(self.users[1], self.event, self.seat)
+        self.users[1].delete()
+        self.seat.refresh_from_db()
+        self.assertTrue(self.seat.is_available)
+
+    def test_delete_cancelled_booking(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 2)
+        confirm_booking(booking, payment_method='upi')
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.is_cancelled = True
+        booking.save()
+        booking.delete()
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (0, 0))
+
+
+class BulkConfirmTests(TestCase):
+    """Comping zone bookings never books more places than the zone has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Comp Night')
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=5, price=50)
+        cls.users = create_users('comp', 4)
+
+    def comp(self, user, quantity):
+        # Made in the admin, without reserve_zone() and so without a hold.
+        return Booking.objects.create(user=user, event=self.event, zone=self.zone, quantity=quantity, total_price=0)
+
+    def test_held_and_unheld_bookings(self):
+        held = reserve_zone(self.users[0], self.event, self.zone, 2)
+        fits, too_big = self.comp(self.users[1], 3), self.comp(self.users[2], 1)
+        result = bulk_confirm_bookings(Booking.objects.filter(event=self.event).order_by('pk'))
+        self.assertEqual((result.requested, result.changed, result.skipped, result.zone_full), (3, 2, 0, 1))
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (5, 0))
+        confirmed = set(Booking.objects.filter(is_confirmed=True).values_list('pk', flat=True))
+        self.assertEqual(confirmed, {held.pk, fits.pk})
+        self.assertFalse(Booking.objects.get(pk=too_big.pk).ticket_code)
+
+    def test_expired_hold(self):
+        booking = reserve_zone(self.users[0], self.event, self.zone, 2)
+        SeatHold.objects.filter(booking=booking).update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired_holds(event_id=self.event.pk)
+        Booking.objects.filter(pk=booking.pk).update(is_cancelled=False)
+        reserve_zone(self.users[1], self.event, self.zone, 4)
+        result = bulk_confirm_bookings(Booking.objects.filter(pk=booking.pk))
+        self.assertEqual((result.changed, result.zone_full), (0, 1))
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (0, 4))
+
+
+class PaymentWebhookTests(TestCase):
+    """Duplicate and replayed payment outcomes confirm a booking once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Webhook Night')
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=10, price=50)
+        cls.users = create_users('webhook', 2)
+
+    def pending_payment(self, user):
+        booking = reserve_zone(user, self.event, self.zone, 2)
+        return Payment.objects.create(
+            booking=booking, payment_method='upi', transaction_id=uuid.uuid4().hex[:16],
+            amount=booking.total_price, payment_status='pending', razorpay_order_id=f'order_{booking.pk}',
+        )
+
+    def enqueue_paid(self, payment, source=PaymentWebhookEvent.WEBHOOK):
+        enqueue_payment_event('pay_1', payment.razorpay_order_id, PaymentWebhookEvent.PAID, source=source)
+
+    def assert_confirmed_once(self, payment, confirm):
+        self.assertEqual(confirm.call_count, 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'paid')
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.booked_count, self.zone.held_count), (2, 0))
+
+    def test_enqueue_deduplicates(self):
+        payment = self.pending_payment(self.users[0])
+        self.enqueue_paid(payment)
+        self.enqueue_paid(payment)
+        self.enqueue_paid(payment, source=PaymentWebhookEvent.CALLBACK)
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 1)
+
+    @mock.patch('bookings.webhooks.confirm_booking', wraps=confirm_booking)
+    def test_replayed_delivery(self, confirm):
+        payment = self.pending_payment(self.users[0])
+        self.enqueue_paid(payment)
+        self.assertEqual(process_payment_events(), 1)
+        self.enqueue_paid(payment)
+        self.assertEqual(process_payment_events(), 0)
+        self.assert_confirmed_once(payment, confirm)
+
+    @mock.patch('bookings.webhooks.confirm_booking', wraps=confirm_booking)
+    def test_concurrent_claims(self, confirm):
+        payment = self.pending_payment(self.users[0])
+        self.enqueue_paid(payment)
+        first = claim_events(10)
+        self.assertEqual(len(first), 1)
+        # A second worker finds nothing to claim while the first holds it.
+        self.assertEqual(claim_events(10), [])
+        # The first worker stalls past the claim timeout; another reclaims and applies it.
+        PaymentWebhookEvent.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(process_payment_events(), 1)
+        # The stalled worker wakes up and applies its stale claim.
+        process_events(first)
+        self.assert_confirmed_once(payment, confirm)
+        self.assertEqual(PaymentWebhookEvent.objects.get().status, PaymentWebhookEvent.PROCESSED)
+
+    def test_hold_expired(self):
+        payment = self.pending_payment(self.users[1])
+        SeatHold.objects.filter(booking=payment.booking).update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired_holds(event_id=self.event.pk)
+        self.enqueue_paid(payment)
+        self.assertEqual(process_payment_events(), 1)
+        event = PaymentWebhookEvent.objects.get()
+        self.assertEqual(event.status, PaymentWebhookEvent.ERROR)
+        self.assertTrue(event.error)
+        payment.booking.refresh_from_db()
+        self.assertFalse(payment.booking.is_confirmed)
+
+
+class FakeRefundGateway:
+    """
+    Stands in for RazorpayRefunds. `script` says what each refund() call
+    does in turn: 'ok', 'timeout after' (issued, but the answer is lost),
+    or an exception to raise without issuing. Later calls succeed.
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.issued = {}  # (payment id, receipt) -> refund id
+        self.refund_calls = []  # monotonic time of each refund() call
+        self.lock = threading.Lock()
+
+    def refund(self, payment_id, amount, receipt):
+        with self.lock:
+            self.refund_calls.append(time.monotonic())
+            step = self.script.pop(0) if self.script else 'ok'
+            if isinstance(step, Exception):
+                raise step
+            if (payment_id, receipt) in self.issued:
+                raise razorpay.errors.BadRequestError('The payment has been fully refunded already')
+            refund_id = self.issued[payment_id, receipt] = f'rfnd_{len(self.issued) + 1}'
+        if step == 'timeout after':
+            raise requests.Timeout('Read timed out.')
+        return refund_id
+
+    def find_refund(self, payment_id, receipt):
+        with self.lock:
+            return self.issued.get((payment_id, receipt))
+
+
+class RefundTests(TestCase):
+    """process_refunds() against a fake gateway: each paid booking is refunded exactly once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Refund Night')
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=10, price=50)
+        cls.user = create_users('refund', 1)[0]
+
+    def setUp(self):
+        booking = reserve_zone(self.user, self.event, self.zone, 1)
+        confirm_booking(booking, payment_method='upi', razorpay_payment_id='pay_refund')
+        self.payment = Payment.objects.get(booking=booking)
+        self.assertEqual(queue_refunds(Payment.objects.filter(pk=self.payment.pk)), 1)
+        self.refund = Refund.objects.get()
+
+    def process(self, gateway):
+        return process_refunds(chunk_size=10, workers=2, rate=100, gateway=gateway)
+
+    def assert_refunded(self, gateway):
+        self.assertEqual(list(gateway.issued), [('pay_refund', refund_receipt(self.refund.pk))])
+        self.refund.refresh_from_db()
+        self.assertEqual((self.refund.status, self.refund.razorpay_refund_id), (Refund.PROCESSED, 'rfnd_1'))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'refunded')
+        self.assertEqual(Booking.objects.get(pk=self.payment.booking_id).payment_status, 'refunded')
+
+    def test_refund(self):
+        gateway = FakeRefundGateway()
+        self.assertEqual(tuple(self.process(gateway)), (1, 0, 0))
+        self.assert_refunded(gateway)
+
+    def test_timed_out_refund_is_issued_once(self):
+        gateway = FakeRefundGateway('timeout after')
+        # The retry finds the receipt at the gateway instead of refunding again.
+        self.assertEqual(tuple(self.process(gateway)), (1, 0, 1))
+        self.assertEqual(len(gateway.refund_calls), 1)
+        self.assert_refunded(gateway)
+
+    def test_resume_after_crash(self):
+        gateway = FakeRefundGateway()
+        # A run claims the chunk, reaches the gateway, then dies.
+        (pk, payment_id, amount, *_), = claim_refunds(10)
+        gateway.refund(payment_id, int(amount * 100), refund_receipt(pk))
+        self.assertEqual(tuple(self.process(gateway)), (0, 0, 0))
+        Refund.objects.update(claimed_at=timezone.now() - timedelta(seconds=settings.REFUND_CLAIM_TIMEOUT + 1))
+        self.assertEqual(tuple(self.process(gateway)), (1, 0, 0))
+        self.assertEqual(len(gateway.refund_calls), 1)
+        self.assert_refunded(gateway)
+
+    def test_rate_limited_backs_off(self):
+        gateway = FakeRefundGateway(RateLimited('Too many requests'))
+        self.assertEqual(tuple(self.process(gateway)), (1, 0, 1))
+        first, second = gateway.refund_calls
+        self.assertGreaterEqual(second - first, 0.9)
+        self.assert_refunded(gateway)
+
+    @override_settings(REFUND_MAX_ATTEMPTS=3)
+    def test_fails_after_max_attempts(self):
+        gateway = FakeRefundGateway(*[razorpay.errors.GatewayError('Gateway down')] * 3)
+        self.assertEqual(tuple(self.process(gateway)), (0, 1, 2))
+        self.refund.refresh_from_db()
+        self.assertEqual((self.refund.status, self.refund.attempts), (Refund.FAILED, 3))
+        self.assertIn('Gateway down', self.refund.error)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'paid')
+
+
+@mock.patch('bookings.checkin.get_writer')
+class GateIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event('Gate Night')
+        cls.zone = Zone.objects.create(event=cls.event, name='Floor', capacity=100, price=50)
+        cls.users = create_users('gate', 3)
+
+    def setUp(self):
+        cache.clear()  # check-in claims
+
+    def confirmed_booking(self, user):
+        booking = reserve_zone(user, self.event, self.zone, 1)
+        confirm_booking(booking, payment_method='upi')
+        return booking
+
+    def test_scan_ticket_confirmed_after_load(self, get_writer):
+        index = checkin.GateIndex(self.event.pk)
+        booking = self.confirmed_booking(self.users[0])
+        result = index.scan(booking.ticket_code, 'north')
+        self.assertEqual(result.status, checkin.ADMITTED)
+        self.assertEqual(result.label, 'Floor x 1')
+        self.assertEqual(index.scan(booking.ticket_code, 'south').status, checkin.ALREADY_CHECKED_IN)
+        get_writer.return_value.add.assert_called_once()
+
+    def test_unknown_ticket(self, get_writer):
+        index = checkin.GateIndex(self.event.pk)
+        self.assertEqual(index.scan('NOSUCHCODE', 'north').status, checkin.UNKNOWN)
+        get_writer.return_value.add.assert_not_called()
+
+
+class CheckInWriterTests(TestCase):
+
+    def test_close_writes_queued_check_ins(self):
+        event = create_event('Writer Night')
+        zone = Zone.objects.create(event=event, name='Floor', capacity=10, price=50)
+        booking = reserve_zone(create_users('writer', 1)[0], event, zone, 1)
+        writer = checkin.CheckInWriter(batch_size=100, interval=3600)
+        writer.add(CheckIn(booking=booking, event=event, gate='north', scanned_at=timezone.now()))
+        self.assertFalse(CheckIn.objects.exists())
+        writer.close()
+        self.assertEqual(CheckIn.objects.get().booking_id, booking.pk)
+
+
+class CheckInWriterBadRowTests(TransactionTestCase):
+    """Runs outside a test transaction, so foreign keys are checked when each write commits."""
+
+    def test_bad_row_is_dropped(self):
+        event = create_event('Bad Row Night')
+        zone = Zone.objects.create(event=event, name='Floor', capacity=10, price=50)
+        kept, deleted = (reserve_zone(user, event, zone, 1) for user in create_users('badrow', 2))
+        writer = checkin.CheckInWriter(batch_size=100, interval=3600)
+        for booking in (deleted, kept):
+            writer.add(CheckIn(booking_id=booking.pk, event=event, gate='north', scanned_at=timezone.now()))
+        deleted.delete()
+        with self.assertLogs('bookings.checkin', 'ERROR'):
+            self.assertEqual(writer.flush(), 1)
+        self.assertEqual(writer.queue, [])
+        self.assertEqual(list(CheckIn.objects.values_list('booking_id', flat=True)), [kept.pk])
+
+
+class TicketCodeFromScanTests(SimpleTestCase):
+
+    def test_legacy_dict_payload(self):
+        self.assertEqual(checkin.ticket_code_from_scan(1, "{'ticket_code': 'ABC123'}"), ('ABC123', None))
+
+    def test_rejects_hostile_or_malformed_payloads(self):
+        for scanned in ("{'ticket_code': 123}", '{' * 100_000, "{[]: 1}", "{'ticket_code': None}", '{oops'):
+            with self.subTest(scanned=scanned[:20]):
+                self.assertEqual(checkin.ticket_code_from_scan(1, scanned), (None, checkin.INVALID))
+
+
+class SyncScansTests(SimpleTestCase):
+
+    def test_rejects_non_string_codes(self):
+        scans = [{'ticket_code': 123}, {'payload': ['ABC123']}, {'ticket_code': {'code': 'ABC123'}}]
+        results = checkin.sync_scans(1, 'north', scans)
+        self.assertEqual([result.status for result in results], [checkin.INVALID] * 3)
+        self.assertEqual({result.gate for result in results}, {'north'})
@@ -0,0 +1,220 @@
+"""
+Ticket PDF renderer.
+
+Draws the same page as bookings.utils.generate_pdf_ticket, faster:
+
+* the static skeleton (header, field labels, footer notes) is turned into
+  PDF content-stream operators once per process and pasted into every page;
+* the QR code is drawn as filled rectangles straight from the QR matrix
+  instead of going through a PNG that ReportLab has to decode and re-encode;
+  a matrix passed in as fields['qr_bitmap'] (cached by bookings.tickets) is
+  used as is, and the ones encoded here are handed back for caching.
+
+A page is built as content-stream operators (page_operators), which become
+either a one-page PDF (render) or one page of a multi-page document written
+incrementally by stream_pdf, so tens of thousands of tickets never have to
+be held in memory at once.
+
+This module imports nothing from Django, so it can run in the worker
+processes of bookings.tickets without setting Django up. It takes the plain
+dict built by bookings.tickets.ticket_fields().
+"""
+import io
+import zlib
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+from . import qr
+
+WIDTH, HEIGHT = A4
+FONTS = ('Helvetica-Bold', 'Helvetica', 'Helvetica-Oblique')
+QR_SIZE = 2 * inch
+QR_X, QR_Y = WIDTH - 3 * inch, HEIGHT - 7 * inch
+
+# (label, y) of the field rows; the value is drawn at 2.5 inch.
+FIELDS = [
+    ('Event:', HEIGHT - 2.5 * inch),
+    ('Date:', HEIGHT - 3 * inch),
+    ('Time:', HEIGHT - 3.5 * inch),
+    ('Venue:', HEIGHT - 4 * inch),
+    ('Ticket Number:', HEIGHT - 5 * inch),
+    (None, HEIGHT - 5.5 * inch),  # "Seat:" or "Zone:"
+    ('Name:', HEIGHT - 6 * inch),
+]
+
+_scratch = None
+_skeleton = None
+
+
+def _scratch_canvas():
+    """
+    The canvas every text operator of this process is built on. It assigns
+    the internal font names (/F1, /F2, ...), including those of fallback
+    fonts ReportLab picks for characters Helvetica lacks.
+    """
+    global _scratch
+    if _scratch is None:
+        _scratch = canvas.Canvas(io.BytesIO(), pagesize=A4)
+        for font in FONTS:
+            _scratch.setFont(font, 10)
+    return _scratch
+
+
+def font_names():
+    """[(internal name, base font)] known to this process, in registration order."""
+    mapping = _scratch_canvas()._doc.fontMapping
+    return sorted(((name.lstrip('/'), font) for font, name in mapping.items()), key=lambda item: int(item[0][1:]))
+
+
+def _text(font, size, x, y, text, centred=False):
+    """Operators drawing one line of text."""
+    c = _scratch_canvas()
+    t = c.beginText()
+    t.setFont(font, size)
+    if centred:
+        x -= c.stringWidth(text, font, size) / 2
+    t.setTextOrigin(x, y)
+    t.textLine(text)
+    return t.getCode()
+
+
+def skeleton():
+    """Content-stream operators for the parts of the page every ticket shares."""
+    global _skeleton
+    if _skeleton is None:
+        ops = [
+            _text('Helvetica-Bold', 24, WIDTH / 2, HEIGHT - 1 * inch, "District Events", centred=True),
+            _text('Helvetica-Bold', 18, WIDTH / 2, HEIGHT - 1.5 * inch, "E-Ticket", centred=True),
+        ]
+        ops.extend(_text('Helvetica-Bold', 14, 1 * inch, y, label) for label, y in FIELDS if label)
+        ops.append(_text('Helvetica-Oblique', 10, WIDTH / 2, 1 * inch,
+                         "This is an electronically generated ticket.", centred=True))
+        ops.append(_text('Helvetica-Oblique', 10, WIDTH / 2, 0.8 * inch,
+                         "Please present this ticket at the venue entrance.", centred=True))
+        _skeleton = '\n'.join(ops)
+    return _skeleton
+
+
+def qr_operators(bitmap, x, y, size):
+    """Operators filling the dark modules of a qr.encode() bitmap, one rectangle per run."""
+    module = size / bitmap[0]
+    ops = ['0 g']
+    for row, col, length in qr.runs(bitmap):
+        ops.append(f'{x + col * module:.2f} {y + size - (row + 1) * module:.2f} {length * module:.2f} {module:.2f} re')
+    ops.append('f')
+    return '\n'.join(ops)
+
+
+def page_operators(fields, encoded=None):
+    """
+    The whole content stream of one ticket page. QR bitmaps that had to be
+    encoded are added to `encoded`, keyed by ticket code.
+    """
+    bitmap = fields.get('qr_bitmap')
+    if bitmap is None:
+        bitmap = qr.encode(fields['qr_data'])
+        if encoded is not None:
+            encoded[fields['ticket_code']] = bitmap
+    place_label, place_value = fields['place']
+    values = [fields['event'], fields['date'], fields['time'], fields['venue'],
+              fields['ticket_code'], place_value, fields['name']]
+    ops = [skeleton(), _text('Helvetica-Bold', 14, 1 * inch, HEIGHT - 5.5 * inch, place_label)]
+    ops.extend(_text('Helvetica', 14, 2.5 * inch, y, value) for value, (_, y) in zip(values, FIELDS))
+    ops.append(qr_operators(bitmap, QR_X, QR_Y, QR_SIZE))
+    ops.append(_text('Helvetica-Oblique', 10, WIDTH / 2, 0.6 * inch, f"Issued on: {fields['issued_on']}", centred=True))
+    return '\n'.join(ops)
+
+
+def render(fields, encoded=None):
+    """Render one ticket from ticket_fields() output and return the PDF bytes."""
+    ops = page_operators(fields, encoded)
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    # Register the fonts in the scratch canvas's order so the names in ops match.
+    for _, font in font_names():
+        c.setFont(font, 10)
+    c.addLiteral(ops)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def render_many(fields_list):
+    """
+    Render several tickets in one call (one round trip to a pool worker).
+    Returns ([pdf], {ticket code: newly encoded QR bitmap}).
+    """
+    encoded = {}
+    return [render(fields, encoded) for fields in fields_list], encoded
+
+
+def render_pages(fields_list):
+    """
+    Several pages for stream_pdf(): ([(compressed content stream, font
+    names)], {ticket code: newly encoded QR bitmap}).
+    """
+    encoded = {}
+    pages = [zlib.compress(page_operators(fields, encoded).encode('latin-1')) for fields in fields_list]
+    fonts = font_names()
+    return [(page, fonts) for page in pages], encoded
+
+
+def stream_pdf(pages):
+    """
+    Yield a PDF document piece by piece, one page per item of `pages` (as
+    produced by render_pages). Only object offsets and page references are
+    kept until the end, so memory stays flat however many pages there are.
+    """
+    offsets = {}
+    font_objects = {}
+    position = 0
+    next_object = 3  # 1 is the catalog and 2 the page tree; both are written last.
+
+    def write(number, body):
+        nonlocal position
+        offsets[number] = position
+        data = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        position += len(data)
+        return data
+
+    header = b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n'
+    position = len(header)
+    yield header
+
+    kids = []
+    for stream, fonts in pages:
+        chunk = []
+        resources = []
+        for name, font in fonts:
+            if font not in font_objects:
+                font_objects[font] = next_object
+                encoding = pdfmetrics.getFont(font).encName
+                body = f'<< /Type /Font /Subtype /Type1 /BaseFont /{font}'
+                if encoding == 'WinAnsiEncoding':
+                    body += ' /Encoding /WinAnsiEncoding'
+                chunk.append(write(next_object, f'{body} >>'.encode()))
+                next_object += 1
+            resources.append(f'/{name} {font_objects[font]} 0 R')
+        contents, page = next_object, next_object + 1
+        next_object += 2
+        chunk.append(write(contents, (
+            f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode() + stream + b'\nendstream'
+        )))
+        chunk.append(write(page, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {WIDTH:.4f} {HEIGHT:.4f}] '
+            f'/Resources << /Font << {" ".join(resources)} >> /ProcSet [/PDF /Text] >> '
+            f'/Contents {contents} 0 R >>'
+        ).encode()))
+        kids.append(page)
+        yield b''.join(chunk)
+
+    tail = [
+        write(2, f'<< /Type /Pages /Count {len(kids)} /Kids [{" ".join(f"{kid} 0 R" for kid in kids)}] >>'.encode()),
+        write(1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+    ]
+    xref = [f'xref\n0 {next_object}\n0000000000 65535 f \n']
+    xref.extend(f'{offsets[number]:010d} 00000 n \n' for number in range(1, next_object))
+    tail.append(''.join(xref).encode())
+    tail.append(f'trailer\n<< /Size {next_object} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n'.encode())
+    yield b''.join(tail)
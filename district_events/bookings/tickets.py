@@ -0,0 +1,243 @@
+"""
+Ticket PDFs for download.
+
+get_ticket_pdf() serves a booking's ticket from the cache when it can. The
+cache key is the ticket code, and each entry carries a fingerprint of the
+printed fields, so edits to the event or booking show up on the next
+download. Cache misses are rendered by bookings.ticket_pdf in a pool of
+worker processes (TICKET_RENDER_WORKERS), so CPU-heavy rendering doesn't hold
+the GIL that request threads need. Cancelling a booking drops its cached PDF.
+
+render_tickets() and render_ticket_pages() render many tickets in order with
+a bounded number of chunks in flight, for bulk exports (bookings.exports).
+
+The QR code carries a short signed payload, `DE1:<ticket code>:<event id>:<sig>`,
+where sig is 8 base32 characters of an HMAC keyed by SECRET_KEY. It only
+uses QR alphanumeric characters, so it fits a version 3 symbol at error
+correction H. Encoded symbols are cached by ticket code (TICKET_QR_CACHE_TIMEOUT)
+and reused whenever a ticket is rendered again.
+"""
+import base64
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import islice
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils import timezone
+from . import ticket_pdf
+
+
+PAYLOAD_PREFIX = 'DE1'
+
+
+class InvalidTicketPayload(Exception):
+    """A scanned QR payload is malformed or its signature does not match."""
+
+
+def _cache_key(ticket_code):
+    return f'ticket_pdf:{ticket_code}'
+
+
+def _qr_cache_key(ticket_code):
+    return f'ticket_qr:{ticket_code}'
+
+
+def _signature(ticket_code, event_id):
+    digest = salted_hmac('bookings.tickets.ticket_payload', f'{ticket_code}:{event_id}').digest()
+    return base64.b32encode(digest[:5]).decode()
+
+
+def ticket_payload(ticket_code, event_id):
+    """The signed string encoded in a ticket's QR code."""
+    return f'{PAYLOAD_PREFIX}:{ticket_code}:{event_id}:{_signature(ticket_code, event_id)}'
+
+
+def read_ticket_payload(payload):
+    """Return (ticket code, event id) of a scanned payload. Raises InvalidTicketPayload."""
+    parts = payload.strip().split(':')
+    if len(parts) != 4 or parts[0] != PAYLOAD_PREFIX or not parts[2].isdigit():
+        raise InvalidTicketPayload('Not a ticket QR code.')
+    _, ticket_code, event_id, signature = parts
+    if not constant_time_compare(signature, _signature(ticket_code, int(event_id))):
+        raise InvalidTicketPayload('Ticket QR code signature does not match.')
+    return ticket_code, int(event_id)
+
+
+def ticket_fields(booking):
+    """Everything printed on the ticket, as plain data a worker process can take."""
+    event = booking.event
+    if booking.seat:
+        place = ('Seat:', f"{booking.seat.row}{booking.seat.number}")
+    elif booking.zone:
+        place = ('Zone:', f"{booking.zone.name} (Qty: {booking.quantity})")
+    else:
+        place = ('', '')
+    return {
+        'ticket_code': booking.ticket_code,
+        'event': event.title,
+        'date': event.start_date.strftime('%d %b %Y'),
+        'time': event.start_time.strftime('%I:%M %p'),
+        'venue': event.venue.name,
+        'place': place,
+        'name': f"{booking.user.first_name} {booking.user.last_name}",
+        'qr_data': ticket_payload(booking.ticket_code, booking.event_id),
+        'issued_on': timezone.now().strftime('%d %b %Y, %I:%M %p'),
+    }
+
+
+def _fingerprint(fields):
+    printed = {key: value for key, value in fields.items() if key not in ('issued_on', 'qr_bitmap')}
+    return hashlib.sha1(repr(sorted(printed.items())).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_ticket_pool():
+    """The process-wide rendering pool, or None to render in the calling thread."""
+    workers = settings.TICKET_RENDER_WORKERS
+    if not workers:
+        return None
+    # spawn, not fork: forking a threaded web server can copy held locks.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=ticket_pdf.skeleton,
+    )
+
+
+def attach_qr_bitmaps(fields_list):
+    """Add cached QR bitmaps to ticket_fields() dicts, so workers skip encoding them."""
+    cached = cache.get_many([_qr_cache_key(fields['ticket_code']) for fields in fields_list])
+    for fields in fields_list:
+        entry = cached.get(_qr_cache_key(fields['ticket_code']))
+        if entry is not None and entry[0] == fields['qr_data']:
+            fields['qr_bitmap'] = entry[1]
+    return fields_list
+
+
+def store_qr_bitmaps(fields_list, encoded):
+    """Cache the bitmaps a render call had to encode ({ticket code: bitmap})."""
+    if encoded:
+        payloads = {fields['ticket_code']: fields['qr_data'] for fields in fields_list}
+        cache.set_many({
+            _qr_cache_key(ticket_code): (payloads[ticket_code], bitmap) for ticket_code, bitmap in encoded.items()
+        }, settings.TICKET_QR_CACHE_TIMEOUT)
+
+
+def _render(fields_list):
+    attach_qr_bitmaps(fields_list)
+    pool = get_ticket_pool()
+    pdfs = encoded = None
+    if pool is not None:
+        try:
+            pdfs, encoded = pool.submit(ticket_pdf.render_many, fields_list).result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool next time and render here now.
+            get_ticket_pool.cache_clear()
+    if pdfs is None:
+        pdfs, encoded = ticket_pdf.render_many(fields_list)
+    store_qr_bitmaps(fields_list, encoded)
+    return pdfs
+
+
+def _map_chunks(func, chunks, window=None):
+    """
+    Yield (context, func(payloads)) for each (context, payloads) in chunks,
+    in order. At most `window` chunks are in flight in the pool at once,
+    which bounds memory however long `chunks` is.
+    """
+    pool = get_ticket_pool()
+    if pool is None:
+        for context, payloads in chunks:
+            yield context, func(payloads)
+        return
+
+    window = window or 2 * settings.TICKET_RENDER_WORKERS
+    pending = deque()
+
+    def result(context, payloads, future):
+        try:
+            return context, future.result()
+        except BrokenProcessPool:
+            get_ticket_pool.cache_clear()
+            return context, func(payloads)
+
+    for context, payloads in chunks:
+        pending.append((context, payloads, pool.submit(func, payloads)))
+        if len(pending) >= window:
+            yield result(*pending.popleft())
+    while pending:
+        yield result(*pending.popleft())
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def render_tickets(bookings, chunk_size=20, window=None, store=True):
+    """
+    Yield (booking, pdf) for bookings with ticket codes, in order. Cached
+    PDFs are reused; the rest are rendered in the pool chunk_size at a time.
+    With store=False freshly rendered PDFs are not cached (bulk exports).
+    """
+    def chunks():
+        for batch in _batches(bookings, chunk_size):
+            cached = cache.get_many([_cache_key(booking.ticket_code) for booking in batch])
+            items = []
+            for booking in batch:
+                fields = ticket_fields(booking)
+                fingerprint = _fingerprint(fields)
+                entry = cached.get(_cache_key(booking.ticket_code))
+                pdf = entry[1] if entry is not None and entry[0] == fingerprint else None
+                items.append((booking, fingerprint, pdf, fields))
+            yield items, attach_qr_bitmaps([fields for _, _, pdf, fields in items if pdf is None])
+
+    for items, (rendered, encoded) in _map_chunks(ticket_pdf.render_many, chunks(), window):
+        store_qr_bitmaps([fields for _, _, _, fields in items], encoded)
+        rendered = iter(rendered)
+        fresh = {}
+        for booking, fingerprint, pdf, _ in items:
+            if pdf is None:
+                pdf = next(rendered)
+                fresh[_cache_key(booking.ticket_code)] = (fingerprint, pdf)
+            yield booking, pdf
+        if store and fresh:
+            cache.set_many(fresh, settings.TICKET_PDF_CACHE_TIMEOUT)
+
+
+def render_ticket_pages(bookings, chunk_size=50, window=None):
+    """Yield the pages of ticket_pdf.stream_pdf() for bookings, in order."""
+    def chunks():
+        for batch in _batches(bookings, chunk_size):
+            fields_list = attach_qr_bitmaps([ticket_fields(booking) for booking in batch])
+            yield fields_list, fields_list
+
+    for fields_list, (pages, encoded) in _map_chunks(ticket_pdf.render_pages, chunks(), window):
+        store_qr_bitmaps(fields_list, encoded)
+        yield from pages
+
+
+def get_ticket_pdf(booking):
+    """PDF bytes of a confirmed booking's ticket, from the cache or freshly rendered."""
+    fields = ticket_fields(booking)
+    fingerprint = _fingerprint(fields)
+    entry = cache.get(_cache_key(booking.ticket_code))
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
+    pdf = _render([fields])[0]
+    cache.set(_cache_key(booking.ticket_code), (fingerprint, pdf), settings.TICKET_PDF_CACHE_TIMEOUT)
+    return pdf
+
+
+def invalidate_ticket(ticket_code):
+    cache.delete(_cache_key(ticket_code))
+
+
+def invalidate_tickets(ticket_codes):
+    cache.delete_many([_cache_key(ticket_code) for ticket_code in ticket_codes])
@@ -1,5 +1,3 @@
-import random
-import string
 import qrcode
 import io
 from reportlab.pdfgen import canvas
@@ -11,16 +9,16 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus.flowables import Image
 from django.utils import timezone
 
-def generate_ticket_code(length=10):
+def generate_ticket_code():
     """Generate a unique ticket code."""
-    chars = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(chars, k=length))
+    from .codes import next_ticket_code
+    return next_ticket_code()
 
 def generate_qr_code(data):
     """Generate QR code image from data."""
     qr = qrcode.QRCode(
         version=1,
-        error_correction=qrcode.constants.ERROR_CORRECTION_H,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
         box_size=10,
         border=4,
     )
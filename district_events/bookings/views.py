@@ -1,24 +1,35 @@
 import razorpay
 import json
 import uuid
+from functools import wraps
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views import View
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
+from django.core.exceptions import ObjectDoesNotExist
 from django.conf import settings
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django.middleware.csrf import get_token
 from django.utils.decorators import method_decorator
 from .models import Event, Feedback
 from .forms import FeedbackForm,BookingForm
-from .models import Booking, Payment
-from events.models import Event, Seat, Zone
+from .models import Booking, Payment, PaymentWebhookEvent
+from events.models import Event, Zone
+from events.seatmap import get_seat_map
+from events.compact import resolve_seat
 from .forms import BookingForm
-from .utils import generate_ticket_code, generate_pdf_ticket
+from .tickets import get_ticket_pdf
+from .checkin import get_gate_index, scan_ticket, sync_scans
+from .gateway import checkout_order, gateway_configured, precreate_order, razorpay_client
+from .refunds import queue_refunds
+from .webhooks import InvalidWebhook, enqueue_payment_event, parse_webhook, process_payment_events, verify_webhook_signature
+from .services import confirm_booking, fail_payment, reserve_seat, reserve_zone, release_expired_holds, HoldExpired
 
 class SeatSelectionView(LoginRequiredMixin, View):
     """View for selecting seats/zones for an event."""
@@ -31,23 +42,19 @@ class SeatSelectionView(LoginRequiredMixin, View):
             messages.error(request, 'This event has already ended.')
             return redirect('events:event_detail', pk=event_id)
 
+        if release_expired_holds(event_id=event.id):
+            event.refresh_from_db(fields=['availability_version'])
+
         context = {
             'event': event,
         }
 
         if event.is_indoor_event:
-            seats = Seat.objects.filter(event=event).order_by('row', 'number')
-
-            seating_map = {}
-            for seat in seats:
-                if seat.row not in seating_map:
-                    seating_map[seat.row] = []
-                seating_map[seat.row].append(seat)
-
-            sorted_rows = sorted(seating_map.keys())
-            context['rows'] = sorted_rows
+            seat_map = get_seat_map(event.id)
+            seating_map = seat_map.rows()
+            context['rows'] = list(seating_map)
             context['seating_map'] = seating_map
-            context['seat_categories'] = set(seat.category for seat in seats)
+            context['seat_categories'] = seat_map.categories()
 
         else:
             zones = Zone.objects.filter(event=event)
@@ -71,22 +78,16 @@ class SeatSelectionView(LoginRequiredMixin, View):
                 messages.error(request, 'Please select a seat.')
                 return redirect('bookings:seat_selection', event_id=event_id)
 
-            seat = get_object_or_404(Seat, pk=seat_id, event=event)
+            try:
+                seat = resolve_seat(event, int(seat_id))
+            except (ValueError, ObjectDoesNotExist):
+                raise Http404('No such seat.')
 
-        
-            if not seat.is_available:
+            booking = reserve_seat(request.user, event, seat)
+            if booking is None:
                 messages.error(request, 'Sorry, this seat is already booked.')
                 return redirect('bookings:seat_selection', event_id=event_id)
 
-        
-            booking = Booking.objects.create(
-                user=request.user,
-                event=event,
-                seat=seat,
-                total_price=seat.price,
-                quantity=1
-            )
-
         else:
 
             zone_id = request.POST.get('zone_id')
@@ -106,17 +107,12 @@ class SeatSelectionView(LoginRequiredMixin, View):
 
             zone = get_object_or_404(Zone, pk=zone_id, event=event)
 
-            if zone.available_seats < quantity:
+            booking = reserve_zone(request.user, event, zone, quantity)
+            if booking is None:
+                zone.refresh_from_db(fields=['booked_count', 'held_count'])
                 messages.error(request, f'Sorry, only {zone.available_seats} seats are available in this zone.')
                 return redirect('bookings:seat_selection', event_id=event_id)
-
-            booking = Booking.objects.create(
-                user=request.user,
-                event=event,
-                zone=zone,
-                quantity=quantity,
-                total_price=zone.price * quantity
-            )
+        precreate_order(booking)
         return redirect('bookings:payment', booking_id=booking.id)
 
 class PaymentView(LoginRequiredMixin, View):
@@ -129,46 +125,23 @@ class PaymentView(LoginRequiredMixin, View):
         if booking.payment_status == 'paid':
             return redirect('bookings:booking_confirmation', booking_id=booking.id)
 
-        if settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET:
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-            try:
-                amount = int(booking.total_price * 100) 
-                order_currency = 'INR'
-                order_receipt = f'booking_{booking.id}'
-
-                order_data = {
-                    'amount': amount,
-                    'currency': order_currency,
-                    'receipt': order_receipt,
-                    'payment_capture': 1  
-                }
+        if release_expired_holds(event_id=booking.event_id):
+            booking.refresh_from_db()
+        if booking.is_cancelled:
+            messages.error(request, 'Your seat hold has expired. Please select your seats again.')
+            return redirect('bookings:seat_selection', event_id=booking.event_id)
 
-                razorpay_order = client.order.create(data=order_data)
-                razorpay_order_id = razorpay_order['id']
-
-            
-                payment, created = Payment.objects.get_or_create(
-                    booking=booking,
-                    defaults={
-                        'payment_method': 'upi',
-                        'transaction_id': str(uuid.uuid4()).replace('-', '')[:16],
-                        'amount': booking.total_price,
-                        'payment_status': 'pending',
-                        'razorpay_order_id': razorpay_order_id
-                    }
-                )
-
-                if not created:
-                    payment.razorpay_order_id = razorpay_order_id
-                    payment.save()
+        if gateway_configured():
+            try:
+                order = checkout_order(booking)
 
                 context = {
                     'booking': booking,
                     'razorpay_key_id': settings.RAZORPAY_KEY_ID,
-                    'razorpay_order_id': razorpay_order_id,
+                    'razorpay_order_id': order.id,
                     'callback_url': request.build_absolute_uri(reverse('bookings:payment_callback')),
-                    'amount': amount,
-                    'currency': order_currency,
+                    'amount': order.amount,
+                    'currency': order.currency,
                     'email': request.user.email,
                     'phone': request.user.phone_number,
                     'name': f"{request.user.first_name} {request.user.last_name}",
@@ -192,27 +165,11 @@ class PaymentView(LoginRequiredMixin, View):
 
      
         if request.POST.get('test_payment') == 'success':
-         
-            payment, created = Payment.objects.get_or_create(
-                booking=booking,
-                defaults={
-                    'payment_method': 'upi',
-                    'transaction_id': str(uuid.uuid4()).replace('-', '')[:16],
-                    'amount': booking.total_price,
-                    'payment_status': 'paid'
-                }
-            )
-
-            if not created:
-                payment.payment_status = 'paid'
-                payment.transaction_id = str(uuid.uuid4()).replace('-', '')[:16]
-                payment.save()
-
-        
-            booking.payment_status = 'paid'
-            booking.is_confirmed = True
-            booking.ticket_code = generate_ticket_code()
-            booking.save()
+            try:
+                confirm_booking(booking, payment_method='upi', transaction_id=str(uuid.uuid4()).replace('-', '')[:16])
+            except HoldExpired:
+                messages.error(request, 'Your seat hold expired before payment completed. Please select your seats again.')
+                return redirect('bookings:seat_selection', event_id=booking.event_id)
 
             messages.success(request, 'Payment successful! Your booking is confirmed.')
             return redirect('bookings:booking_confirmation', booking_id=booking.id)
@@ -230,39 +187,27 @@ class PaymentCallbackView(View):
             signature = request.POST.get('razorpay_signature', '')
 
            
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
             try:
-                client.utility.verify_payment_signature({
+                razorpay_client().utility.verify_payment_signature({
                     'razorpay_payment_id': payment_id,
                     'razorpay_order_id': order_id,
                     'razorpay_signature': signature
                 })
 
-                payment = Payment.objects.get(razorpay_order_id=order_id)
-
-             
-                payment.razorpay_payment_id = payment_id
-                payment.razorpay_signature = signature
-                payment.payment_status = 'paid'
-                payment.save()
+                # Same queue as the webhook, so whichever of the two reports
+                # the payment first confirms it and the other is a no-op.
+                enqueue_payment_event(payment_id, order_id, PaymentWebhookEvent.PAID, signature=signature,
+                                      source=PaymentWebhookEvent.CALLBACK)
+                process_payment_events(payment_id=payment_id)
+                booking = Payment.objects.select_related('booking').get(razorpay_order_id=order_id).booking
 
-               
-                booking = payment.booking
-                booking.payment_status = 'paid'
-                booking.is_confirmed = True
-                booking.ticket_code = generate_ticket_code()
-                booking.save()
-
-           
                 return redirect('bookings:booking_confirmation', booking_id=booking.id)
 
-            except Exception as e:
+            except razorpay.errors.SignatureVerificationError:
               
                 try:
                     payment = Payment.objects.get(razorpay_order_id=order_id)
-                    payment.payment_status = 'failed'
-                    payment.razorpay_payment_id = payment_id
-                    payment.save()
+                    fail_payment(payment, razorpay_payment_id=payment_id)
                 except Payment.DoesNotExist:
                     
                     messages.error(request, 'Payment verification failed and payment record not found.')
@@ -275,6 +220,24 @@ class PaymentCallbackView(View):
             messages.error(request, f'Error processing payment: {str(e)}')
             return redirect('home')
 
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    """
+    Razorpay payment webhooks. Acknowledged as soon as the event is queued;
+    the process_payment_webhooks worker applies it.
+    """
+    try:
+        verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature', ''))
+        parsed = parse_webhook(json.loads(request.body))
+    except (InvalidWebhook, ValueError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    if parsed is None:
+        return JsonResponse({'status': 'ignored'})
+    outcome, entity = parsed
+    enqueue_payment_event(entity['id'], entity['order_id'], outcome, payload=entity)
+    return JsonResponse({'status': 'queued'})
+
 class BookingConfirmationView(LoginRequiredMixin, DetailView):
     """View for booking confirmation and ticket display."""
     model = Booking
@@ -343,15 +306,15 @@ class UserBookingsView(LoginRequiredMixin, ListView):
 @login_required
 def download_ticket(request, booking_id):
     """View for downloading ticket as PDF."""
-    booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
+    booking = get_object_or_404(
+        Booking.objects.select_related('event__venue', 'seat', 'zone', 'user'), pk=booking_id, user=request.user
+    )
 
-   
     if not booking.is_confirmed or booking.is_cancelled:
         messages.error(request, 'Cannot download ticket for unconfirmed or cancelled booking.')
         return redirect('bookings:my_bookings')
 
-
-    pdf_file = generate_pdf_ticket(booking)
+    pdf_file = get_ticket_pdf(booking)
 
     response = HttpResponse(pdf_file, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="ticket_{booking.ticket_code}.pdf"'
@@ -420,7 +383,11 @@ def cancel_booking(request, booking_id):
         booking.cancellation_reason = cancellation_reason
         booking.cancellation_date = timezone.now()
         booking.save()
-        messages.success(request, "Your booking has been cancelled.")
+        # Refunded by the process_refunds worker.
+        if queue_refunds(Payment.objects.filter(booking=booking), cancellation_reason[:200]):
+            messages.success(request, "Your booking has been cancelled. Refund will be processed within 5-7 business days.")
+        else:
+            messages.success(request, "Your booking has been cancelled.")
         return redirect('bookings:my_bookings')
 
     return render(request, 'bookings/cancel_booking.html', {'booking': booking})
@@ -452,3 +419,70 @@ def event_feedback(request, event_id):
     else:
         form = FeedbackForm()
     return render(request, 'events/event_feedback.html', {'form': form, 'event': event})
+
+
+def gate_staff_required(view):
+    """Check-in endpoints are for staff accounts on the gate devices."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse({'error': 'Gate staff login required.'}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _scan_result(result):
+    return {
+        'status': result.status,
+        'ticket_code': result.ticket_code,
+        'label': result.label,
+        'gate': result.gate,
+        'scanned_at': result.scanned_at.isoformat(),
+    }
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@require_GET
+@gate_staff_required
+def checkin_manifest(request, event_id):
+    """
+    Every valid ticket of an event, for gates that have to validate offline.
+    Fetching it before doors open also loads this process's gate index.
+    """
+    event = get_object_or_404(Event, pk=event_id)
+    # Gate apps send the CSRF cookie back as X-CSRFToken on scans.
+    get_token(request)
+    manifest = get_gate_index(event.pk).manifest()
+    manifest['generated_at'] = timezone.now().isoformat()
+    return JsonResponse(manifest)
+
+
+@require_POST
+@gate_staff_required
+def checkin_scan(request, event_id):
+    """Validate one scanned QR payload (or typed ticket code) and check the ticket in."""
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    gate = str(data.get('gate') or 'gate')[:50]
+    result = scan_ticket(event_id, str(data.get('payload') or data.get('ticket_code') or ''), gate)
+    return JsonResponse(_scan_result(result))
+
+
+@require_POST
+@gate_staff_required
+def checkin_sync(request, event_id):
+    """Upload the scans a gate made while offline; safe to send again."""
+    data = _json_body(request)
+    if data is None or not isinstance(data.get('scans'), list):
+        return JsonResponse({'error': 'Expected {"gate": ..., "scans": [...]}.'}, status=400)
+    gate = str(data.get('gate') or 'gate')[:50]
+    scans = [scan for scan in data['scans'] if isinstance(scan, dict)]
+    return JsonResponse({'results': [_scan_result(result) for result in sync_scans(event_id, gate, scans)]})
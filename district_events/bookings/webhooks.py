@@ -0,0 +1,181 @@
+"""
+Razorpay payment webhooks.
+
+The webhook view only checks the signature and queues the outcome with
+enqueue_payment_event(): one INSERT, then a 200 for the gateway. The
+PaymentWebhookEvent row is unique per payment id and outcome, and it is
+inserted with ignore_conflicts, so the gateway's retries and duplicate
+deliveries, and the checkout callback reporting the same payment, collapse
+into one event.
+
+process_payment_events() applies queued events in batches (the
+process_payment_webhooks command runs it in a loop). A batch is claimed
+with a conditional UPDATE, so several workers never take the same events.
+It is applied in one transaction, with a savepoint per event so a single
+bad event doesn't roll the batch back. Applying an event is idempotent: a
+payment that is already paid is left alone. Events claimed by a worker
+that died are claimed again after PAYMENT_WEBHOOK_CLAIM_TIMEOUT seconds,
+up to PAYMENT_WEBHOOK_MAX_ATTEMPTS times.
+"""
+import hashlib
+import hmac
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Payment, PaymentWebhookEvent
+from .services import confirm_booking, fail_payment
+
+logger = logging.getLogger(__name__)
+
+# Razorpay event -> the outcome it reports. Other events are acknowledged and dropped.
+OUTCOMES = {
+    'payment.authorized': PaymentWebhookEvent.PAID,
+    'payment.captured': PaymentWebhookEvent.PAID,
+    'order.paid': PaymentWebhookEvent.PAID,
+    'payment.failed': PaymentWebhookEvent.FAILED,
+}
+
+
+class InvalidWebhook(Exception):
+    """A webhook body is unsigned, wrongly signed or not a payment event."""
+
+
+def verify_webhook_signature(body, signature):
+    """Check the X-Razorpay-Signature header: a hex HMAC-SHA256 of the raw body."""
+    secret = settings.RAZORPAY_WEBHOOK_SECRET
+    if not secret or not signature:
+        raise InvalidWebhook('Webhook signature missing.')
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidWebhook('Webhook signature does not match.')
+
+
+def parse_webhook(data):
+    """
+    Return (outcome, payment entity) of a decoded webhook body, or None for
+    events this pipeline doesn't handle. Raises InvalidWebhook.
+    """
+    outcome = OUTCOMES.get(data.get('event')) if isinstance(data, dict) else None
+    if outcome is None:
+        return None
+    try:
+        entity = data['payload']['payment']['entity']
+        entity['id'], entity['order_id']
+    except (KeyError, TypeError):
+        raise InvalidWebhook('Webhook has no payment entity.')
+    return outcome, entity
+
+
+def enqueue_payment_event(payment_id, order_id, outcome, signature='', payload=None,
+                          source=PaymentWebhookEvent.WEBHOOK):
+    """Queue a payment outcome. Queuing one that is already queued does nothing."""
+    PaymentWebhookEvent.objects.bulk_create([PaymentWebhookEvent(
+        razorpay_payment_id=payment_id,
+        razorpay_order_id=order_id,
+        razorpay_signature=signature or '',
+        outcome=outcome,
+        source=source,
+        payload=payload or {},
+    )], ignore_conflicts=True)
+
+
+def claim_events(batch_size, payment_id=None):
+    """Mark up to batch_size queued events as processing by this worker and return them."""
+    now = timezone.now()
+    claimable = PaymentWebhookEvent.objects.filter(
+        Q(status=PaymentWebhookEvent.PENDING)
+        | Q(status=PaymentWebhookEvent.PROCESSING,
+            claimed_at__lt=now - timedelta(seconds=settings.PAYMENT_WEBHOOK_CLAIM_TIMEOUT)),
+    )
+    if payment_id:
+        claimable = claimable.filter(razorpay_payment_id=payment_id)
+    event_ids = list(claimable.order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if not event_ids:
+        return []
+    # Same guard as the claim query: a worker that got there first already
+    # moved the row on, and the claim timestamp tells us which rows we won.
+    claimable.filter(pk__in=event_ids).update(
+        status=PaymentWebhookEvent.PROCESSING, claimed_at=now, attempts=F('attempts') + 1,
+    )
+    return list(PaymentWebhookEvent.objects.filter(
+        pk__in=event_ids, status=PaymentWebhookEvent.PROCESSING, claimed_at=now,
+    ).order_by('pk'))
+
+
+def apply_event(event, payment):
+    """Apply one event to its payment and booking. Returns the event's new status."""
+    if payment is None:
+        event.error = 'No payment for this order.'
+        return PaymentWebhookEvent.IGNORED
+    if payment.payment_status == 'paid':
+        # Already confirmed, by an earlier delivery or the other source.
+        return PaymentWebhookEvent.PROCESSED
+
+    fields = {'razorpay_payment_id': event.razorpay_payment_id}
+    if event.razorpay_signature:
+        fields['razorpay_signature'] = event.razorpay_signature
+    if event.outcome == PaymentWebhookEvent.PAID:
+        confirm_booking(payment.booking, payment=payment, **fields)
+    else:
+        fail_payment(payment, **fields)
+    return PaymentWebhookEvent.PROCESSED
+
+
+def process_events(events):
+    """Apply claimed events in one transaction. Returns the number processed."""
+    if not events:
+        return 0
+    payments = {
+        payment.razorpay_order_id: payment
+        for payment in Payment.objects.select_related('booking').filter(
+            razorpay_order_id__in={event.razorpay_order_id for event in events}
+        )
+    }
+    now = timezone.now()
+    with transaction.atomic():
+        for event in events:
+            payment = payments.get(event.razorpay_order_id)
+            try:
+                with transaction.atomic():
+                    event.status = apply_event(event, payment)
+            except ValidationError as exc:
+                # Paid after the hold lapsed (HoldExpired) or the seat went to
+                # someone else: the payment needs a refund rather than a booking.
+                event.status, event.error = PaymentWebhookEvent.ERROR, exc.messages[0]
+                if payment is not None:
+                    payments[event.razorpay_order_id] = Payment.objects.select_related('booking').get(pk=payment.pk)
+            event.processed_at = now
+        PaymentWebhookEvent.objects.bulk_update(events, ['status', 'error', 'processed_at'])
+    return len(events)
+
+
+def process_payment_events(batch_size=None, payment_id=None):
+    """
+    Apply queued events, a batch per transaction, until none are left.
+    With payment_id, only that payment's events. Returns the number processed.
+    """
+    batch_size = batch_size or settings.PAYMENT_WEBHOOK_BATCH_SIZE
+    processed = 0
+    while True:
+        events = claim_events(batch_size, payment_id)
+        if not events:
+            return processed
+        claimed = len(events)
+        exhausted = [event for event in events if event.attempts > settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS]
+        if exhausted:
+            for event in exhausted:
+                event.status, event.error = PaymentWebhookEvent.ERROR, 'Too many failed attempts.'
+            PaymentWebhookEvent.objects.bulk_update(exhausted, ['status', 'error'])
+            events = [event for event in events if event not in exhausted]
+        try:
+            processed += process_events(events)
+        except DatabaseError:
+            # The claim stands; the events are retried once it times out.
+            logger.exception('Applying %s payment webhook event(s) failed.', len(events))
+            return processed
+        if claimed < batch_size:
+            return processed
@@ -1,5 +1,14 @@
 """
 ASGI config for district_events project.
+
+Serve with an ASGI server (e.g. `uvicorn district_events.asgi:application`)
+to enable the live seat availability stream at
+/events/api/seats/<event_id>/stream/. With more than one worker process set
+AVAILABILITY_BROKER to 'events.pubsub.PollingBroker'.
+
+The catalogue read views (home page, event list and detail, seat and city
+JSON) are async and run on the event loop here; `manage.py bench_wsgi_asgi`
+compares them under both servers.
 """
 import os
 from django.core.asgi import get_asgi_application
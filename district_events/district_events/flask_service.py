@@ -0,0 +1,159 @@
+"""
+Client for the Flask about/contact microservice (flask_api/app.py).
+
+Pages that show data from the Flask service must never wait on it for long:
+
+* one pooled requests.Session per process, with strict connect/read timeouts;
+* the last good payload of every GET is kept in the Django cache; once it is
+  older than FLASK_SERVICE_MAX_AGE it is still returned, and a background
+  thread fetches a fresh copy;
+* a circuit breaker opens after FLASK_SERVICE_FAILURE_THRESHOLD consecutive
+  failures; while open, no requests are sent and callers get the last good
+  payload (or the default), until FLASK_SERVICE_RESET_TIMEOUT has passed and
+  one trial request is let through.
+
+Only a GET with nothing cached waits on the service, and only up to the
+timeout.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+
+
+class ServiceUnavailable(Exception):
+    """The Flask service failed, timed out or its circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker: closed, open, then half-open."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a request may be sent now. Half-open lets one trial through."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # A failed trial re-opens the circuit for another reset_timeout.
+                self.opened_at = time.monotonic()
+
+
+class FlaskServiceClient:
+    def __init__(self, base_url=None, timeout=None, max_age=None,
+                 failure_threshold=None, reset_timeout=None):
+        self.base_url = (base_url or settings.FLASK_SERVICE_URL).rstrip('/')
+        self.timeout = timeout or settings.FLASK_SERVICE_TIMEOUT
+        self.max_age = settings.FLASK_SERVICE_MAX_AGE if max_age is None else max_age
+        self.breaker = CircuitBreaker(
+            failure_threshold or settings.FLASK_SERVICE_FAILURE_THRESHOLD,
+            settings.FLASK_SERVICE_RESET_TIMEOUT if reset_timeout is None else reset_timeout,
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='flask-service')
+
+    def _cache_key(self, path):
+        return f'flask_service:{self.base_url}{path}'
+
+    def request(self, method, path, **kwargs):
+        """Send a request through the circuit breaker and return the decoded JSON."""
+        if not self.breaker.allow():
+            raise ServiceUnavailable(f'Circuit open for {self.base_url}')
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            raise ServiceUnavailable(str(e)) from e
+        self.breaker.record_success()
+        return payload
+
+    def _fetch(self, path):
+        payload = self.request('GET', path)
+        cache.set(self._cache_key(path), (time.time(), payload), None)
+        return payload
+
+    def _refresh(self, path):
+        try:
+            self._fetch(path)
+        except ServiceUnavailable:
+            pass
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(path)
+
+    def refresh_in_background(self, path):
+        with self._refresh_lock:
+            if path in self._refreshing:
+                return
+            self._refreshing.add(path)
+        self._executor.submit(self._refresh, path)
+
+    def get(self, path, default=None):
+        """
+        Return the payload at `path`, preferring the last good copy.
+
+        Stale copies are refreshed in the background; `default` is returned
+        only when nothing was ever fetched and the service cannot answer now.
+        """
+        cached = cache.get(self._cache_key(path))
+        if cached is not None:
+            fetched_at, payload = cached
+            if time.time() - fetched_at > self.max_age and self.breaker.state != 'open':
+                self.refresh_in_background(path)
+            return payload
+        try:
+            return self._fetch(path)
+        except ServiceUnavailable:
+            return default
+
+    def post(self, path, json):
+        """POST `json` to the service. Raises ServiceUnavailable on failure."""
+        return self.request('POST', path, json=json)
+
+
+@lru_cache(maxsize=None)
+def get_flask_client():
+    """The process-wide FlaskServiceClient, so its connection pool is shared."""
+    return FlaskServiceClient()
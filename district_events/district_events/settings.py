@@ -138,12 +138,78 @@ LOGOUT_REDIRECT_URL = 'home'
 # Razorpay configuration
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', '')
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+RAZORPAY_API_URL = os.getenv('RAZORPAY_API_URL', 'https://api.razorpay.com')
+
+# Razorpay client and checkout orders (bookings.gateway): (connect, read)
+# timeout, pooled connections per process, seconds a stored order is reused
+# for, and whether seat selection creates the order in the background.
+RAZORPAY_TIMEOUT = (3.05, 10)
+RAZORPAY_POOL_SIZE = 16
+RAZORPAY_ORDER_TTL = 30 * 60
+RAZORPAY_PRECREATE_ORDERS = True
+RAZORPAY_PRECREATE_WORKERS = 2
 
 # OTP settings
 OTP_EXPIRY_TIME = 5 * 60  # 5 minutes in seconds
 
+# How long a selected seat/zone is held while the user pays
+SEAT_HOLD_TTL = 10 * 60  # 10 minutes in seconds
+
+# Live seat availability stream (events.pubsub). InProcessBroker only reaches
+# subscribers of the same process; use PollingBroker with several workers.
+AVAILABILITY_BROKER = 'events.pubsub.InProcessBroker'
+AVAILABILITY_POLL_INTERVAL = 1.0  # seconds, PollingBroker only
+AVAILABILITY_STREAM_KEEPALIVE = 15  # seconds between SSE keepalive comments
+AVAILABILITY_STREAM_RETRY_MS = 3000  # EventSource reconnect delay
+
+# Event search backend (events.search). None picks SQLite FTS5 on SQLite and a
+# plain substring scan on other databases.
+SEARCH_BACKEND = None
+
 # Flask service URL
-FLASK_SERVICE_URL = 'http://localhost:8000'  # Flask microservice URL
+FLASK_SERVICE_URL = os.getenv('FLASK_SERVICE_URL', 'http://localhost:5000')  # Flask microservice URL
+# district_events.flask_service: (connect, read) timeouts in seconds, how long
+# a cached payload is served before a background refresh, and circuit breaker.
+FLASK_SERVICE_TIMEOUT = (0.5, 2.0)
+FLASK_SERVICE_MAX_AGE = 5 * 60
+FLASK_SERVICE_FAILURE_THRESHOLD = 3
+FLASK_SERVICE_RESET_TIMEOUT = 30
+
+# Ticket PDFs (bookings.tickets): rendering worker processes (0 renders in the
+# request thread) and how long a rendered PDF and a ticket's QR symbol stay cached.
+TICKET_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+TICKET_PDF_CACHE_TIMEOUT = 24 * 60 * 60
+TICKET_QR_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Ticket codes (bookings.codes): sequence numbers each thread reserves per query.
+TICKET_CODE_BLOCK_SIZE = 100
+
+# Refunds (bookings.refunds): refunds claimed per chunk, gateway threads, gateway
+# requests per second, seconds before a crashed run's claim lapses, and attempts.
+REFUND_CHUNK_SIZE = 200
+REFUND_WORKERS = 8
+REFUND_RATE_LIMIT = 20
+REFUND_CLAIM_TIMEOUT = 5 * 60
+REFUND_MAX_ATTEMPTS = 5
+
+# Bulk booking actions (bookings.bulk): bookings changed per transaction.
+BULK_BOOKING_CHUNK_SIZE = 1000
+
+# Gate check-in (bookings.checkin): check-ins are written in batches of
+# CHECKIN_BATCH_SIZE or every CHECKIN_FLUSH_INTERVAL seconds; per-event ticket
+# indexes reload after CHECKIN_INDEX_MAX_AGE seconds; first-scan claims are
+# kept in the cache for CHECKIN_CLAIM_TIMEOUT seconds.
+CHECKIN_BATCH_SIZE = 200
+CHECKIN_FLUSH_INTERVAL = 1.0
+CHECKIN_INDEX_MAX_AGE = 5 * 60
+CHECKIN_CLAIM_TIMEOUT = 24 * 60 * 60
+
+# Payment webhooks (bookings.webhooks): events applied per transaction, seconds
+# before a worker's claim on an event lapses, and attempts before giving up.
+PAYMENT_WEBHOOK_BATCH_SIZE = 100
+PAYMENT_WEBHOOK_CLAIM_TIMEOUT = 60
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = 5
 
 # Email settings (for OTP and other notifications)
 # Email configuration (for contact form)
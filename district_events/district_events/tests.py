@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from .flask_service import FlaskServiceClient
+
+
+class StubService:
+    """Local stand-in for the Flask service that can be made slow or broken."""
+
+    def __init__(self):
+        self.mode = 'ok'
+        self.delay = 0
+        self.hits = 0
+        self.version = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                if stub.mode == 'slow':
+                    time.sleep(stub.delay)
+                if stub.mode == 'error':
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = json.dumps({'company': 'District Events', 'version': stub.version}).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    # The client gave up waiting.
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FlaskServiceClientTests(SimpleTestCase):
+    """Pages must never block on a slow or failing Flask service."""
+    latency = 1.0  # longer than the client's read timeout
+
+    def setUp(self):
+        cache.clear()
+        self.stub = StubService()
+        self.addCleanup(self.stub.close)
+        self.client = FlaskServiceClient(
+            base_url=self.stub.url, timeout=(0.2, 0.5), max_age=0.5, failure_threshold=3, reset_timeout=1,
+        )
+
+    def timed_get(self, path, default=None):
+        began = time.perf_counter()
+        payload = self.client.get(path, default=default)
+        return payload, (time.perf_counter() - began) * 1000
+
+    def settle(self):
+        # Let background refreshes finish.
+        while self.client._refreshing:
+            time.sleep(0.05)
+
+    def open_circuit(self):
+        """Cache a payload, then make the service slow until the circuit opens."""
+        self.timed_get('/api/about')
+        self.stub.mode, self.stub.delay = 'slow', self.latency
+        time.sleep(0.6)
+        worst = 0
+        for _ in range(6):
+            payload, elapsed = self.timed_get('/api/about')
+            worst = max(worst, elapsed)
+            self.settle()
+        return payload, worst
+
+    def test_cold_fetch(self):
+        payload, _ = self.timed_get('/api/about')
+        self.assertEqual(payload['version'], 0)
+
+    def test_slow_service_serves_last_good_payload(self):
+        payload, worst = self.open_circuit()
+        self.assertEqual(payload['version'], 0)
+        self.assertLess(worst, 50, 'a caller waited on the slow service')
+        self.assertEqual(self.client.breaker.state, 'open')
+
+    def test_open_circuit_sends_nothing(self):
+        self.open_circuit()
+        hits = self.stub.hits
+        for _ in range(20):
+            self.timed_get('/api/about')
+        self.settle()
+        self.assertEqual(self.stub.hits, hits)
+        payload, elapsed = self.timed_get('/api/contact', default={})
+        self.assertEqual(payload, {})
+        self.assertLess(elapsed, 50)
+
+    def test_recovery_after_reset_timeout(self):
+        self.open_circuit()
+        self.stub.mode, self.stub.version = 'ok', 1
+        time.sleep(self.client.breaker.reset_timeout + 0.1)
+        self.timed_get('/api/about')
+        self.settle()
+        payload, _ = self.timed_get('/api/about')
+        self.assertEqual(self.client.breaker.state, 'closed')
+        self.assertEqual(payload['version'], 1)
+
+    def test_failing_service_returns_default_within_timeout(self):
+        self.stub.mode = 'error'
+        payload, elapsed = self.timed_get('/api/missing', default={})
+        self.assertEqual(payload, {})
+        self.assertLess(elapsed, 1000)
@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django import forms
-from .models import City, Venue, EventCategory, Event, SeatCategory, Zone, Seat
+from django.core.exceptions import ValidationError
+from .models import City, Venue, EventCategory, Event, SeatCategory, Zone, Seat, VenueLayout, LayoutSection, CompactSeating
+from .layouts import build_layout_seats, generate_event_seats
+from .compact import convert_to_compact, convert_to_rows
+from .seatmap import invalidate_seat_map
 
 @admin.register(City)
 class CityAdmin(admin.ModelAdmin):
@@ -33,11 +37,12 @@ class ZoneInline(admin.TabularInline):
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'venue', 'category', 'start_date', 'end_date', 'is_published', 'is_featured')
-    list_filter = ('venue__city', 'category', 'is_published', 'is_featured', 'is_indoor_event')
+    list_display = ('title', 'venue', 'category', 'start_date', 'end_date', 'min_price', 'max_price', 'seat_storage', 'is_published', 'is_featured')
+    list_filter = ('venue__city', 'category', 'is_published', 'is_featured', 'is_indoor_event', 'seat_storage')
     search_fields = ('title', 'description', 'venue__name')
     date_hierarchy = 'start_date'
     inlines = [ZoneInline, SeatInline]
+    actions = ['convert_to_compact_storage', 'convert_to_seat_rows']
     
     fieldsets = (
         (None, {
@@ -74,27 +79,26 @@ class EventAdmin(admin.ModelAdmin):
         if not change and obj.is_indoor_event and form.cleaned_data.get('generate_seats', False):
             self.generate_seats(request, obj)
     
+    @admin.action(description="Convert seats to compact storage (venue layout + bitmap)")
+    def convert_to_compact_storage(self, request, queryset):
+        for event in queryset.filter(seat_storage=Event.SEAT_ROWS, is_indoor_event=True):
+            try:
+                deleted = convert_to_compact(event)
+                self.message_user(request, f"{event.title}: converted, {deleted} seat rows removed")
+            except ValidationError as e:
+                self.message_user(request, f"{event.title}: {e.message}", level='error')
+
+    @admin.action(description="Convert seats back to one row per seat")
+    def convert_to_seat_rows(self, request, queryset):
+        for event in queryset.filter(seat_storage=Event.SEAT_COMPACT):
+            created = convert_to_rows(event)
+            self.message_user(request, f"{event.title}: {created} seat rows created")
+
     def generate_seats(self, request, event):
-        """Generate seats for indoor events"""
+        """Generate seats for indoor events from the venue's layout"""
         try:
-            default_category = SeatCategory.objects.first()
-            if not default_category:
-                default_category = SeatCategory.objects.create(name='Standard')
-            
-            seats = []
-            for row in range(1, 11):  # Rows A-J
-                for seat_num in range(1, 21):  # Seats 1-20 per row
-                    seats.append(Seat(
-                        event=event,
-                        row=chr(64 + row),
-                        number=seat_num,
-                        category=default_category,
-                        price=event.venue.base_price if hasattr(event.venue, 'base_price') else 50.00,
-                        is_available=True
-                    ))
-            
-            Seat.objects.bulk_create(seats)
-            self.message_user(request, f"Successfully generated {len(seats)} seats for {event.title}")
+            created = generate_event_seats(event)
+            self.message_user(request, f"Successfully generated {created} seats for {event.title}")
         except Exception as e:
             self.message_user(request, f"Error generating seats: {str(e)}", level='error')
 
@@ -105,7 +109,7 @@ class SeatCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Zone)
 class ZoneAdmin(admin.ModelAdmin):
-    list_display = ('name', 'event', 'capacity', 'price')
+    list_display = ('name', 'event', 'capacity', 'booked_count', 'price')
     list_filter = ('event__venue__city',)
     search_fields = ('name', 'event__title')
 
@@ -114,4 +118,42 @@ class SeatAdmin(admin.ModelAdmin):
     list_display = ('event', 'row', 'number', 'category', 'price', 'is_available')
     list_filter = ('event', 'category', 'is_available')
     search_fields = ('event__title', 'row', 'number')
-    list_editable = ('price', 'is_available')
\ No newline at end of file
+    list_editable = ('price', 'is_available')
+
+class LayoutSectionInline(admin.TabularInline):
+    model = LayoutSection
+    extra = 1
+    fields = ('name', 'rows', 'first_seat', 'last_seat', 'category', 'price')
+
+@admin.register(VenueLayout)
+class VenueLayoutAdmin(admin.ModelAdmin):
+    list_display = ('name', 'venue', 'seat_count', 'updated_at')
+    list_filter = ('venue__city',)
+    search_fields = ('name', 'venue__name')
+    readonly_fields = ('seat_count',)
+    inlines = [LayoutSectionInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Expand the (possibly edited) sections into the seats new events copy.
+        try:
+            created = build_layout_seats(form.instance)
+            self.message_user(request, f"Layout now has {created} seats")
+        except ValidationError as e:
+            self.message_user(request, f"Error building layout seats: {e.message}", level='error')
+
+@admin.register(CompactSeating)
+class CompactSeatingAdmin(admin.ModelAdmin):
+    list_display = ('event', 'layout')
+    search_fields = ('event__title', 'layout__name')
+    fields = ('event', 'layout', 'price_overrides')
+    readonly_fields = ('event', 'layout')
+
+    def has_add_permission(self, request):
+        # Created by generate_event_seats / convert_to_compact.
+        return False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        Event.update_price_range(obj.event_id)
+        invalidate_seat_map(obj.event_id)
@@ -0,0 +1,106 @@
+"""
+Per-event availability versioning.
+
+Every committed change to seat or zone availability advances
+Event.availability_version and stamps the changed seats with the new
+version, so polling clients can fetch only the seats that changed since
+the version they last saw. The change is then published to stream
+subscribers through events.pubsub.
+
+Versions are bumped in their own short transaction after the booking
+transaction commits, so concurrent reservations never queue on the
+event row.
+"""
+from django.db import transaction
+from django.db.models import F
+from .models import Event, Seat, Zone
+from .pubsub import get_broker
+from .seatmap import map_seat_ids, patch_availability
+
+
+def bump_version(event_id, seat_ids=()):
+    """
+    Advance the event's availability version and stamp `seat_ids` with it.
+    Returns the new version.
+    """
+    with transaction.atomic():
+        Event.objects.filter(pk=event_id).update(availability_version=F('availability_version') + 1)
+        version = Event.objects.filter(pk=event_id).values_list('availability_version', flat=True).first()
+        if seat_ids and version is not None:
+            Seat.objects.filter(pk__in=seat_ids).update(availability_version=version)
+    return version
+
+
+def zone_availability(event_id):
+    return [
+        {'id': zone_id, 'available_seats': max(capacity - booked - held, 0)}
+        for zone_id, capacity, booked, held in Zone.objects.filter(event_id=event_id)
+        .values_list('id', 'capacity', 'booked_count', 'held_count')
+    ]
+
+
+def _seat_messages(event_id, seats):
+    """[(Seat pk, is_available)] to message entries keyed by seat map id."""
+    seats = list(seats)
+    map_ids = map_seat_ids(event_id, [seat_id for seat_id, _ in seats])
+    return [
+        {'id': map_ids[seat_id], 'is_available': is_available}
+        for seat_id, is_available in seats if seat_id in map_ids
+    ]
+
+
+def seat_changes(event_id, since):
+    """Seats of an event whose availability changed after version `since`."""
+    return _seat_messages(event_id, Seat.objects.filter(
+        event_id=event_id, availability_version__gt=since
+    ).values_list('id', 'is_available'))
+
+
+def changes_since(event_id, since):
+    """Availability message with every seat changed after `since`, plus all zones."""
+    version = Event.objects.filter(pk=event_id).values_list('availability_version', flat=True).first() or 0
+    return {
+        'version': version,
+        'seats': seat_changes(event_id, since),
+        'zones': zone_availability(event_id),
+    }
+
+
+def seats_changed(event_id, seat_ids, available=None):
+    """
+    Record that seats of an event changed once the current transaction
+    commits. Pass `available` to patch the cached seat map in place.
+    """
+    seat_ids = list(seat_ids)
+    if not seat_ids:
+        return
+
+    def publish():
+        version = bump_version(event_id, seat_ids)
+        broker = get_broker()
+        if available is not None:
+            patch_availability(event_id, seat_ids, available)
+        if not broker.subscriber_count(event_id):
+            return
+
+        if available is None:
+            seats = Seat.objects.filter(pk__in=seat_ids).values_list('id', 'is_available')
+        else:
+            seats = [(seat_id, available) for seat_id in seat_ids]
+        broker.publish(event_id, {
+            'version': version,
+            'seats': _seat_messages(event_id, seats),
+        })
+
+    transaction.on_commit(publish)
+
+
+def zones_changed(event_id):
+    """Record that zone availability of an event changed once the transaction commits."""
+    def publish():
+        version = bump_version(event_id)
+        broker = get_broker()
+        if broker.subscriber_count(event_id):
+            broker.publish(event_id, {'version': version, 'zones': zone_availability(event_id)})
+
+    transaction.on_commit(publish)
@@ -0,0 +1,212 @@
+"""
+Compact seat storage.
+
+A compact event has no Seat row per seat. Its CompactSeating points at the
+venue's VenueLayout and stores availability as a bitmap in LayoutSeat id
+order (bit set = available), plus the few prices that differ from the
+layout. Seat maps and clients identify compact seats by LayoutSeat id.
+
+Seat rows are created only when a seat is selected (resolve_seat), so
+bookings, holds and the availability versioning keep working on real Seat
+rows; such a row always wins over the bitmap bit for its seat.
+
+convert_to_compact() and convert_to_rows() move existing events between
+the two storage modes.
+"""
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max, Min
+from .models import Event, Seat, SeatCategory, Zone, LayoutSeat, CompactSeating
+from .seatmap import CategoryRef, get_seat_map, invalidate_seat_map, pack_bits
+
+
+def _bit(bits, index):
+    return index >> 3 < len(bits) and bool(bits[index >> 3] & (1 << (index & 7)))
+
+
+def _set_bit(bits, index, flag):
+    if flag:
+        bits[index >> 3] |= 1 << (index & 7)
+    else:
+        bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+
+def _price(seating, layout_seat_id, price):
+    override = seating.price_overrides.get(str(layout_seat_id))
+    return Decimal(override) if override is not None else price
+
+
+def build_layout(seating):
+    """Seat map layout and availability bits of a compact event (see events.seatmap)."""
+    seats = [
+        (seat_id, row, number, category_id, _price(seating, seat_id, price))
+        for seat_id, row, number, category_id, price in LayoutSeat.objects.filter(layout_id=seating.layout_id)
+        .order_by('pk').values_list('id', 'row', 'number', 'category_id', 'price')
+    ]
+    category_ids = {seat[3] for seat in seats}
+    layout = {
+        'seats': seats,
+        'index': {seat[0]: index for index, seat in enumerate(seats)},
+        'labels': {(seat[1], seat[2]): index for index, seat in enumerate(seats)},
+        'categories': {
+            category_id: CategoryRef(category_id, name)
+            for category_id, name in SeatCategory.objects.filter(pk__in=category_ids).values_list('id', 'name')
+        },
+        'compact': True,
+    }
+    return layout, load_availability(seating.event_id, layout, seating.availability)
+
+
+def load_availability(event_id, layout, bitmap=None):
+    """The stored bitmap with the event's Seat rows applied on top."""
+    if bitmap is None:
+        bitmap = CompactSeating.objects.filter(event_id=event_id).values_list('availability', flat=True).first()
+    bits = bytearray(bytes(bitmap or b''))
+    bits.extend(bytes((len(layout['seats']) + 7) // 8 - len(bits)))
+    for row, number, is_available in Seat.objects.filter(event_id=event_id).values_list('row', 'number', 'is_available'):
+        index = layout['labels'].get((row, number))
+        if index is not None:
+            _set_bit(bits, index, is_available)
+    return bytes(bits)
+
+
+def seat_positions(event_id, layout, seat_ids):
+    """Map Seat pks of a compact event to their positions in the layout."""
+    positions = {}
+    for seat_id, row, number in Seat.objects.filter(pk__in=seat_ids, event_id=event_id).values_list('id', 'row', 'number'):
+        index = layout['labels'].get((row, number))
+        if index is not None:
+            positions[seat_id] = index
+    return positions
+
+
+def resolve_seat(event, seat_id):
+    """
+    Return the Seat for an id from the event's seat map, creating the Seat
+    row of a compact event's seat on first use. Raises Seat.DoesNotExist
+    (or LayoutSeat.DoesNotExist) for ids that are not seats of the event.
+    """
+    if event.seat_storage != Event.SEAT_COMPACT:
+        return Seat.objects.get(pk=seat_id, event=event)
+
+    seating = event.compact_seating
+    layout_seat = LayoutSeat.objects.get(pk=seat_id, layout_id=seating.layout_id)
+    seat = Seat.objects.filter(event=event, row=layout_seat.row, number=layout_seat.number).first()
+    if seat is not None:
+        return seat
+
+    index = get_seat_map(event.id).layout['index'][layout_seat.pk]
+    # bulk_create skips Seat.save(): creating the row changes neither the
+    # seat's availability nor its price, so the cached map stays valid.
+    Seat.objects.bulk_create([Seat(
+        event=event,
+        row=layout_seat.row,
+        number=layout_seat.number,
+        category_id=layout_seat.category_id,
+        price=_price(seating, layout_seat.pk, layout_seat.price),
+        is_available=_bit(seating.availability, index),
+    )], ignore_conflicts=True)
+    return Seat.objects.get(event=event, row=layout_seat.row, number=layout_seat.number)
+
+
+def price_range(event_id):
+    """(min, max) seat and zone price of a compact event."""
+    seating = CompactSeating.objects.get(event_id=event_id)
+    prices = LayoutSeat.objects.filter(layout_id=seating.layout_id).aggregate(low=Min('price'), high=Max('price'))
+    prices = [price for price in prices.values() if price is not None]
+    prices.extend(Decimal(price) for price in seating.price_overrides.values())
+    zones = Zone.objects.filter(event_id=event_id).aggregate(low=Min('price'), high=Max('price'))
+    prices.extend(price for price in zones.values() if price is not None)
+    return (min(prices), max(prices)) if prices else (None, None)
+
+
+def create_compact_seating(event, layout):
+    """Give a new event compact seats, all available, from `layout`."""
+    with transaction.atomic():
+        CompactSeating.objects.create(
+            event=event, layout=layout, availability=pack_bits([True] * layout.seat_count)
+        )
+        Event.objects.filter(pk=event.pk).update(seat_storage=Event.SEAT_COMPACT)
+        event.seat_storage = Event.SEAT_COMPACT
+        Event.update_price_range(event.pk)
+        invalidate_seat_map(event.pk)
+    return layout.seat_count
+
+
+def convert_to_compact(event, layout=None):
+    """
+    Move an event's Seat rows into compact storage on `layout` (default: the
+    venue's). Seats referenced by a booking or hold keep their rows. Every
+    seat must exist in the layout; layout seats the event never had are
+    stored as unavailable. Returns the number of Seat rows deleted.
+    """
+    from bookings.models import Booking, SeatHold
+
+    with transaction.atomic():
+        event = Event.objects.select_for_update().select_related('venue').get(pk=event.pk)
+        if event.seat_storage == Event.SEAT_COMPACT:
+            return 0
+        if layout is None:
+            layout = getattr(event.venue, 'layout', None)
+        if layout is None or not layout.seat_count:
+            raise ValidationError(f"{event.venue} has no layout seats to convert {event.title} onto.")
+
+        labels = {
+            (row, number): (index, seat_id, price)
+            for index, (seat_id, row, number, price) in enumerate(
+                LayoutSeat.objects.filter(layout=layout).order_by('pk').values_list('id', 'row', 'number', 'price')
+            )
+        }
+        bits = bytearray((len(labels) + 7) // 8)
+        overrides = {}
+        seats = Seat.objects.filter(event=event).values_list('row', 'number', 'price', 'is_available')
+        for row, number, price, is_available in seats.iterator(chunk_size=5000):
+            if (row, number) not in labels:
+                raise ValidationError(f"Seat {row}{number} of {event.title} is not in layout {layout}.")
+            index, layout_seat_id, layout_price = labels[(row, number)]
+            _set_bit(bits, index, is_available)
+            if price != layout_price:
+                overrides[str(layout_seat_id)] = str(price)
+
+        CompactSeating.objects.create(event=event, layout=layout, availability=bytes(bits), price_overrides=overrides)
+        referenced = set(Booking.objects.filter(event=event, seat__isnull=False).values_list('seat_id', flat=True))
+        referenced |= set(SeatHold.objects.filter(event=event, seat__isnull=False).values_list('seat_id', flat=True))
+        deleted, _ = Seat.objects.filter(event=event).exclude(pk__in=referenced).delete()
+        Event.objects.filter(pk=event.pk).update(seat_storage=Event.SEAT_COMPACT)
+        Event.update_price_range(event.pk)
+        invalidate_seat_map(event.pk)
+    return deleted
+
+
+def convert_to_rows(event, batch_size=5000):
+    """Materialize every seat of a compact event as a Seat row again. Returns rows created."""
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(pk=event.pk)
+        if event.seat_storage != Event.SEAT_COMPACT:
+            return 0
+        seating = event.compact_seating
+        existing = set(Seat.objects.filter(event=event).values_list('row', 'number'))
+        layout_seats = LayoutSeat.objects.filter(layout_id=seating.layout_id).order_by('pk').values_list(
+            'id', 'row', 'number', 'category_id', 'price'
+        )
+        batch, created = [], 0
+        for index, (seat_id, row, number, category_id, price) in enumerate(layout_seats.iterator(chunk_size=batch_size)):
+            if (row, number) in existing:
+                continue
+            batch.append(Seat(
+                event=event, row=row, number=number, category_id=category_id,
+                price=_price(seating, seat_id, price), is_available=_bit(seating.availability, index),
+            ))
+            if len(batch) == batch_size:
+                Seat.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            Seat.objects.bulk_create(batch)
+            created += len(batch)
+        seating.delete()
+        Event.objects.filter(pk=event.pk).update(seat_storage=Event.SEAT_ROWS)
+        Event.update_price_range(event.pk)
+        invalidate_seat_map(event.pk)
+    return created
@@ -0,0 +1,147 @@
+"""
+Cached sections of the home page.
+
+Each section (featured, upcoming, cities, about) is cached on its own,
+keyed by section and date, alongside the home-page generation it was built
+for. Saving or deleting an Event, Venue or City bumps the generation (see
+events.signals), which marks the database sections stale without deleting
+them.
+
+Stale entries are served while a single request, holding a short cache
+lock, rebuilds them. Only a cold cache makes requests wait. Even then they
+wait on the lock holder instead of running the same queries themselves.
+"""
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from district_events.flask_service import get_flask_client
+from .models import Event, City
+
+GENERATION_KEY = 'home:generation'
+# How long a section is served without a rebuild, in seconds.
+FRESH_FOR = {
+    'featured': 5 * 60,
+    'upcoming': 5 * 60,
+    'cities': 60 * 60,
+    'about': 10 * 60,
+}
+# Sections built from the database; 'about' comes from the Flask service and
+# only goes stale with time.
+MODEL_SECTIONS = {'featured', 'upcoming', 'cities'}
+# Stale entries are kept this long so there is always something to serve.
+STALE_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 30
+COLD_WAIT = 2.0
+
+
+def _featured(today):
+    return (
+        Event.objects.filter(is_published=True, is_featured=True, end_date__gte=today)
+        .select_related('venue__city', 'category').order_by('start_date')[:6]
+    )
+
+
+def _upcoming(today):
+    return (
+        Event.objects.filter(is_published=True, start_date__gt=today)
+        .select_related('venue__city', 'category').order_by('start_date')[:8]
+    )
+
+
+def _cities(today):
+    return City.objects.filter(is_active=True).order_by('name')
+
+
+QUERYSETS = {
+    'featured': _featured,
+    'upcoming': _upcoming,
+    'cities': _cities,
+}
+
+
+async def _aload(section, today):
+    if section == 'about':
+        # The client answers from its cache; a cold fetch runs off the event loop.
+        return await sync_to_async(get_flask_client().get, thread_sensitive=False)('/api/about', default={})
+    return [obj async for obj in QUERYSETS[section](today)]
+
+
+def _entry(section, value, generation):
+    return {
+        'value': value,
+        'generation': generation,
+        'fresh_until': time.time() + FRESH_FOR[section],
+    }
+
+
+def _is_fresh(entry, generation):
+    return entry is not None and entry['generation'] == generation and entry['fresh_until'] > time.time()
+
+
+async def aget_section(section, today=None):
+    """Return one home-page section, rebuilding it at most once at a time."""
+    today = today or timezone.now().date()
+    key = f'home:{section}:{today.isoformat()}'
+    lock_key = f'{key}:lock'
+    generation = await cache.aget(GENERATION_KEY, 0) if section in MODEL_SECTIONS else 0
+    entry = await cache.aget(key)
+
+    if _is_fresh(entry, generation):
+        return entry['value']
+
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = await _aload(section, today)
+            await cache.aset(key, _entry(section, value, generation), STALE_TIMEOUT)
+            return value
+        finally:
+            await cache.adelete(lock_key)
+
+    if entry is not None:
+        # Someone else is rebuilding; the stale copy will do for now.
+        return entry['value']
+
+    # Cold cache: give the lock holder a moment before doing the work ourselves.
+    deadline = time.time() + COLD_WAIT
+    while time.time() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry['value']
+    return await _aload(section, today)
+
+
+async def ahome_page_context():
+    """
+    Context shared by the home page views, minus the per-request search
+    form. The four sections are fetched concurrently.
+    """
+    today = timezone.now().date()
+    featured, upcoming, cities, about = await asyncio.gather(
+        aget_section('featured', today),
+        aget_section('upcoming', today),
+        aget_section('cities', today),
+        aget_section('about', today),
+    )
+    return {
+        'featured_events': featured,
+        'upcoming_events': upcoming,
+        'cities': cities,
+        'about_data': about,
+    }
+
+
+def invalidate_home_page():
+    """Mark the database sections of the home page stale once the transaction commits."""
+    def bump():
+        if not cache.add(GENERATION_KEY, 1, None):
+            try:
+                cache.incr(GENERATION_KEY)
+            except ValueError:
+                # Evicted between add() and incr().
+                cache.set(GENERATION_KEY, 1, None)
+
+    transaction.on_commit(bump)
@@ -0,0 +1,188 @@
+"""
+Venue layout templates and bulk seat generation.
+
+A VenueLayout is described by LayoutSections (row labels, a seat range, a
+category and a price). build_layout_seats() expands the sections once into
+LayoutSeat rows; generate_event_seats() then copies those rows into Seats
+for an event with chunked `INSERT ... SELECT` statements, each committed
+on its own, so a 20k-seat arena is created inside the database without
+loading a single seat into Python or holding one long write transaction.
+"""
+import re
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from .models import Event, Seat, SeatCategory, LayoutSeat
+from .seatmap import invalidate_seat_map
+
+LABEL_RE = re.compile(r'^[A-Z]+$')
+# Used for venues without a layout, as EventAdmin always did.
+DEFAULT_ROWS = 'A-J'
+DEFAULT_SEATS_PER_ROW = 20
+DEFAULT_PRICE = Decimal('50.00')
+
+
+def label_to_index(label):
+    """Spreadsheet-style row label to a 1-based index: A=1, Z=26, AA=27."""
+    index = 0
+    for char in label:
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def index_to_label(index):
+    label = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(65 + remainder) + label
+    return label
+
+
+def row_labels(spec):
+    """Expand a row spec such as 'A-J, AA-AD, ZZ' into row labels, in order."""
+    labels = []
+    for part in spec.upper().replace(' ', '').split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        last = last or first
+        if not (LABEL_RE.match(first) and LABEL_RE.match(last)):
+            raise ValidationError(f"Invalid row range '{part}'.")
+        start, end = label_to_index(first), label_to_index(last)
+        if start > end:
+            raise ValidationError(f"Row range '{part}' runs backwards.")
+        labels.extend(index_to_label(index) for index in range(start, end + 1))
+    return labels
+
+
+def _section_seats(sections):
+    """Yield (section, row, number) for every seat, rejecting overlaps."""
+    taken = set()
+    for section in sections:
+        if section.first_seat > section.last_seat:
+            raise ValidationError(f"Section '{section.name}' has an empty seat range.")
+        for row in row_labels(section.rows):
+            for number in range(section.first_seat, section.last_seat + 1):
+                if (row, number) in taken:
+                    raise ValidationError(f"Seat {row}{number} is in more than one section.")
+                taken.add((row, number))
+                yield section, row, number
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_layout_seats(layout, batch_size=5000, progress=None):
+    """Re-expand a layout's sections into LayoutSeats. Returns the seat count."""
+    if layout.compact_events.exists():
+        # Their availability bitmaps are indexed by the current LayoutSeats.
+        raise ValidationError(f"Layout {layout} is used by compact events; convert them to seat rows first.")
+    sections = list(layout.sections.all())
+    created = 0
+    with transaction.atomic():
+        layout.seats.all().delete()
+        for batch in _batched(_section_seats(sections), batch_size):
+            LayoutSeat.objects.bulk_create([
+                LayoutSeat(
+                    layout=layout, section=section, row=row, number=number,
+                    category_id=section.category_id, price=section.price,
+                )
+                for section, row, number in batch
+            ])
+            created += len(batch)
+            if progress:
+                progress(created)
+        layout.seat_count = created
+        layout.save(update_fields=['seat_count', 'updated_at'])
+    return created
+
+
+def _copy_layout(event, layout, batch_size, progress):
+    """Copy a layout's seats into the event, batch_size LayoutSeat ids at a time."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in ('row', 'number', 'category_id', 'price'))
+    insert = (
+        f'INSERT INTO {quote(Seat._meta.db_table)} '
+        f'({quote("event_id")}, {columns}, {quote("is_available")}, {quote("availability_version")}) '
+        f'SELECT %s, {columns}, %s, 0 FROM {quote(LayoutSeat._meta.db_table)} '
+        f'WHERE {quote("layout_id")} = %s AND {quote("id")} > %s'
+    )
+    layout_seats = LayoutSeat.objects.filter(layout=layout).order_by('pk').values_list('pk', flat=True)
+    copied, last_id = 0, 0
+    while True:
+        # Last id of this batch; none means the rest fits in one batch.
+        upper = list(layout_seats.filter(pk__gt=last_id)[batch_size - 1:batch_size])
+        with transaction.atomic(), connection.cursor() as cursor:
+            if upper:
+                cursor.execute(f'{insert} AND {quote("id")} <= %s', [event.pk, True, layout.pk, last_id, upper[0]])
+            else:
+                cursor.execute(insert, [event.pk, True, layout.pk, last_id])
+            copied += cursor.rowcount
+        if progress:
+            progress(copied)
+        if not upper:
+            return copied
+        last_id = upper[0]
+
+
+def _default_grid(event, batch_size, progress):
+    category = SeatCategory.objects.first() or SeatCategory.objects.create(name='Standard')
+    seats = (
+        Seat(event=event, row=row, number=number, category=category, price=DEFAULT_PRICE)
+        for row in row_labels(DEFAULT_ROWS)
+        for number in range(1, DEFAULT_SEATS_PER_ROW + 1)
+    )
+    created = 0
+    for batch in _batched(seats, batch_size):
+        with transaction.atomic():
+            Seat.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created)
+    return created
+
+
+def generate_event_seats(event, layout=None, batch_size=5000, progress=None, compact=False):
+    """
+    Create the Seats of a new event from its venue's layout, or from the
+    default 10x20 grid when the venue has none. `progress`, if given, is
+    called with the number of seats created so far after every batch.
+    With `compact`, the event uses compact seat storage on the layout
+    instead and no Seat rows are written. Returns the number of seats.
+    """
+    if event.seats.exists() or event.seat_storage == Event.SEAT_COMPACT:
+        raise ValidationError(f"{event.title} already has seats.")
+    if layout is None:
+        layout = getattr(event.venue, 'layout', None)
+    if layout is not None and not layout.seat_count and layout.sections.exists():
+        build_layout_seats(layout, batch_size)
+
+    if compact:
+        if layout is None or not layout.seat_count:
+            raise ValidationError(f"Compact seat storage needs a venue layout; {event.venue} has none.")
+        from .compact import create_compact_seating
+        return create_compact_seating(event, layout)
+
+    # One transaction per batch, so a big venue never holds the write lock
+    # for the whole copy. A run that fails removes the seats it created; a
+    # process killed mid-copy leaves them, and they must be deleted before
+    # running again.
+    try:
+        if layout is not None and layout.seat_count:
+            created = _copy_layout(event, layout, batch_size, progress)
+        else:
+            created = _default_grid(event, batch_size, progress)
+    except BaseException:
+        event.seats.all().delete()
+        raise
+    Event.update_price_range(event.pk)
+    invalidate_seat_map(event.pk)
+    return created
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from events.management.synthetic import rolled_back, seed_catalog, measure
+from events.search import get_search_backend
+from events.views import EventListView
+
+
+class Command(BaseCommand):
+    help = 'Measure query count and latency of EventListView on a synthetic catalogue (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['events']} events...")
+            cities, venues, categories = seed_catalog(options['events'])
+            # bulk_create skips the save signals that normally index events.
+            get_search_backend().rebuild()
+
+            scenarios = {
+                'default': {},
+                'city': {'city': cities[0].pk},
+                'category + upcoming': {'category': categories[0].pk, 'date_filter': 'upcoming'},
+                'this week': {'date_filter': 'this_week'},
+                'this month, by name': {'date_filter': 'this_month', 'sort_by': 'name'},
+                'search': {'search': 'jazz'},
+                'price low': {'sort_by': 'price_low'},
+                'page 50': {'page': 50},
+            }
+
+            for name, params in scenarios.items():
+                def render_list():
+                    request = factory.get('/events/list/', params)
+                    view = EventListView()
+                    view.setup(request)
+                    view.object_list = view.get_queryset()
+                    context = view.get_context_data()
+                    list(context['object_list'])
+
+                median, worst, queries = measure(render_list, options['repeat'])
+                self.stdout.write(f"{name:<22} {median:8.1f}ms median {worst:8.1f}ms max {queries:3d} queries")
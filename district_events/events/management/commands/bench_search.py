@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from events.management.synthetic import rolled_back, seed_catalog, measure
+from events.models import Event
+from events.search import DatabaseSearchBackend, SQLiteFTSSearchBackend
+
+
+class Command(BaseCommand):
+    help = 'Compare the FTS5 search index with icontains scans on a synthetic catalogue (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=200_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        backends = {'icontains': DatabaseSearchBackend(), 'fts5': SQLiteFTSSearchBackend()}
+        queries = ['jazz', 'summer festival', 'roof', 'classical symphony orchestra', 'qawwali night']
+
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['events']} events...")
+            seed_catalog(options['events'])
+            median, _, _ = measure(backends['fts5'].rebuild, 1)
+            self.stdout.write(f'Index rebuilt in {median:.0f}ms')
+
+            for query in queries:
+                for name, backend in backends.items():
+                    # Type-ahead: top 10 ranked results with highlights.
+                    median, worst, _ = measure(lambda: backend.search(query, limit=10), options['repeat'])
+                    self.stdout.write(f"{query!r:<32} {name:<9} top-10 {median:8.1f}ms median {worst:8.1f}ms max")
+
+                    # Event list: first page of matches in date order.
+                    def first_page():
+                        queryset = Event.objects.filter(is_published=True).order_by('start_date', 'title')
+                        list(backend.filter_queryset(queryset, query)[:10])
+
+                    median, worst, _ = measure(first_page, options['repeat'])
+                    self.stdout.write(f"{query!r:<32} {name:<9} list   {median:8.1f}ms median {worst:8.1f}ms max")
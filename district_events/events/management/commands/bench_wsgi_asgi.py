@@ -0,0 +1,106 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand, CommandError
+from events.management.loadgen import percentile, read_response, require_file_database, start_server
+from events.management.synthetic import seed_catalog
+from events.models import City, Event
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the catalogue read endpoints under WSGI and then ASGI, load both with the '
+        'same keep-alive clients and report requests/sec and latency percentiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=20_000,
+                            help='Synthetic events to seed first (deleted afterwards); 0 uses existing data.')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per endpoint.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--servers', default='wsgi,asgi')
+
+    def handle(self, *args, **options):
+        require_file_database()
+
+        seeded = options['events'] > 0
+        if seeded:
+            self.stdout.write(f"Seeding {options['events']} events...")
+            cities, _, _ = seed_catalog(options['events'])
+            get_search_backend().rebuild()
+            city_id = cities[0].pk
+        else:
+            city_id = City.objects.values_list('pk', flat=True).first()
+        event_id = Event.objects.filter(is_published=True).values_list('pk', flat=True).first()
+        if event_id is None:
+            raise CommandError('No published events to benchmark.')
+
+        paths = [
+            '/',
+            '/events/list/',
+            f'/events/list/?city={city_id}&sort_by=price_low',
+            f'/events/detail/{event_id}/',
+            f'/events/api/seats/{event_id}/',
+            f'/events/api/filter-by-city/?city_id={city_id}',
+        ]
+        try:
+            for server in options['servers'].split(','):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{server.upper()} (uvicorn, 1 worker)'))
+                process = start_server(server, options['port'])
+                try:
+                    for path in paths:
+                        stats = asyncio.run(self.load(path, options))
+                        self.stdout.write(
+                            f"{path:<45} {stats['rps']:8.1f} req/s  p50 {stats['p50']:7.1f}ms  "
+                            f"p99 {stats['p99']:7.1f}ms  {stats['errors']} errors"
+                        )
+                finally:
+                    process.terminate()
+                    process.wait(10)
+        finally:
+            if seeded:
+                self.stdout.write('Removing the synthetic catalogue...')
+                City.objects.filter(pk__in=[city.pk for city in cities]).delete()
+                get_search_backend().rebuild()
+
+    async def load(self, path, options):
+        latencies, errors = [], 0
+        deadline = time.monotonic() + options['duration']
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n\r\n"
+        ).encode()
+
+        async def client():
+            nonlocal errors
+            reader = writer = None
+            while time.monotonic() < deadline:
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection('127.0.0.1', options['port'])
+                    started = time.monotonic()
+                    writer.write(request)
+                    await writer.drain()
+                    status, _ = await read_response(reader)
+                    latencies.append(time.monotonic() - started)
+                    if status != 200:
+                        errors += 1
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    errors += 1
+                    if writer is not None:
+                        writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        began = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        elapsed = time.monotonic() - began
+
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'errors': errors,
+        }
@@ -0,0 +1,47 @@
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from events.compact import convert_to_compact, convert_to_rows
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Convert indoor events between one-Seat-row-per-seat and compact (layout + bitmap) storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=[Event.SEAT_COMPACT, Event.SEAT_ROWS], required=True)
+        parser.add_argument('--event', type=int, action='append', help='Event id; repeat for several.')
+        parser.add_argument('--venue', type=int, help='Every indoor event at this venue.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['event'] and not options['venue']:
+            raise CommandError('Pass --event and/or --venue.')
+        events = Event.objects.filter(is_indoor_event=True).exclude(seat_storage=options['to'])
+        if options['event']:
+            events = events.filter(pk__in=options['event'])
+        if options['venue']:
+            events = events.filter(venue_id=options['venue'])
+
+        converted = failed = 0
+        for event in events.order_by('pk'):
+            if options['dry_run']:
+                self.stdout.write(f'Would convert {event.pk} {event.title} ({event.seats.count()} seat rows)')
+                continue
+            started = time.perf_counter()
+            try:
+                if options['to'] == Event.SEAT_COMPACT:
+                    count = convert_to_compact(event)
+                    result = f'{count} seat rows removed'
+                else:
+                    count = convert_to_rows(event)
+                    result = f'{count} seat rows created'
+            except ValidationError as e:
+                failed += 1
+                self.stderr.write(f'{event.pk} {event.title}: {e.message}')
+                continue
+            converted += 1
+            self.stdout.write(f'{event.pk} {event.title}: {result} in {time.perf_counter() - started:.2f}s')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Converted {converted} events, {failed} failed.'))
@@ -0,0 +1,50 @@
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from events.layouts import build_layout_seats, generate_event_seats
+from events.models import Event, VenueLayout
+
+
+class Command(BaseCommand):
+    help = "Create an event's seats from its venue's layout template (or another venue's)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--layout', type=int, help='VenueLayout id to use instead of the venue\'s own.')
+        parser.add_argument('--rebuild-layout', action='store_true',
+                            help='Re-expand the layout sections before copying.')
+        parser.add_argument('--compact', action='store_true',
+                            help='Use compact seat storage (layout + availability bitmap) instead of Seat rows.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.select_related('venue').get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_id']} does not exist.")
+        layout = None
+        if options['layout']:
+            layout = VenueLayout.objects.filter(pk=options['layout']).first()
+            if layout is None:
+                raise CommandError(f"VenueLayout {options['layout']} does not exist.")
+
+        def progress(count):
+            self.stdout.write(f'  {count} seats', ending='\r')
+            self.stdout.flush()
+
+        started = time.perf_counter()
+        try:
+            if options['rebuild_layout']:
+                layout = layout or event.venue.layout
+                self.stdout.write(f'Rebuilding layout {layout}...')
+                build_layout_seats(layout, options['batch_size'], progress)
+                self.stdout.write('')
+            created = generate_event_seats(event, layout, options['batch_size'], progress, options['compact'])
+        except VenueLayout.DoesNotExist:
+            raise CommandError(f'{event.venue} has no layout.')
+        except ValidationError as e:
+            raise CommandError(e.message)
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} seats for {event.title} in {time.perf_counter() - started:.2f}s.'
+        ))
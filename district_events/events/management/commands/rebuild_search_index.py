@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the event full-text search index from the Event table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} published events with {type(backend).__name__}.'
+        ))
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold many concurrent subscribers open against the seat availability '
+        'stream of a running ASGI server and report connection and delivery stats.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the ASGI server.')
+        parser.add_argument('--subscribers', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to hold connections open.')
+        parser.add_argument('--ramp', type=float, default=5, help='Seconds over which to open connections.')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Only plain http:// servers are supported.')
+        stats = asyncio.run(self.run(url, options))
+
+        connected = stats['connected']
+        self.stdout.write(f"{connected}/{options['subscribers']} subscribers connected, {stats['failed']} failed")
+        self.stdout.write(f"{stats['messages']} availability messages, {stats['keepalives']} keepalives received")
+        if stats['connect_times']:
+            times = sorted(stats['connect_times'])
+            p50 = times[len(times) // 2] * 1000
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))] * 1000
+            self.stdout.write(f"Time to first byte: p50 {p50:.1f}ms, p99 {p99:.1f}ms")
+        if stats['messages'] and connected:
+            self.stdout.write(f"{stats['messages'] / connected:.1f} messages per subscriber")
+
+    async def run(self, url, options):
+        stats = {'connected': 0, 'failed': 0, 'messages': 0, 'keepalives': 0, 'connect_times': []}
+        path = f"/events/api/seats/{options['event_id']}/stream/"
+        deadline = time.monotonic() + options['ramp'] + options['duration']
+        delay = options['ramp'] / max(options['subscribers'], 1)
+
+        async def subscriber(index):
+            await asyncio.sleep(index * delay)
+            started = time.monotonic()
+            try:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            except OSError:
+                stats['failed'] += 1
+                return
+            try:
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+                    f"Accept: text/event-stream\r\nConnection: keep-alive\r\n\r\n".encode()
+                )
+                await writer.drain()
+                status = await reader.readline()
+                if b' 200 ' not in status:
+                    stats['failed'] += 1
+                    return
+                stats['connected'] += 1
+                stats['connect_times'].append(time.monotonic() - started)
+
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    try:
+                        line = await asyncio.wait_for(reader.readline(), remaining)
+                    except asyncio.TimeoutError:
+                        return
+                    if not line:
+                        return
+                    if line.startswith(b'event: '):
+                        stats['messages'] += 1
+                    elif line.startswith(b': keepalive'):
+                        stats['keepalives'] += 1
+            finally:
+                writer.close()
+
+        await asyncio.gather(*(subscriber(i) for i in range(options['subscribers'])))
+        return stats
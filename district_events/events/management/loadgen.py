@@ -0,0 +1,72 @@
+"""
+HTTP load generation for the benchmark commands: run the project under
+uvicorn in a subprocess and drive it with keep-alive asyncio clients.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import CommandError
+
+SERVERS = {
+    # uvicorn runs WSGI apps on a thread pool, like a threaded WSGI server.
+    'wsgi': ['district_events.wsgi:application', '--interface', 'wsgi'],
+    'asgi': ['district_events.asgi:application'],
+}
+
+
+def require_file_database():
+    if 'memory' in str(settings.DATABASES['default']['NAME']):
+        raise CommandError('The server runs in a separate process and needs a file database.')
+
+
+def start_server(server, port):
+    """Start uvicorn serving the project as `server` (wsgi or asgi) and wait for it to listen."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', *SERVERS[server], '--port', str(port),
+         '--no-access-log', '--log-level', 'warning'],
+        cwd=settings.BASE_DIR, env=os.environ.copy(),
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.terminate()
+    raise CommandError(f'{server} server did not start on port {port}')
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response. Returns (status code, body)."""
+    status = int((await reader.readline()).split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if not chunked:
+        return status, await reader.readexactly(length)
+    body = []
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        body.append((await reader.readexactly(size + 2))[:-2])
+        if size == 0:
+            return status, b''.join(body)
+
+
+def percentile(latencies, fraction):
+    """Percentile of a sorted list of seconds, in milliseconds."""
+    if not latencies:
+        return 0
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
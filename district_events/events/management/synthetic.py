@@ -0,0 +1,94 @@
+"""
+Synthetic catalogue data and timing helpers for the benchmark commands.
+
+Benchmarks seed their data inside `rolled_back()` so nothing they create
+outlives the run.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, time as clock, timedelta
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from events.models import City, Venue, EventCategory, Event
+
+WORDS = (
+    'rock jazz comedy night live festival summer winter classical symphony orchestra '
+    'indie folk metal electronic dance theatre drama musical opera ballet cricket football '
+    'marathon food wine craft beer market art gallery workshop tech conference startup '
+    'poetry literature film screening standup acoustic unplugged tribute reunion tour '
+    'sunset rooftop garden open air arena stadium club lounge retro bollywood sufi qawwali'
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def seed_catalog(events, cities=20, venues=200, categories=12, seed=42, batch_size=5000):
+    """Bulk-create a synthetic catalogue of published and unpublished events."""
+    rng = random.Random(seed)
+    city_objs = City.objects.bulk_create(
+        City(name=f'Bench City {i}', state='Bench') for i in range(cities)
+    )
+    venue_objs = Venue.objects.bulk_create(
+        Venue(name=f'Bench Venue {i}', address='-', city=rng.choice(city_objs), capacity=1000)
+        for i in range(venues)
+    )
+    category_objs = EventCategory.objects.bulk_create(
+        EventCategory(name=f'Bench Category {i}') for i in range(categories)
+    )
+
+    today = date.today()
+    batch = []
+    for i in range(events):
+        start = today + timedelta(days=rng.randint(-365, 365))
+        batch.append(Event(
+            title=sentence(rng, 3).title(),
+            description=sentence(rng, 40),
+            start_date=start,
+            end_date=start + timedelta(days=rng.randint(0, 2)),
+            start_time=clock(19),
+            end_time=clock(22),
+            venue=rng.choice(venue_objs),
+            category=rng.choice(category_objs),
+            banner_image_url='https://example.com/banner.png',
+            is_published=rng.random() < 0.9,
+            is_featured=rng.random() < 0.02,
+        ))
+        if len(batch) == batch_size:
+            Event.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Event.objects.bulk_create(batch)
+
+    return city_objs, venue_objs, category_objs
+
+
+def measure(func, repeat=5):
+    """
+    Call `func` `repeat` times. Returns (median ms, max ms, queries per call).
+    """
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings), len(queries)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 15:35
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_booked_count(apps, schema_editor):
+    Zone = apps.get_model('events', 'Zone')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    booked = Booking.objects.filter(
+        zone=OuterRef('pk'), is_confirmed=True, is_cancelled=False
+    ).values('zone').annotate(total=Sum('quantity')).values('total')
+    Zone.objects.update(booked_count=Coalesce(Subquery(booked), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_booking'),
+        ('bookings', '0003_event_feedback'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zone',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_booked_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_zone_booked_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zone',
+            name='held_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
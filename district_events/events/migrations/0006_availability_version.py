@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_seat_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='availability_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='availability_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(fields=['event', 'availability_version'], name='events_seat_event_i_55557d_idx'),
+        ),
+    ]
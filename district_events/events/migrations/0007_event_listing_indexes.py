@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_availability_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_published', 'start_date'], name='events_even_is_publ_08e85a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_published', 'category', 'start_date'], name='events_even_is_publ_89f15b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_published', 'venue', 'start_date'], name='events_even_is_publ_637fae_idx'),
+        ),
+    ]
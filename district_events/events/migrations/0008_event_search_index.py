@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 16:02
+
+from django.db import migrations
+
+# Only SQLite gets the FTS5 table; other databases use
+# events.search.DatabaseSearchBackend and need no schema.
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS events_event_fts USING fts5(
+    title, description,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Event = apps.get_model('events', 'Event')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_INDEX)
+        cursor.executemany(
+            'INSERT INTO events_event_fts (rowid, title, description) VALUES (%s, %s, %s)',
+            list(Event.objects.filter(is_published=True).values_list('pk', 'title', 'description')),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS events_event_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
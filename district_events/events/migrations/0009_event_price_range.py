@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-17 15:50
+
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+
+
+def populate_price_range(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Seat = apps.get_model('events', 'Seat')
+    Zone = apps.get_model('events', 'Zone')
+
+    def price(model, aggregate):
+        return Subquery(
+            model.objects.filter(event=OuterRef('pk')).order_by()
+            .values('event').annotate(value=aggregate('price')).values('value')
+        )
+
+    seat_min, zone_min = price(Seat, Min), price(Zone, Min)
+    seat_max, zone_max = price(Seat, Max), price(Zone, Max)
+    Event.objects.update(
+        min_price=Least(Coalesce(seat_min, zone_min), Coalesce(zone_min, seat_min)),
+        max_price=Greatest(Coalesce(seat_max, zone_max), Coalesce(zone_max, seat_max)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['min_price'], name='event_published_min_price'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['max_price'], name='event_published_max_price'),
+        ),
+        migrations.RunPython(populate_price_range, migrations.RunPython.noop),
+    ]
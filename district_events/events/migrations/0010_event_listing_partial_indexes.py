@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-17 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_event_price_range'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='events_even_is_publ_08e85a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='events_even_is_publ_89f15b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='events_even_is_publ_637fae_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['start_date'], name='event_published_start'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['category', 'start_date'], name='event_published_category'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['venue', 'start_date'], name='event_published_venue'),
+        ),
+    ]
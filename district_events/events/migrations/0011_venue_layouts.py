@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-17 15:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_listing_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('seat_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('venue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='layout', to='events.venue')),
+            ],
+            options={
+                'verbose_name': 'Venue Layout',
+                'verbose_name_plural': 'Venue Layouts',
+            },
+        ),
+        migrations.CreateModel(
+            name='LayoutSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('rows', models.CharField(help_text="Row labels, e.g. 'A-J' or 'A-C, AA-AD'", max_length=200)),
+                ('first_seat', models.PositiveIntegerField(default=1)),
+                ('last_seat', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='layout_sections', to='events.seatcategory')),
+                ('layout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='events.venuelayout')),
+            ],
+            options={
+                'verbose_name': 'Layout Section',
+                'verbose_name_plural': 'Layout Sections',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LayoutSeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.CharField(max_length=10)),
+                ('number', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='events.seatcategory')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='events.layoutsection')),
+                ('layout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='events.venuelayout')),
+            ],
+            options={
+                'unique_together': {('layout', 'row', 'number')},
+            },
+        ),
+    ]
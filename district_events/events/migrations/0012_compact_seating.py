@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_venue_layouts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='seat_storage',
+            field=models.CharField(choices=[('rows', 'One Seat row per seat'), ('compact', 'Venue layout + availability bitmap')], default='rows', editable=False, max_length=10),
+        ),
+        migrations.CreateModel(
+            name='CompactSeating',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compact_seating', serialize=False, to='events.event')),
+                ('availability', models.BinaryField()),
+                ('price_overrides', models.JSONField(blank=True, default=dict)),
+                ('layout', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='compact_events', to='events.venuelayout')),
+            ],
+            options={
+                'verbose_name': 'Compact Seating',
+                'verbose_name_plural': 'Compact Seating',
+            },
+        ),
+    ]
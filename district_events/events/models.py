@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.urls import reverse
 from django.utils import timezone
 
@@ -51,6 +53,13 @@ class EventCategory(models.Model):
 
 class Event(models.Model):
     """Main Event model."""
+    SEAT_ROWS = 'rows'
+    SEAT_COMPACT = 'compact'
+    SEAT_STORAGE_CHOICES = [
+        (SEAT_ROWS, 'One Seat row per seat'),
+        (SEAT_COMPACT, 'Venue layout + availability bitmap'),
+    ]
+
     title = models.CharField(max_length=200)
     description = models.TextField()
     start_date = models.DateField()
@@ -66,9 +75,40 @@ class Event(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     max_seats = models.PositiveIntegerField(default=0)  
     is_indoor_event = models.BooleanField(default=True)
+    # Advanced by events.availability whenever seat or zone availability changes.
+    availability_version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Cheapest and dearest seat or zone price, kept by update_price_range() for
+    # the price sorts of the event list. NULL while an event has no prices.
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    # Compact events keep their seats in a CompactSeating (see events.compact).
+    seat_storage = models.CharField(max_length=10, choices=SEAT_STORAGE_CHOICES, default=SEAT_ROWS, editable=False)
       
     def __str__(self):
         return self.title
+
+    @classmethod
+    def update_price_range(cls, *event_ids):
+        """Recompute min_price/max_price of the given events from their seats and zones."""
+        def price(model, aggregate):
+            return Subquery(
+                model.objects.filter(event=OuterRef('pk')).order_by()
+                .values('event').annotate(value=aggregate('price')).values('value')
+            )
+
+        seat_min, zone_min = price(Seat, Min), price(Zone, Min)
+        seat_max, zone_max = price(Seat, Max), price(Zone, Max)
+        # LEAST/GREATEST return NULL if either side is NULL, so fall back to the other side.
+        cls.objects.filter(pk__in=event_ids, seat_storage=cls.SEAT_ROWS).update(
+            min_price=Least(Coalesce(seat_min, zone_min), Coalesce(zone_min, seat_min)),
+            max_price=Greatest(Coalesce(seat_max, zone_max), Coalesce(zone_max, seat_max)),
+        )
+
+        # Compact events have Seat rows only for booked seats; price them from the layout.
+        from .compact import price_range
+        for event_id in cls.objects.filter(pk__in=event_ids, seat_storage=cls.SEAT_COMPACT).values_list('pk', flat=True):
+            low, high = price_range(event_id)
+            cls.objects.filter(pk=event_id).update(min_price=low, max_price=high)
     
     def get_absolute_url(self):
         return reverse('events:event_detail', kwargs={'pk': self.pk})
@@ -90,6 +130,15 @@ class Event(models.Model):
         verbose_name = 'Event'
         verbose_name_plural = 'Events'
         ordering = ['-start_date', 'title']
+        indexes = [
+            # Partial indexes: Django filters booleans as a bare `WHERE is_published`,
+            # which SQLite cannot match against a leading is_published column.
+            models.Index(fields=['start_date'], condition=Q(is_published=True), name='event_published_start'),
+            models.Index(fields=['category', 'start_date'], condition=Q(is_published=True), name='event_published_category'),
+            models.Index(fields=['venue', 'start_date'], condition=Q(is_published=True), name='event_published_venue'),
+            models.Index(fields=['min_price'], condition=Q(is_published=True), name='event_published_min_price'),
+            models.Index(fields=['max_price'], condition=Q(is_published=True), name='event_published_max_price'),
+        ]
 
 class SeatCategory(models.Model):
     """Categories for seats (Premium, Standard, etc.)."""
@@ -110,15 +159,26 @@ class Zone(models.Model):
     description = models.TextField(blank=True)
     capacity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Maintained by Booking.save(); rebuild with `manage.py reconcile_zone_counters`.
+    booked_count = models.PositiveIntegerField(default=0, editable=False)
+    # Seats reserved by active SeatHolds that have not been paid for yet.
+    held_count = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.event.title} - {self.name}"
     
     @property
     def available_seats(self):
-        from bookings.models import Booking
-        booked_seats = Booking.objects.filter(zone=self, is_confirmed=True).count()
-        return self.capacity - booked_seats
+        return max(self.capacity - self.booked_count - self.held_count, 0)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Event.update_price_range(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Event.update_price_range(self.event_id)
+        return result
     
     class Meta:
         verbose_name = 'Zone'
@@ -132,15 +192,103 @@ class Seat(models.Model):
     category = models.ForeignKey(SeatCategory, on_delete=models.CASCADE, related_name='seats')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     is_available = models.BooleanField(default=True)
+    # Event.availability_version at this seat's last availability change.
+    availability_version = models.PositiveBigIntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.event.title} - {self.row}{self.number}"
+
+    def save(self, *args, **kwargs):
+        from .availability import seats_changed
+        from .seatmap import invalidate_seat_map
+        super().save(*args, **kwargs)
+        Event.update_price_range(self.event_id)
+        invalidate_seat_map(self.event_id)
+        seats_changed(self.event_id, [self.pk])
+
+    def delete(self, *args, **kwargs):
+        from .seatmap import invalidate_seat_map
+        invalidate_seat_map(self.event_id)
+        result = super().delete(*args, **kwargs)
+        Event.update_price_range(self.event_id)
+        return result
     
     class Meta:
         verbose_name = 'Seat'
         verbose_name_plural = 'Seats'
         unique_together = ('event', 'row', 'number')
         ordering = ['row', 'number']
+        indexes = [
+            models.Index(fields=['event', 'availability_version']),
+        ]
+
+class VenueLayout(models.Model):
+    """Reusable seating plan of a venue; events.layouts copies it into Seats."""
+    venue = models.OneToOneField(Venue, on_delete=models.CASCADE, related_name='layout')
+    name = models.CharField(max_length=200)
+    # Number of LayoutSeats, updated when they are rebuilt from the sections.
+    seat_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.venue.name} - {self.name}"
+
+    class Meta:
+        verbose_name = 'Venue Layout'
+        verbose_name_plural = 'Venue Layouts'
+
+class LayoutSection(models.Model):
+    """Block of rows sharing one seat range, category and price."""
+    layout = models.ForeignKey(VenueLayout, on_delete=models.CASCADE, related_name='sections')
+    name = models.CharField(max_length=100)
+    rows = models.CharField(max_length=200, help_text="Row labels, e.g. 'A-J' or 'A-C, AA-AD'")
+    first_seat = models.PositiveIntegerField(default=1)
+    last_seat = models.PositiveIntegerField()
+    category = models.ForeignKey(SeatCategory, on_delete=models.PROTECT, related_name='layout_sections')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.layout} - {self.name}"
+
+    class Meta:
+        verbose_name = 'Layout Section'
+        verbose_name_plural = 'Layout Sections'
+        ordering = ['id']
+
+class LayoutSeat(models.Model):
+    """One seat of a VenueLayout, expanded from its sections for bulk copying."""
+    layout = models.ForeignKey(VenueLayout, on_delete=models.CASCADE, related_name='seats')
+    section = models.ForeignKey(LayoutSection, on_delete=models.CASCADE, related_name='seats')
+    row = models.CharField(max_length=10)
+    number = models.PositiveIntegerField()
+    category = models.ForeignKey(SeatCategory, on_delete=models.PROTECT, related_name='+')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.layout} - {self.row}{self.number}"
+
+    class Meta:
+        unique_together = ('layout', 'row', 'number')
+
+class CompactSeating(models.Model):
+    """
+    Seats of an event in compact storage: the venue layout's LayoutSeats, a
+    packed availability bitmap in LayoutSeat id order, and the prices that
+    differ from the layout. Seat rows exist only for seats that have been
+    booked (see events.compact.resolve_seat) and take precedence over the bitmap.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='compact_seating')
+    layout = models.ForeignKey(VenueLayout, on_delete=models.RESTRICT, related_name='compact_events')
+    availability = models.BinaryField()
+    # {layout seat id (as a string): price (as a string)}
+    price_overrides = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.event.title} ({self.layout})"
+
+    class Meta:
+        verbose_name = 'Compact Seating'
+        verbose_name_plural = 'Compact Seating'
 
 class Feedback(models.Model):
     name = models.CharField(max_length=100)
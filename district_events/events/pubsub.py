@@ -0,0 +1,130 @@
+"""
+Publish/subscribe for live seat and zone availability.
+
+events.availability publishes a message after every committed availability
+change; the SSE view in events.views subscribes per event. Messages look like
+{'version': 12, 'seats': [{'id': 1, 'is_available': False}], 'zones': [...]}.
+
+The backend is chosen with settings.AVAILABILITY_BROKER:
+
+* InProcessBroker fans messages out to subscribers of the same process.
+* PollingBroker also follows Event.availability_version in the database, so
+  changes made by other worker processes reach local subscribers too.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+RESYNC = {'resync': True}
+
+
+class Subscription:
+    """Bounded queue of availability messages for one subscriber."""
+
+    def __init__(self, broker, event_id, since=0, maxsize=100):
+        self.broker = broker
+        self.event_id = event_id
+        self.version = since
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message):
+        """Queue a message; must run on the subscriber's event loop."""
+        if message.get('version', 0) <= self.version:
+            return
+        self.version = message['version']
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client: drop what it has not read and ask it to refetch.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(dict(RESYNC, version=self.version))
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def __aenter__(self):
+        await self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.broker.remove(self)
+
+
+class InProcessBroker:
+    """Deliver messages to subscribers living in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_id, since=0):
+        return Subscription(self, event_id, since)
+
+    async def add(self, subscription):
+        with self._lock:
+            self._subscribers[subscription.event_id].add(subscription)
+
+    async def remove(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers[subscription.event_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.event_id]
+
+    def subscriber_count(self, event_id):
+        with self._lock:
+            return len(self._subscribers.get(event_id, ()))
+
+    def publish(self, event_id, message):
+        """Thread-safe: may be called from sync request threads."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(event_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                pass
+
+
+class PollingBroker(InProcessBroker):
+    """
+    InProcessBroker that also polls the database for availability changes
+    made by other processes. One poller per event per process, however many
+    clients are subscribed.
+    """
+
+    def __init__(self, interval=None):
+        super().__init__()
+        self.interval = interval or getattr(settings, 'AVAILABILITY_POLL_INTERVAL', 1.0)
+        self._pollers = {}
+
+    async def add(self, subscription):
+        await super().add(subscription)
+        poller = self._pollers.get(subscription.event_id)
+        if poller is None or poller.done():
+            self._pollers[subscription.event_id] = asyncio.create_task(
+                self._poll(subscription.event_id, subscription.version)
+            )
+
+    async def _poll(self, event_id, version):
+        from .availability import changes_since
+
+        while self.subscriber_count(event_id):
+            await asyncio.sleep(self.interval)
+            message = await sync_to_async(changes_since)(event_id, version)
+            if message['version'] > version:
+                version = message['version']
+                self.publish(event_id, message)
+        self._pollers.pop(event_id, None)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.AVAILABILITY_BROKER)()
@@ -0,0 +1,182 @@
+"""
+Full-text search over published events.
+
+The backend is chosen with settings.SEARCH_BACKEND; by default SQLite
+databases use an FTS5 index (BM25 ranking, prefix matching for
+type-ahead, highlighted matches) and other databases fall back to a
+substring scan. Event save/delete signals keep the index in sync (see
+events.signals); `manage.py rebuild_search_index` rebuilds it in bulk.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from .models import Event
+
+SearchResult = namedtuple('SearchResult', 'event_id score title snippet')
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+# Control characters FTS5 wraps matches in; swapped for <mark> after escaping.
+MARK_OPEN, MARK_CLOSE = '\x02', '\x03'
+
+
+def terms(query):
+    return TERM_RE.findall(query.lower())
+
+
+def mark_up(text):
+    """HTML-escape highlighted text and turn the match markers into <mark> tags."""
+    return escape(text).replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
+
+
+class BaseSearchBackend:
+    """Interface every search backend implements."""
+
+    def index(self, events):
+        """Add or refresh events; unpublished ones are removed."""
+        raise NotImplementedError
+
+    def remove(self, event_ids):
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=5000):
+        """Re-index every published event. Returns the number indexed."""
+        raise NotImplementedError
+
+    def search(self, query, limit=20):
+        """Return up to `limit` SearchResults, best match first."""
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query):
+        """Restrict an Event queryset to events matching `query`."""
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Substring search straight on the Event table; works on any database."""
+
+    def index(self, events):
+        pass
+
+    def remove(self, event_ids):
+        pass
+
+    def rebuild(self, batch_size=5000):
+        return 0
+
+    def _condition(self, query):
+        condition = Q()
+        for term in terms(query):
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        return condition
+
+    def filter_queryset(self, queryset, query):
+        return queryset.filter(self._condition(query))
+
+    def search(self, query, limit=20):
+        if not terms(query):
+            return []
+        events = Event.objects.filter(self._condition(query), is_published=True).values_list(
+            'id', 'title', 'description'
+        )[:limit * 5]
+        results = []
+        for event_id, title, description in events:
+            score = sum(title.lower().count(term) * 10 + description.lower().count(term) for term in terms(query))
+            results.append(SearchResult(event_id, score, escape(title), escape(description[:120])))
+        results.sort(key=lambda result: -result.score)
+        return results[:limit]
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """SQLite FTS5 index in the `events_event_fts` virtual table (rowid = event id)."""
+
+    table = 'events_event_fts'
+    # Matches in the title count ten times as much as matches in the description.
+    weights = (10.0, 1.0)
+
+    def match_expression(self, query):
+        """Quote each term and make the last one a prefix match for type-ahead."""
+        words = terms(query)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"' for word in words) + '*'
+
+    def index(self, events):
+        events = list(events)
+        self.remove([event.pk for event in events])
+        rows = [(event.pk, event.title, event.description) for event in events if event.is_published]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {self.table} (rowid, title, description) VALUES (%s, %s, %s)', rows
+                )
+
+    def remove(self, event_ids):
+        event_ids = list(event_ids)
+        if event_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {self.table} WHERE rowid IN ({", ".join(["%s"] * len(event_ids))})',
+                    event_ids,
+                )
+
+    def rebuild(self, batch_size=5000):
+        indexed = 0
+        last_id = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            while True:
+                rows = list(
+                    Event.objects.filter(is_published=True, pk__gt=last_id)
+                    .order_by('pk').values_list('pk', 'title', 'description')[:batch_size]
+                )
+                if not rows:
+                    break
+                cursor.executemany(
+                    f'INSERT INTO {self.table} (rowid, title, description) VALUES (%s, %s, %s)', rows
+                )
+                indexed += len(rows)
+                last_id = rows[-1][0]
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return indexed
+
+    def search(self, query, limit=20):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({self.table}, %s, %s) AS score, '
+                f'highlight({self.table}, 0, %s, %s), '
+                f"snippet({self.table}, 1, %s, %s, '…', 16) "
+                f'FROM {self.table} WHERE {self.table} MATCH %s ORDER BY score LIMIT %s',
+                [*self.weights, MARK_OPEN, MARK_CLOSE, MARK_OPEN, MARK_CLOSE, expression, limit],
+            )
+            # bm25() is lower-is-better; flip it so higher scores rank first.
+            return [
+                SearchResult(event_id, -score, mark_up(title), mark_up(snippet))
+                for event_id, score, title, snippet in cursor.fetchall()
+            ]
+
+    def filter_queryset(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [expression]
+        ))
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend = getattr(settings, 'SEARCH_BACKEND', None)
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSSearchBackend()
+    return DatabaseSearchBackend()
@@ -0,0 +1,197 @@
+"""
+Compact, cached seat maps for indoor events.
+
+The layout of an event (seat ids, rows, numbers, categories and prices) is
+cached once; availability is cached separately as a bit array indexed by
+the seat's position in the layout, so booking or cancelling a seat only
+rewrites a few bytes instead of reloading every Seat row.
+
+Events in compact seat storage build their map from the venue layout
+instead (see events.compact); their seats are identified by LayoutSeat id.
+"""
+from collections import namedtuple
+from django.core.cache import cache
+from django.db import transaction
+from .models import Event, Seat, SeatCategory, CompactSeating
+
+LAYOUT_TIMEOUT = 24 * 60 * 60
+# Bits are patched in place without a lock; the short timeout bounds any drift
+# from concurrent patches. Seat claims themselves are checked against the DB.
+AVAILABILITY_TIMEOUT = 60
+
+MapSeat = namedtuple('MapSeat', 'id row number category price is_available')
+CategoryRef = namedtuple('CategoryRef', 'id name')
+
+
+class MapCategory(namedtuple('MapCategory', 'id name price total available')):
+    """Seat category summary: lowest price and availability across the event."""
+
+    @property
+    def available_percentage(self):
+        return int(self.available * 100 / self.total) if self.total else 0
+
+
+def _layout_key(event_id):
+    return f'seatmap:layout:{event_id}'
+
+
+def _availability_key(event_id):
+    return f'seatmap:availability:{event_id}'
+
+
+def pack_bits(flags):
+    """Pack an iterable of booleans into a little-endian bit array."""
+    flags = list(flags)
+    bits = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bytes(bits)
+
+
+class SeatMap:
+    """Seat layout of one event plus its availability bits."""
+
+    def __init__(self, event_id, layout, availability):
+        self.event_id = event_id
+        self.layout = layout
+        self.availability = availability
+
+    def __len__(self):
+        return len(self.layout['seats'])
+
+    def is_available(self, index):
+        return bool(self.availability[index >> 3] & (1 << (index & 7)))
+
+    def seats(self):
+        categories = self.layout['categories']
+        for index, (seat_id, row, number, category_id, price) in enumerate(self.layout['seats']):
+            yield MapSeat(
+                seat_id, row, number, categories[category_id], price, self.is_available(index)
+            )
+
+    def rows(self):
+        """Seats grouped by row, in row order."""
+        seating_map = {}
+        for seat in self.seats():
+            seating_map.setdefault(seat.row, []).append(seat)
+        return {row: sorted(seating_map[row], key=lambda seat: seat.number) for row in sorted(seating_map)}
+
+    def categories(self):
+        summary = {}
+        for index, (_, _, _, category_id, price) in enumerate(self.layout['seats']):
+            low, total, available = summary.get(category_id, (price, 0, 0))
+            summary[category_id] = (min(low, price), total + 1, available + self.is_available(index))
+        names = self.layout['categories']
+        return [
+            MapCategory(category_id, names[category_id].name, low, total, available)
+            for category_id, (low, total, available) in summary.items()
+        ]
+
+
+def _build_layout(event_id):
+    from .compact import build_layout
+
+    seating = CompactSeating.objects.filter(event_id=event_id).first()
+    if seating is not None:
+        return build_layout(seating)
+
+    seats = list(
+        Seat.objects.filter(event_id=event_id)
+        .order_by('row', 'number')
+        .values_list('id', 'row', 'number', 'category_id', 'price', 'is_available')
+    )
+    categories = {
+        category_id: CategoryRef(category_id, name)
+        for category_id, name in SeatCategory.objects.filter(seats__event_id=event_id)
+        .distinct().values_list('id', 'name')
+    }
+    layout = {
+        'seats': [seat[:5] for seat in seats],
+        'index': {seat[0]: index for index, seat in enumerate(seats)},
+        'categories': categories,
+        'compact': False,
+    }
+    return layout, pack_bits(seat[5] for seat in seats)
+
+
+def _load_availability(event_id, layout):
+    if layout.get('compact'):
+        from .compact import load_availability
+        return load_availability(event_id, layout)
+    return pack_bits(
+        Seat.objects.filter(event_id=event_id)
+        .order_by('row', 'number')
+        .values_list('is_available', flat=True)
+    )
+
+
+def get_seat_map(event_id):
+    """Return the SeatMap of an event, from cache when possible."""
+    layout_key, availability_key = _layout_key(event_id), _availability_key(event_id)
+    cached = cache.get_many([layout_key, availability_key])
+    layout = cached.get(layout_key)
+    availability = cached.get(availability_key)
+
+    if layout is None:
+        layout, availability = _build_layout(event_id)
+        cache.set(layout_key, layout, LAYOUT_TIMEOUT)
+        cache.set(availability_key, availability, AVAILABILITY_TIMEOUT)
+    elif availability is None:
+        availability = _load_availability(event_id, layout)
+        cache.set(availability_key, availability, AVAILABILITY_TIMEOUT)
+
+    return SeatMap(event_id, layout, availability)
+
+
+def patch_availability(event_id, seat_ids, available):
+    """Flip the cached availability bits of `seat_ids`, if the map is cached."""
+    layout_key, availability_key = _layout_key(event_id), _availability_key(event_id)
+    cached = cache.get_many([layout_key, availability_key])
+    if len(cached) < 2:
+        return
+
+    layout = cached[layout_key]
+    index = layout['index']
+    if layout.get('compact'):
+        from .compact import seat_positions
+        index = seat_positions(event_id, layout, seat_ids)
+    bits = bytearray(cached[availability_key])
+    for seat_id in seat_ids:
+        position = index.get(seat_id)
+        if position is None:
+            # The layout predates this seat; rebuild on next read.
+            cache.delete_many([layout_key, availability_key])
+            return
+        if available:
+            bits[position >> 3] |= 1 << (position & 7)
+        else:
+            bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+    cache.set(availability_key, bytes(bits), AVAILABILITY_TIMEOUT)
+
+
+def map_seat_ids(event_id, seat_ids):
+    """
+    Translate Seat pks of an event into the ids its seat map (and clients)
+    use. Identical for events stored as Seat rows; LayoutSeat ids for
+    compact events. Seats missing from the map are left out.
+    """
+    seat_ids = list(seat_ids)
+    layout = cache.get(_layout_key(event_id))
+    if layout is None:
+        if not Event.objects.filter(pk=event_id, seat_storage=Event.SEAT_COMPACT).exists():
+            return {seat_id: seat_id for seat_id in seat_ids}
+        layout = get_seat_map(event_id).layout
+    if not layout.get('compact'):
+        return {seat_id: seat_id for seat_id in seat_ids}
+
+    from .compact import seat_positions
+    seats = layout['seats']
+    return {seat_id: seats[index][0] for seat_id, index in seat_positions(event_id, layout, seat_ids).items()}
+
+
+def invalidate_seat_map(event_id):
+    """Drop the cached seat map of an event after its seats change."""
+    transaction.on_commit(
+        lambda: cache.delete_many([_layout_key(event_id), _availability_key(event_id)])
+    )
@@ -0,0 +1,38 @@
+"""
+Keep derived data in step with the catalogue: the event search index and the
+cached home page sections.
+
+Index writes and cache invalidation happen after the surrounding transaction
+commits, so a rolled back save never leaves a stale entry behind.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Event, Venue, City
+from .homepage import invalidate_home_page
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: get_search_backend().index([instance]))
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event(sender, instance, **kwargs):
+    event_id = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove([event_id]))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Venue)
+@receiver(post_delete, sender=Venue)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def refresh_home_page(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    invalidate_home_page()
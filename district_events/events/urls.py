@@ -9,6 +9,8 @@ urlpatterns = [
     path('list/', views.EventListView.as_view(), name='event_list'),
     path('detail/<int:pk>/', views.EventDetailView.as_view(), name='event_detail'),
     path('api/seats/<int:event_id>/', views.get_seats_json, name='get_seats_json'),
+    path('api/seats/<int:event_id>/stream/', views.seat_stream, name='seat_stream'),
+    path('api/search/', views.search_events, name='search_events'),
     path('api/filter-by-city/', views.filter_events_by_city, name='filter_events_by_city'),
     path('test-filter/', views.test_filter_view, name='test_filter'),
     path('privacy-policy/', views.privacy_policy_view, name='privacy_policy'),
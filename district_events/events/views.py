@@ -1,90 +1,48 @@
+import asyncio
 import json
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import render, redirect, aget_object_or_404
 from django.views.generic import ListView, DetailView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
-from django.db.models import Q
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse, Http404
+from django.core.paginator import InvalidPage
+from django.utils.http import parse_etags
+from datetime import timedelta
 from django.utils import timezone
-import requests
 from django.conf import settings
 from django.core.mail import send_mail
-from .models import Event, City, Venue, Zone, Seat, Feedback
+from .models import Event, City, Venue, Zone, Feedback
 from .forms import EventSearchForm 
+from .seatmap import get_seat_map
+from .availability import changes_since, seat_changes
+from .pubsub import get_broker
+from .search import get_search_backend
+from .homepage import ahome_page_context
+from bookings.services import release_expired_holds
+from district_events.flask_service import get_flask_client
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.contrib.auth.decorators import login_required
 
 
 
-def home_view(request):
-    featured_events = Event.objects.filter(
-        is_published=True,
-        is_featured=True,
-        end_date__gte=timezone.now().date()
-    ).order_by('start_date')[:6]
-
-    upcoming_events = Event.objects.filter(
-        is_published=True,
-        start_date__gt=timezone.now().date()
-    ).order_by('start_date')[:8]
-
-    cities = City.objects.filter(is_active=True).order_by('name')
-
-    search_form = EventSearchForm()
-
-    try:
-        about_response = requests.get(f"{settings.FLASK_SERVICE_URL}/api/about")
-        about_data = about_response.json() if about_response.status_code == 200 else {}
-    except requests.exceptions.RequestException:
-        about_data = {}
-
-    context = {
-        'featured_events': featured_events,
-        'upcoming_events': upcoming_events,
-        'cities': cities,
-        'search_form': search_form,
-        'about_data': about_data,
-    }
-    return render(request, 'home.html', context)
+async def home_view(request):
+    context = await ahome_page_context()
+    context['search_form'] = EventSearchForm()
+    # The search form renders model choices, so templates render off the event loop.
+    return await sync_to_async(render)(request, 'home.html', context)
 
 
 
 class HomeView(TemplateView):
     template_name = 'home.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
-        featured_events = Event.objects.filter(
-            is_published=True,
-            is_featured=True,
-            end_date__gte=timezone.now().date()
-        ).order_by('start_date')[:6]
-
-        upcoming_events = Event.objects.filter(
-            is_published=True,
-            start_date__gt=timezone.now().date()
-        ).order_by('start_date')[:8]
-
-        cities = City.objects.filter(is_active=True).order_by('name')
-
-        search_form = EventSearchForm()
-
-        try:
-            about_response = requests.get(f"{settings.FLASK_SERVICE_URL}/api/about")
-            about_data = about_response.json() if about_response.status_code == 200 else {}
-        except requests.exceptions.RequestException:
-            about_data = {}
-
-        context.update({
-            'featured_events': featured_events,
-            'upcoming_events': upcoming_events,
-            'cities': cities,
-            'search_form': search_form,
-            'about_data': about_data,
-        })
-
-        return context
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        context.update(await ahome_page_context())
+        context['search_form'] = EventSearchForm()
+        return await sync_to_async(self.render_to_response)(context)
 
 
 
@@ -94,16 +52,17 @@ class EventListView(ListView):
     context_object_name = 'event'
     paginate_by = 10
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['now'] = timezone.now()
-        context['form'] = self.form
-        print("Context:", context)
-        return context
-    
-    
+    SORT_ORDERINGS = {
+        'start_date': ('start_date', 'title'),
+        'name': ('title',),
+        # Event.min_price/max_price are kept up to date on seat and zone changes
+        # and indexed with is_published, so no aggregate over seats is needed.
+        'price_low': ('min_price', 'pk'),
+        'price_high': ('-max_price', '-pk'),
+    }
+
     def get_queryset(self):
-        queryset = super().get_queryset().filter(is_published=True)
+        queryset = Event.objects.filter(is_published=True).select_related('venue__city', 'category')
 
         self.form = EventSearchForm(self.request.GET)
 
@@ -114,43 +73,64 @@ class EventListView(ListView):
             date_filter = self.form.cleaned_data.get('date_filter')
 
             if search_term:
-                queryset = queryset.filter(
-                    Q(title__icontains=search_term) | Q(description__icontains=search_term)
-                )
+                queryset = get_search_backend().filter_queryset(queryset, search_term)
             if city:
                 queryset = queryset.filter(venue__city=city)
             if category:
                 queryset = queryset.filter(category=category)
             if date_filter:
+                # Plain ranges on start_date so the (is_published, start_date) index applies.
                 today = timezone.now().date()
                 if date_filter == 'today':
                     queryset = queryset.filter(start_date=today)
                 elif date_filter == 'this_week':
-                    queryset = queryset.filter(start_date__week=today.isocalendar()[1], start_date__year=today.year)
+                    week_start = today - timedelta(days=today.weekday())
+                    queryset = queryset.filter(start_date__range=(week_start, week_start + timedelta(days=6)))
                 elif date_filter == 'this_month':
-                    queryset = queryset.filter(start_date__month=today.month, start_date__year=today.year)
+                    month_start = today.replace(day=1)
+                    next_month = (month_start + timedelta(days=32)).replace(day=1)
+                    queryset = queryset.filter(start_date__gte=month_start, start_date__lt=next_month)
                 elif date_filter == 'upcoming':
                     queryset = queryset.filter(start_date__gte=today)
 
             sort_by = self.form.cleaned_data.get('sort_by')
-            if sort_by:
-                if sort_by == 'price_low':
-                    queryset = queryset.annotate(min_price=Min('seats__price'), zone_min_price=Min('zones__price')).order_by(
-                        'min_price', 'zone_min_price'
-                    )
-                elif sort_by == 'price_high':
-                    queryset = queryset.annotate(max_price=Max('seats__price'), zone_max_price=Max('zones__price')).order_by(
-                        '-max_price', '-zone_max_price'
-                    )
-                else:
-                    queryset = queryset.order_by(sort_by)
+            if sort_by in self.SORT_ORDERINGS:
+                queryset = queryset.order_by(*self.SORT_ORDERINGS[sort_by])
 
         return queryset
 
+    async def get(self, request, *args, **kwargs):
+        # Form validation looks up the chosen city/category, so build the queryset in a thread.
+        queryset = await sync_to_async(self.get_queryset)()
+        paginator = self.get_paginator(queryset, self.paginate_by)
+        paginator.count = await queryset.acount()
+        page_number = request.GET.get('page') or 1
+        if page_number == 'last':
+            page_number = paginator.num_pages
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        page.object_list = [event async for event in page.object_list]
+        self._page = page
+        self.object_list = page.object_list
+        context = await sync_to_async(self.get_context_data)()
+        return await sync_to_async(self.render_to_response)(context)
+
+    def paginate_queryset(self, queryset, page_size):
+        # get() has already fetched the current page with the async ORM;
+        # callers that skip get() (bench_event_list) paginate as usual.
+        page = getattr(self, '_page', None)
+        if page is None:
+            return super().paginate_queryset(queryset, page_size)
+        return page.paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context['search_form'] = EventSearchForm(self.request.GET)
+        context['now'] = timezone.now()
+        context['form'] = self.form
+        context['search_form'] = self.form
         context['cities'] = City.objects.filter(is_active=True)
         context['current_filters'] = {
             'search': self.request.GET.get('search', ''),
@@ -161,7 +141,7 @@ class EventListView(ListView):
         }
         
         event_list = []
-        for event in self.object_list:
+        for event in context['object_list']:
             event_list.append({
                 'title': event.title,
                 'formatted_start_date': event.start_date.strftime("%B %d, %Y"),
@@ -182,29 +162,21 @@ class EventDetailView(DetailView):
     template_name = 'events/event_detail.html'
     context_object_name = 'event'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        event = self.get_object()
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(
+            Event.objects.select_related('venue__city', 'category'), pk=kwargs['pk']
+        )
+        context = self.get_context_data(object=self.object)
+        event = self.object
 
         if event.is_indoor_event:
-            seats = Seat.objects.filter(event=event).order_by('row', 'number')
-
-            seating_map = {}
-            for seat in seats:
-                if seat.row not in seating_map:
-                    seating_map[seat.row] = []
-                seating_map[seat.row].append(seat)
-
-            sorted_rows = sorted(seating_map.keys())
-            sorted_seating_map = {row: seating_map[row] for row in sorted_rows}
-
-            context['seating_map'] = sorted_seating_map
-            context['seat_categories'] = set(seat.category.name for seat in seats)
+            seat_map = await sync_to_async(get_seat_map)(event.id)
+            context['seating_map'] = seat_map.rows()
+            context['seat_categories'] = seat_map.categories()
         else:
-            zones = Zone.objects.filter(event=event)
-            context['zones'] = zones
+            context['zones'] = [zone async for zone in Zone.objects.filter(event=event)]
 
-        return context
+        return await sync_to_async(self.render_to_response)(context)
 
 
 def get(self, request, *args, **kwargs):
@@ -213,11 +185,41 @@ def get(self, request, *args, **kwargs):
         return render(request, self.template_name, context)
 
 
-def get_seats_json(request, event_id):
-    event = get_object_or_404(Event, pk=event_id)
+async def get_seats_json(request, event_id):
+    """
+    Seat or zone availability for an event.
+
+    Responses carry the event's availability version as an ETag. Clients
+    polling with `?since=<version>` only receive seats whose availability
+    changed after that version, and a 304 when nothing changed at all.
+    """
+    event = await aget_object_or_404(Event, pk=event_id)
+    if await sync_to_async(release_expired_holds)(event_id=event.id):
+        await event.arefresh_from_db(fields=['availability_version'])
+
+    etag = f'"{event.id}-{event.availability_version}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        since = None
+
+    if event.is_indoor_event and since is not None:
+        changes = await sync_to_async(seat_changes)(event.id, since)
+        response = JsonResponse({
+            'event_id': event.id,
+            'version': event.availability_version,
+            'since': since,
+            'changes': changes,
+        })
+        response['ETag'] = etag
+        return response
 
     if event.is_indoor_event:
-        seats = Seat.objects.filter(event=event)
         seat_data = [
             {
                 'id': seat.id,
@@ -227,10 +229,10 @@ def get_seats_json(request, event_id):
                 'price': float(seat.price),
                 'is_available': seat.is_available
             }
-            for seat in seats
+            for seat in (await sync_to_async(get_seat_map)(event.id)).seats()
         ]
     else:
-        zones = Zone.objects.filter(event=event)
+        zones = [zone async for zone in Zone.objects.filter(event=event)]
         seat_data = [
             {
                 'id': zone.id,
@@ -243,16 +245,87 @@ def get_seats_json(request, event_id):
             for zone in zones
         ]
 
-    return JsonResponse({
+    response = JsonResponse({
         'event_id': event.id,
         'event_title': event.title,
         'is_indoor': event.is_indoor_event,
+        'version': event.availability_version,
         'seating_data': seat_data
     })
+    response['ETag'] = etag
+    return response
+
+
+
+async def seat_stream(request, event_id):
+    """
+    Server-Sent Events stream of seat and zone availability changes.
+
+    Each message id is the event's availability version, so a reconnecting
+    EventSource resumes from its Last-Event-ID. Needs an ASGI server; under
+    WSGI clients get a 501 and fall back to polling get_seats_json.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Availability streaming requires an ASGI server.', status=501)
+
+    event = await aget_object_or_404(Event, pk=event_id)
+    try:
+        since = int(request.headers.get('Last-Event-ID') or request.GET['since'])
+    except (KeyError, ValueError):
+        since = event.availability_version
+
+    async def stream():
+        yield f'retry: {settings.AVAILABILITY_STREAM_RETRY_MS}\n\n'
+        async with get_broker().subscribe(event.id, since=since) as subscription:
+            if since < event.availability_version:
+                message = await sync_to_async(changes_since)(event.id, since)
+                subscription.version = max(subscription.version, message['version'])
+                yield _sse_message(message)
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.get(), timeout=settings.AVAILABILITY_STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield _sse_message(message)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
+def _sse_message(message):
+    kind = 'resync' if message.get('resync') else 'availability'
+    return f"id: {message['version']}\nevent: {kind}\ndata: {json.dumps(message)}\n\n"
+
+
+
+def search_events(request):
+    """Ranked full-text search over published events, for type-ahead."""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    results = get_search_backend().search(query, limit=limit) if query else []
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': result.event_id,
+                'score': round(result.score, 4),
+                'title': result.title,
+                'snippet': result.snippet,
+            }
+            for result in results
+        ],
+    })
 
-def filter_events_by_city(request):
+async def filter_events_by_city(request):
     city_id = request.GET.get('city_id')
 
     if city_id:
@@ -267,6 +340,7 @@ def filter_events_by_city(request):
             end_date__gte=timezone.now().date()
         ).order_by('start_date')
 
+    events = events.select_related('venue')
     events_data = [
         {
             'id': event.id,
@@ -276,7 +350,7 @@ def filter_events_by_city(request):
             'banner_image_url': event.banner_image_url,
             'url': event.get_absolute_url()
         }
-        for event in events[:12]
+        async for event in events[:12]
     ]
 
     return JsonResponse({'events': events_data})
@@ -302,18 +376,8 @@ def checkout_view(request):
 def order_summary_view(request, order_id):
     return render(request, 'events/order_summary.html')
 
-import requests
-from django.shortcuts import render
-
-FLASK_API_URL = "http://localhost:5001/api"
-
 def about_us(request):
-    try:
-        response = requests.get("http://localhost:5001/api/about")
-        if response.status_code == 200:
-            about_data = response.json()
-            return render(request, "about_us.html", {"data": about_data})
-        else:
-            return render(request, "error.html", {"message": "Error fetching About Us data"})
-    except requests.exceptions.RequestException as e:
-        return render(request, "error.html", {"message": f"Error: {e}"})
+    about_data = get_flask_client().get('/api/about')
+    if about_data is None:
+        return render(request, "error.html", {"message": "Error fetching About Us data"})
+    return render(request, "about_us.html", {"data": about_data})
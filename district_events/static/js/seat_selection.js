@@ -20,7 +20,7 @@ document.addEventListener('DOMContentLoaded', function() {
  */
 function initTheaterSeating() {
     // Elements
-    const seats = document.querySelectorAll('.seat:not(.booked)');
+    const seats = document.querySelectorAll('.seat');
     const selectedSeatId = document.getElementById('selectedSeatId');
     const selectedSeatLabel = document.getElementById('selectedSeatLabel');
     const selectedSeatCategory = document.getElementById('selectedSeatCategory');
@@ -33,6 +33,11 @@ function initTheaterSeating() {
     // Handle seat click
     seats.forEach(seat => {
         seat.addEventListener('click', function() {
+            // Seats can become booked while the page is open
+            if (this.classList.contains('booked')) {
+                return;
+            }
+
             // Update UI by removing selected class from all seats
             seats.forEach(s => s.classList.remove('selected'));
             
@@ -65,6 +70,94 @@ function initTheaterSeating() {
             proceedButton.disabled = false;
         });
     });
+
+    watchSeatAvailability(document.querySelector('.seating-map'), function(seat) {
+        // Someone else took the seat this user had selected
+        if (seat.classList.contains('selected')) {
+            seat.classList.remove('selected');
+            selectedSeatId.value = '';
+            selectedSeatDetails.classList.add('d-none');
+            if (emptySelection) {
+                emptySelection.classList.remove('d-none');
+            }
+            proceedButton.disabled = true;
+        }
+    });
+}
+
+/**
+ * Follow seat availability changes since the version the page was rendered
+ * at and mark seats booked/available as they change. Uses the live stream
+ * when the server supports it, otherwise polls the delta API.
+ */
+function watchSeatAvailability(seatingMap, onSeatTaken) {
+    const eventId = seatingMap.dataset.eventId;
+    let version = seatingMap.dataset.version;
+
+    function applyChanges(changes) {
+        changes.forEach(change => {
+            const seat = seatingMap.querySelector(`.seat[data-seat-id="${change.id}"]`);
+            if (!seat) {
+                return;
+            }
+            seat.classList.toggle('booked', !change.is_available);
+            if (!change.is_available) {
+                onSeatTaken(seat);
+            }
+        });
+    }
+
+    if (!window.EventSource) {
+        pollSeatAvailability(eventId, version, applyChanges);
+        return;
+    }
+
+    const stream = new EventSource(`/events/api/seats/${eventId}/stream/?since=${version}`);
+    let connected = false;
+    stream.addEventListener('open', () => { connected = true; });
+    stream.addEventListener('availability', event => {
+        const data = JSON.parse(event.data);
+        applyChanges(data.seats || []);
+        version = data.version;
+    });
+    stream.addEventListener('resync', () => window.location.reload());
+    stream.addEventListener('error', () => {
+        // Never connected: the server cannot stream, so poll instead.
+        if (!connected) {
+            stream.close();
+            pollSeatAvailability(eventId, version, applyChanges);
+        }
+    });
+}
+
+/**
+ * Poll the seat availability delta API every few seconds.
+ */
+function pollSeatAvailability(eventId, version, applyChanges) {
+    let etag = null;
+
+    function poll() {
+        const headers = etag ? { 'If-None-Match': etag } : {};
+        fetch(`/events/api/seats/${eventId}/?since=${version}`, { headers: headers })
+            .then(response => {
+                if (response.status === 304 || !response.ok) {
+                    return null;
+                }
+                etag = response.headers.get('ETag');
+                return response.json();
+            })
+            .then(data => {
+                if (!data) {
+                    return;
+                }
+                applyChanges(data.changes);
+                version = data.version;
+            })
+            .catch(error => console.error('Error polling seat availability:', error))
+            .finally(() => setTimeout(poll, 5000));
+    }
+
+    setTimeout(poll, 5000);
 }
 
 /**